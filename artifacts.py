@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import cv2
+
+from bounded_store import BoundedStore
+from detections import Detections
+from metrics import timed
+from ocr_processor import create_debug_visualization, draw_annotations, load_image
+
+ARTIFACT_KINDS = ("annotated", "debug")
+ARTIFACT_MEDIA_TYPE = "image/jpeg"
+ARTIFACT_JPEG_QUALITY = 85
+
+class Artifact:
+    """Upload and detections of one debug request, and the images rendered from them so far"""
+    def __init__(self, content: bytes, magnets: List[Dict[str, Any]], rejected: List[Dict[str, Any]]):
+        self.id = uuid.uuid4().hex
+        # Eigene Referenz auf den Upload, damit das Artefakt nicht vom Bildspeicher abhängt
+        self.content = content
+        # Nur die Arrays aufheben, nicht die Dicts der API
+        self.magnets = Detections.from_json(magnets)
+        self.rejected = Detections.from_json(rejected)
+        self.rendered: Dict[str, bytes] = {}
+        self.created_at = time.monotonic()
+        self.detections_size = len(content) + self.magnets.nbytes + self.rejected.nbytes
+
+    @property
+    def size(self) -> int:
+        return self.detections_size + sum(len(content) for content in self.rendered.values())
+
+    def urls(self) -> Dict[str, str]:
+        return {kind: f"/artifacts/{self.id}/{kind}" for kind in ARTIFACT_KINDS}
+
+class ArtifactStore:
+    """
+    Bounded in-memory store for debug images, keyed by request id.
+
+    Only the upload and the detections are kept when a request asks for debug output;
+    the images are drawn on first request and kept with the artifact. Artifacts expire
+    `ttl` seconds after they were created, and the oldest are dropped once
+    `max_entries` or `max_bytes` (counting the upload) is exceeded.
+    """
+    def __init__(self, max_entries: int = 32, max_bytes: int = 64 * 1024 * 1024, ttl: float = 900):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._artifacts = BoundedStore(max_entries, max_bytes, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def create(self, content: bytes, magnets: List[Dict[str, Any]], rejected: List[Dict[str, Any]]) -> Artifact:
+        artifact = Artifact(content, magnets, rejected)
+        with self._lock:
+            self._artifacts.add(artifact.id, artifact)
+        return artifact
+
+    def get(self, request_id: str) -> Optional[Artifact]:
+        with self._lock:
+            return self._artifacts.get(request_id)
+
+    def render(self, request_id: str, kind: str) -> Optional[bytes]:
+        """
+        The JPEG of one artifact kind ("annotated" or "debug"), drawn on first request.
+
+        Returns:
+            The image bytes, or None if the artifact is unknown or has expired
+        """
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        artifact = self.get(request_id)
+        if artifact is None:
+            return None
+        with self._lock:
+            content = artifact.rendered.get(kind)
+        if content is not None:
+            return content
+
+        with timed("render", observe=True):
+            image, _ = load_image(artifact.content)
+            if kind == "annotated":
+                image = draw_annotations(image, artifact.magnets)
+            else:
+                image = create_debug_visualization(image, artifact.magnets, artifact.rejected)
+            _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, ARTIFACT_JPEG_QUALITY])
+        content = buffer.tobytes()
+        with self._lock:
+            if request_id in self._artifacts and kind not in artifact.rendered:
+                artifact.rendered[kind] = content
+                self._artifacts.grow(len(content))
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._artifacts.expire()
+            return {
+                "artifacts": len(self._artifacts),
+                "bytes": self._artifacts.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl
+            }
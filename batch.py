@@ -0,0 +1,105 @@
+import asyncio
+import io
+import posixpath
+import zipfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+class BatchTooLargeError(Exception):
+    """Raised when a batch has more images, or larger ones, than allowed"""
+
+class PipelineStage:
+    """
+    One step of a batch pipeline.
+
+    `handler(item)` processes an item dict in place; up to `concurrency` items are
+    in the stage at the same time.
+    """
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Awaitable[None]], concurrency: int = 1):
+        if concurrency < 1:
+            raise ValueError(f"Stage concurrency must be at least 1, got {concurrency}")
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+
+_DONE = object()
+
+async def run_pipeline(items: Iterable[Dict[str, Any]], stages: List[PipelineStage],
+                       queue_size: int = 2) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Push items through stages connected by bounded queues and yield them as they complete.
+
+    Every stage works on different items at the same time, so one image can be in OCR
+    while the next is read and the previous one is in the LLM. A full queue makes the
+    stage before it wait, which bounds the number of items in memory. An item whose
+    handler raises gets an "error" and a "failed_stage" and skips the remaining stages.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    results: asyncio.Queue = asyncio.Queue()
+    outputs = queues[1:] + [results]
+
+    async def feed():
+        try:
+            for item in items:
+                await queues[0].put(item)
+                # Anderen Stufen zwischen zwei Einträgen Zeit geben
+                await asyncio.sleep(0)
+        finally:
+            for _ in range(stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+    async def work(stage: PipelineStage, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            if "error" not in item:
+                try:
+                    await stage.handler(item)
+                except Exception as e:
+                    item["error"] = str(e)
+                    item["failed_stage"] = stage.name
+            await outbox.put(item)
+
+    async def run_stage(stage: PipelineStage, inbox: asyncio.Queue, outbox: asyncio.Queue, downstream: int):
+        try:
+            await asyncio.gather(*(work(stage, inbox, outbox) for _ in range(stage.concurrency)))
+        finally:
+            for _ in range(downstream):
+                await outbox.put(_DONE)
+
+    tasks = [asyncio.create_task(feed())]
+    for position, stage in enumerate(stages):
+        downstream = stages[position + 1].concurrency if position + 1 < len(stages) else 1
+        tasks.append(asyncio.create_task(run_stage(stage, queues[position], outputs[position], downstream)))
+    try:
+        while True:
+            item = await results.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def zip_images(content: bytes, max_files: int, max_file_bytes: int) -> List[Tuple[str, Callable[[], bytes]]]:
+    """
+    List the files in a ZIP archive as (filename, read) pairs; `read()` extracts one file.
+
+    Directories, hidden files and macOS resource forks are skipped. Raises
+    BatchTooLargeError before extracting anything if the archive has more than
+    `max_files` files or a file larger than `max_file_bytes` once uncompressed.
+    """
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    entries = [entry for entry in archive.infolist()
+               if not entry.is_dir() and not entry.filename.startswith("__MACOSX/")
+               and not posixpath.basename(entry.filename).startswith(".")]
+    if len(entries) > max_files:
+        raise BatchTooLargeError(f"Batch has {len(entries)} files, at most {max_files} are allowed")
+    for entry in entries:
+        if entry.file_size > max_file_bytes:
+            raise BatchTooLargeError(f"{entry.filename} is larger than {max_file_bytes} bytes")
+    return [(entry.filename, lambda entry=entry: archive.read(entry)) for entry in entries]
+
+def is_zip(content: bytes) -> bool:
+    return zipfile.is_zipfile(io.BytesIO(content))
@@ -0,0 +1 @@
+"""Performance benchmarks for the OCR and LLM pipeline."""
@@ -0,0 +1,149 @@
+"""
+End-to-end OCR benchmark on synthetic boards with ground truth.
+
+Reports throughput, latency percentiles, peak memory and word recall/precision.
+
+Usage:
+    python -m benchmark.e2e --boards 20 --repeat 2 --output e2e.json
+    python -m benchmark.e2e --dataset synthetic_boards --mode detect_once
+    python -m benchmark.e2e --width 4000 --height 3000 --min-font-size 90 --max-font-size 180 --profiles fast accurate
+"""
+import argparse
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+
+import cv2
+
+from benchmark.synthetic import add_board_arguments, board_settings, generate_dataset, load_dataset
+from ocr_processor import (DEFAULT_DET_MAX_SIDE, DEFAULT_PIPELINE_MODE, DEFAULT_QUALITY_PROFILE, PIPELINE_MODES,
+                           QUALITY_PROFILES, configure_engine_pool, latency_percentile, process_image)
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MiB, or None where it cannot be read"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux meldet KiB, macOS Bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def normalize_word(text):
+    return re.sub(r"[^\w]", "", text.casefold())
+
+def match_words(magnets, truth):
+    """
+    Match detected magnets to ground-truth words.
+
+    A detection matches an unmatched ground-truth word with the same text (ignoring
+    case and punctuation) whose box contains the detection's center.
+
+    Returns:
+        Number of matched ground-truth words
+    """
+    unmatched = list(truth)
+    matched = 0
+    for magnet in magnets:
+        position = magnet["position"]
+        center_x = position["x"] + position["width"] / 2
+        center_y = position["y"] + position["height"] / 2
+        text = normalize_word(magnet["text"])
+        for word in unmatched:
+            box = word["box"]
+            if (normalize_word(word["text"]) == text and box["x"] <= center_x <= box["x"] + box["w"]
+                    and box["y"] <= center_y <= box["y"] + box["h"]):
+                unmatched.remove(word)
+                matched += 1
+                break
+    return matched
+
+def run_e2e(dataset, mode=DEFAULT_PIPELINE_MODE, repeat=1, det_max_side=DEFAULT_DET_MAX_SIDE,
+            decode_max_side=None, profile=DEFAULT_QUALITY_PROFILE):
+    """
+    Run process_image on every board `repeat` times, starting from PNG bytes so decoding is measured too.
+
+    Returns:
+        Summary dict with throughput, latency percentiles, peak RSS, recall and per-board results
+    """
+    # Modell vorab laden, damit die Messung keine Initialisierung enthält
+    configure_engine_pool(size=1, det_max_side=det_max_side)
+    encoded = [(name, cv2.imencode(".png", image)[1].tobytes(), truth) for name, image, truth in dataset]
+
+    latencies = []
+    boards = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, content, truth in encoded:
+            image_start = time.perf_counter()
+            result = process_image(content, mode=mode, det_max_side=det_max_side, decode_max_side=decode_max_side,
+                                   profile=profile)
+            latencies.append(time.perf_counter() - image_start)
+            boards[name] = {
+                "words": len(truth),
+                "detections": len(result["magnets"]),
+                "matched": match_words(result["magnets"], truth)
+            }
+    wall_seconds = time.perf_counter() - start
+
+    truth_words = sum(board["words"] for board in boards.values())
+    detections = sum(board["detections"] for board in boards.values())
+    matched = sum(board["matched"] for board in boards.values())
+    peak_rss = peak_rss_mb()
+    return {
+        "profile": profile,
+        "images": len(latencies),
+        "images_per_s": len(latencies) / wall_seconds,
+        "p50_s": latency_percentile(latencies, 0.5),
+        "p95_s": latency_percentile(latencies, 0.95),
+        "mean_s": statistics.mean(latencies),
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+        "recall": round(matched / truth_words, 4) if truth_words else None,
+        "precision": round(matched / detections, 4) if detections else None,
+        "boards": boards
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end OCR benchmark on synthetic boards")
+    add_board_arguments(parser)
+    parser.add_argument("--dataset", help="Use boards written by benchmark.synthetic instead of generating them")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=DEFAULT_PIPELINE_MODE)
+    parser.add_argument("--det-max-side", type=int, default=DEFAULT_DET_MAX_SIDE)
+    parser.add_argument("--decode-max-side", type=int, default=None)
+    parser.add_argument("--profiles", nargs="+", choices=list(QUALITY_PROFILES), default=list(QUALITY_PROFILES),
+                        help="Quality profiles to compare")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs over the whole dataset")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.dataset:
+        dataset = load_dataset(args.dataset)
+    else:
+        dataset = generate_dataset(args.boards, seed=args.seed, **board_settings(args))
+    summaries = {}
+    for profile in args.profiles:
+        summary = run_e2e(dataset, mode=args.mode, repeat=args.repeat, det_max_side=args.det_max_side,
+                          decode_max_side=args.decode_max_side, profile=profile)
+        summaries[profile] = summary
+        print(f"{profile}: {summary['images']} images, {summary['images_per_s']:.2f} images/s, "
+              f"p50 {summary['p50_s']:.2f}s, p95 {summary['p95_s']:.2f}s, "
+              f"recall {summary['recall']}, precision {summary['precision']}")
+    # Peak RSS gilt für den ganzen Lauf, nicht pro Profil
+    print(f"Peak RSS {summaries[args.profiles[-1]]['peak_rss_mb']} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "e2e",
+                "settings": vars(args),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": summaries
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Micro-benchmarks for the CPU-bound helpers of the OCR and LLM pipeline.
+
+No OCR model is needed: the inputs are synthetic boards and detections derived
+from their ground truth.
+
+Usage:
+    python -m benchmark.micro --repeat 20 --output micro.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+
+import serialization
+from benchmark.synthetic import render_board
+from detections import Detections
+from llm_service import LLMService
+from ocr_processor import (DEFAULT_OVERLAP_PERCENT, DEFAULT_WINDOW_SIZE, QUALITY_PROFILES, generate_sliding_windows,
+                           preprocess_image, remove_duplicates_and_subwords)
+
+LLM_RESPONSE = (
+    "<think>Welche Wörter passen? Vielleicht {\"sentence\": \"Der Hund\"} oder doch nicht</think>\n"
+    "```json\n{\"sentence\": \"Der Hund isst heute Käse\", \"used_words\": [\"Der\", \"Hund\", \"isst\", "
+    "\"heute\", \"Käse\"]}\n```"
+)
+
+def time_call(function, repeat=10, warmup=1):
+    """
+    Call `function` repeatedly and summarize the wall time per call.
+
+    Returns:
+        Dict with min, median, mean and max seconds per call
+    """
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "calls": repeat,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.mean(timings),
+        "max_s": max(timings)
+    }
+
+def board_detections(truth, duplicates=2):
+    """
+    Detections as the sliding-window OCR would report them for a board: every word
+    several times from overlapping windows (slightly shifted), plus a subword fragment.
+    """
+    texts, confidences, points = [], [], []
+    for word in truth:
+        box = word["box"]
+        for shift in range(duplicates + 1):
+            x, y = box["x"] + shift * 2, box["y"] + shift
+            texts.append(word["text"])
+            confidences.append(0.9 - 0.01 * shift)
+            points.append([[x, y], [x + box["w"], y], [x + box["w"], y + box["h"]], [x, y + box["h"]]])
+        if len(word["text"]) > 3:
+            half = box["w"] // 2
+            texts.append(word["text"][:len(word["text"]) // 2])
+            confidences.append(0.7)
+            points.append([[box["x"], box["y"]], [box["x"] + half, box["y"]],
+                           [box["x"] + half, box["y"] + box["h"]], [box["x"], box["y"] + box["h"]]])
+    return Detections(texts, confidences, points)
+
+def profile_workload(image, profile):
+    """
+    OCR work a quality profile leaves for an image: working resolution, sliding windows
+    and the pixels the text detector sees in them (before blank windows are skipped)
+    """
+    settings = QUALITY_PROFILES[profile]
+    preprocessed = preprocess_image(image, profile=profile)
+    height, width = preprocessed.image_thresh.shape[:2]
+    window_size = min(settings["window_size"], min(height, width) // 2)
+    windows = generate_sliding_windows(preprocessed.image_processed, window_size, settings["overlap_percent"])
+    return {
+        "working_size": [width, height],
+        "text_height": preprocessed.text_height,
+        "windows": len(windows),
+        "detector_megapixels": round(len(windows) * (window_size * settings["scale_factor"]) ** 2 / 1e6, 1)
+    }
+
+def run_micro_benchmarks(repeat=10, word_count=40, width=1600, height=1200, seed=0, font_sizes=(28, 56)):
+    """Run every micro-benchmark and return their timings keyed by name"""
+    image, truth = render_board(word_count=word_count, width=width, height=height, font_sizes=font_sizes, seed=seed)
+    detections = board_detections(truth)
+    magnets = {"magnets": detections.to_json()}
+    words = [word["text"] for word in truth]
+    service = LLMService()
+
+    results = {
+        "generate_sliding_windows": time_call(
+            lambda: generate_sliding_windows(image, DEFAULT_WINDOW_SIZE, DEFAULT_OVERLAP_PERCENT), repeat),
+    }
+    for profile in QUALITY_PROFILES:
+        results[f"preprocess_image[{profile}]"] = {
+            **profile_workload(image, profile),
+            **time_call(lambda profile=profile: preprocess_image(image, profile=profile), repeat)
+        }
+    results = {
+        **results,
+        "remove_duplicates_and_subwords": {
+            "detections": len(detections),
+            **time_call(lambda: remove_duplicates_and_subwords(detections), repeat)
+        },
+        "detections_to_json": time_call(detections.to_json, repeat * 10),
+        "serialize[json]": {"bytes": len(json.dumps(magnets)), **time_call(lambda: json.dumps(magnets), repeat * 10)},
+        "serialize[orjson]": {"bytes": len(serialization.dumps(magnets)),
+                              **time_call(lambda: serialization.dumps(magnets), repeat * 10)},
+        "parse_llm_response": time_call(lambda: service._parse_llm_response(LLM_RESPONSE, words), repeat * 10)
+    }
+    if serialization.msgpack is not None:
+        results["serialize[msgpack]"] = {"bytes": len(serialization.packb(magnets)),
+                                         **time_call(lambda: serialization.packb(magnets), repeat * 10)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for OCR and LLM helpers")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed calls per benchmark")
+    parser.add_argument("--words", type=int, default=40, help="Magnets on the benchmark board")
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    parser.add_argument("--min-font-size", type=int, default=28)
+    parser.add_argument("--max-font-size", type=int, default=56)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run_micro_benchmarks(args.repeat, args.words, args.width, args.height, args.seed,
+                                   font_sizes=(args.min_font_size, args.max_font_size))
+
+    print(f"{'benchmark':<34}{'median ms':>12}{'min ms':>10}{'windows':>10}{'det MP':>10}")
+    for name, stats in results.items():
+        print(f"{name:<34}{stats['median_s'] * 1000:>12.3f}{stats['min_s'] * 1000:>10.3f}"
+              f"{stats.get('windows', ''):>10}{stats.get('detector_megapixels', ''):>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "micro",
+                "settings": vars(args),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare the sliding-window and detect-once OCR pipelines on real images.
+
+Usage:
+    python -m benchmark.pipeline_modes image1.jpg image2.jpg --repeat 3 --output modes.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from ocr_processor import PIPELINE_MODES, configure_engine_pool, process_image
+
+def benchmark_mode(image_paths, mode, repeat=1):
+    """
+    Run process_image on every image `repeat` times in one pipeline mode.
+
+    Returns:
+        Dict with per-image latencies and recognized words
+    """
+    per_image = {}
+    for image_path in image_paths:
+        latencies = []
+        words = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = process_image(image_path, mode=mode)
+            latencies.append(time.perf_counter() - start)
+            words = sorted(m["text"] for m in result["magnets"])
+        per_image[image_path] = {"latencies": latencies, "words": words}
+    return per_image
+
+def compare_modes(image_paths, repeat=1):
+    """
+    Benchmark every pipeline mode and compare their recognized words against sliding windows.
+
+    Returns:
+        Dict keyed by mode with latency summary and agreement with the sliding-window result
+    """
+    # Modelle vorab laden, damit die Messung keine Initialisierung enthält
+    configure_engine_pool(size=1)
+
+    results = {mode: benchmark_mode(image_paths, mode, repeat) for mode in PIPELINE_MODES}
+    reference = results["sliding_window"]
+
+    summary = {}
+    for mode, per_image in results.items():
+        latencies = [t for image in per_image.values() for t in image["latencies"]]
+        agreement = []
+        for image_path, image in per_image.items():
+            ref_words = set(reference[image_path]["words"])
+            words = set(image["words"])
+            union = ref_words | words
+            agreement.append(len(ref_words & words) / len(union) if union else 1.0)
+        summary[mode] = {
+            "mean_latency_s": statistics.mean(latencies),
+            "median_latency_s": statistics.median(latencies),
+            "mean_words": statistics.mean(len(image["words"]) for image in per_image.values()),
+            "word_agreement_with_sliding_window": statistics.mean(agreement),
+            "images": per_image
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR pipeline modes")
+    parser.add_argument("images", nargs="+", help="Images to process")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per image and mode")
+    parser.add_argument("--output", help="Write the full results as JSON to this file")
+    args = parser.parse_args()
+
+    summary = compare_modes(args.images, repeat=args.repeat)
+
+    print(f"{'mode':<16}{'mean s':>10}{'median s':>10}{'words':>8}{'agreement':>11}")
+    for mode, stats in summary.items():
+        print(f"{mode:<16}{stats['mean_latency_s']:>10.2f}{stats['median_latency_s']:>10.2f}"
+              f"{stats['mean_words']:>8.1f}{stats['word_agreement_with_sliding_window']:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Render synthetic fridge-magnet boards with ground-truth word boxes.
+
+Usage:
+    python -m benchmark.synthetic --boards 20 --words 30 --output-dir synthetic_boards
+"""
+import argparse
+import json
+import math
+import os
+import random
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Typical magnetic-poetry vocabulary: function words plus a few nouns, verbs and adjectives
+GERMAN_WORDS = (
+    "der", "die", "das", "und", "oder", "aber", "weil", "nicht", "ich", "du", "wir", "ihr", "sie",
+    "mein", "dein", "ein", "eine", "mit", "ohne", "für", "gegen", "auf", "unter", "immer", "nie",
+    "heute", "morgen", "gestern", "sehr", "viel", "zu", "ist", "sind", "war", "hat", "will", "muss",
+    "kann", "liebt", "hasst", "isst", "trinkt", "tanzt", "schläft", "singt", "träumt", "lacht",
+    "Hund", "Katze", "Kühlschrank", "Käse", "Bier", "Kaffee", "Mond", "Sonne", "Herz", "Fisch",
+    "Oma", "Nachbar", "Chef", "Wurst", "Brot", "Butter", "Haus", "Garten", "Straße", "Träne",
+    "schön", "müde", "laut", "leise", "dumm", "heiß", "kalt", "grün", "süß", "böse", "verrückt",
+)
+
+MAGNET_COLORS = ((255, 255, 255), (250, 245, 230), (235, 240, 250), (255, 235, 235))
+
+# Common fonts with umlauts; Pillow finds them by name in the system font directories
+FONT_CANDIDATES = ("DejaVuSans.ttf", "LiberationSans-Regular.ttf", "Arial.ttf", "Helvetica.ttc")
+TRANSLITERATION = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ß": "ss"})
+
+def find_font(font_path=None):
+    """
+    The font file to render with, or None for Pillow's built-in font.
+
+    The built-in font has no umlauts, so boards rendered with it use transliterated words.
+    """
+    for candidate in ((font_path,) if font_path else FONT_CANDIDATES):
+        try:
+            ImageFont.truetype(candidate, 12)
+            return candidate
+        except OSError:
+            if font_path:
+                raise
+    return None
+
+def _load_font(font_path, size):
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size=size)
+
+def _rotate_point(x, y, angle_degrees):
+    # Gleiche Drehrichtung wie PIL.Image.rotate (gegen den Uhrzeigersinn, y nach unten)
+    angle = math.radians(angle_degrees)
+    return x * math.cos(angle) + y * math.sin(angle), -x * math.sin(angle) + y * math.cos(angle)
+
+def render_magnet(text, font, rotation, color):
+    """
+    Render one magnet tile, rotated by `rotation` degrees.
+
+    Returns:
+        (RGBA tile, (x, y, w, h) of the text inside the rotated tile)
+    """
+    left, top, right, bottom = font.getbbox(text)
+    padding = max(4, (bottom - top) // 3)
+    width, height = right - left + 2 * padding, bottom - top + 2 * padding
+    tile = Image.new("RGBA", (width, height), color + (255,))
+    draw = ImageDraw.Draw(tile)
+    draw.rectangle((0, 0, width - 1, height - 1), outline=(190, 190, 190, 255))
+    draw.text((padding - left, padding - top), text, font=font, fill=(20, 20, 20, 255))
+
+    rotated = tile.rotate(rotation, resample=Image.BICUBIC, expand=True)
+    # Ecken der Textbox mitdrehen, um die Ground-Truth-Box im gedrehten Magneten zu erhalten
+    corners = [_rotate_point(x - width / 2, y - height / 2, rotation)
+               for x, y in ((padding, padding), (width - padding, padding),
+                            (width - padding, height - padding), (padding, height - padding))]
+    xs = [x + rotated.width / 2 for x, _ in corners]
+    ys = [y + rotated.height / 2 for _, y in corners]
+    box = (int(min(xs)), int(min(ys)), int(math.ceil(max(xs) - min(xs))), int(math.ceil(max(ys) - min(ys))))
+    return rotated, box
+
+def _overlaps(rect, placed, margin):
+    x, y, w, h = rect
+    return any(x < px + pw + margin and px < x + w + margin and y < py + ph + margin and py < y + h + margin
+               for px, py, pw, ph in placed)
+
+def render_board(word_count=25, width=1600, height=1200, font_sizes=(28, 56), max_rotation=8.0, noise=6.0,
+                 seed=0, vocabulary=GERMAN_WORDS, font_path=None):
+    """
+    Render a fridge door with `word_count` magnets at random sizes, angles and positions.
+
+    Magnets never overlap; a word that finds no free spot after a few tries is left out,
+    so very dense boards can have fewer words than requested. Without a font that has
+    umlauts (see find_font), words are transliterated ("Käse" becomes "Kaese").
+
+    Returns:
+        (BGR image, ground truth) where the ground truth lists {"text", "box", "font_size",
+        "rotation"} per magnet and "box" is the axis-aligned box of the word in pixels
+    """
+    rng = random.Random(seed)
+    font_path = find_font(font_path)
+    # Leicht ungleichmäßig beleuchtete Kühlschranktür
+    gradient = np.linspace(235, 215, height, dtype=np.float32)[:, None]
+    background = np.repeat(np.repeat(gradient, width, axis=1)[:, :, None], 3, axis=2)
+    board = Image.fromarray(background.astype(np.uint8), "RGB")
+
+    placed = []
+    truth = []
+    for _ in range(word_count):
+        text = rng.choice(vocabulary)
+        if font_path is None:
+            text = text.translate(TRANSLITERATION)
+        font_size = rng.randint(*font_sizes)
+        rotation = rng.uniform(-max_rotation, max_rotation)
+        tile, (text_x, text_y, text_w, text_h) = render_magnet(
+            text, _load_font(font_path, font_size), rotation, rng.choice(MAGNET_COLORS))
+        if tile.width >= width or tile.height >= height:
+            continue
+        for _ in range(50):
+            x, y = rng.randint(0, width - tile.width), rng.randint(0, height - tile.height)
+            if not _overlaps((x, y, tile.width, tile.height), placed, margin=4):
+                break
+        else:
+            continue
+        board.paste(tile, (x, y), tile)
+        placed.append((x, y, tile.width, tile.height))
+        truth.append({
+            "text": text,
+            "box": {"x": x + text_x, "y": y + text_y, "w": text_w, "h": text_h},
+            "font_size": font_size,
+            "rotation": round(rotation, 2)
+        })
+
+    image = cv2.cvtColor(np.asarray(board), cv2.COLOR_RGB2BGR)
+    if noise:
+        noise_rng = np.random.default_rng(seed)
+        image = np.clip(image + noise_rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+    return image, truth
+
+def generate_dataset(boards=10, seed=0, **board_settings):
+    """
+    Render `boards` boards with consecutive seeds.
+
+    Returns:
+        List of (name, BGR image, ground truth)
+    """
+    return [(f"board_{index:03d}.png", *render_board(seed=seed + index, **board_settings))
+            for index in range(boards)]
+
+def save_dataset(dataset, output_dir):
+    """Write the boards as PNG files plus ground_truth.json mapping file names to their words"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, image, _ in dataset:
+        cv2.imwrite(os.path.join(output_dir, name), image)
+    with open(os.path.join(output_dir, "ground_truth.json"), "w", encoding="utf-8") as f:
+        json.dump({name: truth for name, _, truth in dataset}, f, indent=2, ensure_ascii=False)
+
+def load_dataset(directory):
+    """Read a dataset written by save_dataset"""
+    with open(os.path.join(directory, "ground_truth.json"), encoding="utf-8") as f:
+        truths = json.load(f)
+    return [(name, cv2.imread(os.path.join(directory, name)), truth) for name, truth in sorted(truths.items())]
+
+def add_board_arguments(parser):
+    """Command line options for the board generator, shared with the end-to-end benchmark"""
+    parser.add_argument("--boards", type=int, default=10, help="Number of boards")
+    parser.add_argument("--words", type=int, default=25, help="Magnets per board")
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    parser.add_argument("--min-font-size", type=int, default=28)
+    parser.add_argument("--max-font-size", type=int, default=56)
+    parser.add_argument("--max-rotation", type=float, default=8.0, help="Largest magnet angle in degrees")
+    parser.add_argument("--noise", type=float, default=6.0, help="Standard deviation of the pixel noise")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", help="TrueType font file (defaults to Pillow's built-in font)")
+
+def board_settings(args):
+    return {
+        "word_count": args.words,
+        "width": args.width,
+        "height": args.height,
+        "font_sizes": (args.min_font_size, args.max_font_size),
+        "max_rotation": args.max_rotation,
+        "noise": args.noise,
+        "font_path": args.font
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Render synthetic fridge-magnet boards")
+    add_board_arguments(parser)
+    parser.add_argument("--output-dir", default="synthetic_boards", help="Directory for images and ground truth")
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.boards, seed=args.seed, **board_settings(args))
+    save_dataset(dataset, args.output_dir)
+    print(f"Wrote {len(dataset)} boards with {sum(len(truth) for _, _, truth in dataset)} words to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
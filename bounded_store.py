@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Optional
+
+class BoundedStore:
+    """
+    Insertion- or use-ordered entries bounded by count, total size and age.
+
+    Entries need a `size` attribute (it may grow while stored, see `grow`). With a
+    `ttl`, entries whose `timestamp` attribute is more than `ttl` seconds old expire;
+    entries must then be ordered by that timestamp, oldest first. Beyond that the
+    oldest entries are dropped once `max_entries` or `max_bytes` is exceeded, but the
+    newest is kept even if it alone exceeds `max_bytes`.
+
+    Not thread-safe: the owning store serializes access with its own lock.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, ttl: Optional[float] = None,
+                 timestamp: str = "created_at"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timestamp = timestamp
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def values(self) -> Iterator[Any]:
+        """Entries from newest to oldest"""
+        return reversed(self._entries.values())
+
+    def add(self, key: str, entry: Any) -> None:
+        self._entries[key] = entry
+        self.bytes += entry.size
+        self.evict()
+
+    def get(self, key: str, touch: bool = False) -> Optional[Any]:
+        """The entry, or None; with `touch` it becomes the newest"""
+        self.expire()
+        entry = self._entries.get(key)
+        if entry is not None and touch:
+            self._entries.move_to_end(key)
+        return entry
+
+    def pop(self, key: str) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def grow(self, nbytes: int) -> None:
+        """Account for `nbytes` added to a stored entry"""
+        self.bytes += nbytes
+        self.evict()
+
+    def expire(self) -> None:
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if now - getattr(entry, self.timestamp) <= self.ttl:
+                break
+            self._entries.popitem(last=False)
+            self.bytes -= entry.size
+
+    def evict(self) -> None:
+        self.expire()
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
@@ -1,7 +1,17 @@
 import os
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+def merge_config(defaults: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Overlay a config file on the defaults, merging sections key by key"""
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(defaults.get(key), dict):
+            merged[key] = {**defaults[key], **value}
+        else:
+            merged[key] = value
+    return merged
 
 class Config:
     def __init__(self):
@@ -16,20 +26,106 @@ class Config:
                 "api_key": os.environ.get("OPENROUTER_API_KEY", ""),
                 "model": "qwen/qwq-32b:free",
                 "temperature": 0.7,
-                "max_tokens": 300
+                "max_tokens": 300,
+                "connect_timeout": 5.0,
+                "read_timeout": 60.0,
+                "max_retries": 3,
+                "backoff_base": 0.5,
+                "backoff_max": 8.0,
+                "max_concurrency": 8,
+                "max_connections": 16,
+                "http2": True,
+                "structured_output": True
             },
             "ollama": {
                 "model": "thirdeyeai/DeepSeek-R1-Distill-Qwen-7B-uncensored",
                 "temperature": 0.7,
                 "max_tokens": 300,
-                "top_p": 0.9
+                "top_p": 0.9,
+                "keep_alive": "30m",
+                "host": None,
+                "connect_timeout": 5.0,
+                "read_timeout": 120.0,
+                "max_retries": 2,
+                "backoff_base": 0.5,
+                "backoff_max": 8.0,
+                "max_concurrency": 2,
+                "max_connections": 8,
+                "structured_output": True
+            },
+            # Optional list of backends to route between, e.g.
+            # {"name": "gpu1", "provider": "ollama", "host": "http://gpu1:11434", "weight": 2};
+            # each entry overrides the settings of its provider section. Empty: use llm_provider only.
+            "llm_backends": [],
+            "routing": {
+                "hedge_percentile": 0.9,
+                "hedge_delay": 5.0,
+                "min_hedge_delay": 0.5,
+                "max_attempts": 2,
+                "max_reasks": 1,
+                "breaker_window": 20,
+                "breaker_min_calls": 5,
+                "breaker_error_rate": 0.5,
+                "breaker_slow_call_seconds": None,
+                "breaker_cooldown": 30.0
+            },
+            "batch": {
+                "max_files": 200,
+                "max_file_bytes": 26214400,
+                "queue_size": 2,
+                "read_concurrency": 1,
+                "llm_concurrency": 4
+            },
+            "sessions": {
+                "max_sessions": 1024,
+                "max_bytes": 67108864,
+                "ttl": 1800
+            },
+            "variants": {
+                "strategy": "single_prompt",  # "single_prompt" or "fan_out"
+                "batch_size": 3,
+                "prefetch": True,  # Nächsten Stapel schon beim Hochladen erzeugen
+                "max_count": 10,
+                "max_entries": 256,
+                "ttl": 900.0
+            },
+            "ocr": {
+                "worker_processes": 2,
+                "max_queue": 16,
+                "engine_pool_size": 1,
+                "cpu_threads": 4,
+                "enable_mkldnn": False,
+                "rec_batch_num": 16,
+                "pipeline_mode": "sliding_window",
+                "quality_profile": "balanced",  # "fast", "balanced" or "accurate"
+                "det_max_side": 1920,
+                "min_ink_ratio": 0.002,
+                "decode_max_side": None
+            },
+            "cache": {
+                "max_entries": 128,
+                "disk_dir": None
+            },
+            "images": {
+                "max_entries": 64,
+                "max_bytes": 268435456
+            },
+            "artifacts": {
+                "max_entries": 32,
+                "max_bytes": 67108864,
+                "ttl": 900
+            },
+            "jobs": {
+                "workers": 2,
+                "max_queue": 32,
+                "result_ttl": 600
             }
         }
         
         if self.config_file.exists():
             try:
                 with open(self.config_file, 'r') as f:
-                    return {**default_config, **json.load(f)}
+                    return merge_config(default_config, json.load(f))
             except Exception as e:
                 print(f"Error loading config file: {e}")
                 return default_config
@@ -46,6 +142,56 @@ class Config:
         provider = self.config.get("llm_provider", "ollama")
         return self.config.get(provider, {})
     
+    def get_llm_backends(self) -> List[Dict[str, Any]]:
+        """Get the LLM backends to route between, each merged with its provider's settings"""
+        backends = self.config.get("llm_backends") or [{"provider": self.get_current_provider()}]
+        merged = []
+        for backend in backends:
+            provider = backend.get("provider", self.get_current_provider())
+            merged.append({
+                **self.config.get(provider, {}),
+                **backend,
+                "name": backend.get("name", provider),
+                "provider": provider
+            })
+        return merged
+    
+    def get_routing_config(self) -> Dict[str, Any]:
+        """Get the LLM routing, hedging and circuit breaker configuration"""
+        return self.config.get("routing", {})
+    
+    def get_batch_config(self) -> Dict[str, Any]:
+        """Get the batch pipeline configuration"""
+        return self.config.get("batch", {})
+    
+    def get_sessions_config(self) -> Dict[str, Any]:
+        """Get the session store configuration"""
+        return self.config.get("sessions", {})
+    
+    def get_variants_config(self) -> Dict[str, Any]:
+        """Get the sentence variant batching configuration"""
+        return self.config.get("variants", {})
+    
+    def get_ocr_config(self) -> Dict[str, Any]:
+        """Get the OCR engine configuration"""
+        return self.config.get("ocr", {})
+    
+    def get_cache_config(self) -> Dict[str, Any]:
+        """Get the OCR result cache configuration"""
+        return self.config.get("cache", {})
+    
+    def get_images_config(self) -> Dict[str, Any]:
+        """Get the uploaded image store configuration"""
+        return self.config.get("images", {})
+    
+    def get_artifacts_config(self) -> Dict[str, Any]:
+        """Get the debug artifact store configuration"""
+        return self.config.get("artifacts", {})
+    
+    def get_jobs_config(self) -> Dict[str, Any]:
+        """Get the asynchronous job queue configuration"""
+        return self.config.get("jobs", {})
+    
     def get_current_provider(self) -> str:
         """Get the current LLM provider name"""
         return self.config.get("llm_provider", "ollama")
@@ -0,0 +1,116 @@
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+class Detections:
+    """
+    Recognized text boxes of one image, stored as parallel arrays.
+
+    `texts` holds the strings, `confidences` a float64 array and `points` an (n, 4, 2)
+    int32 array with the corners of every box (top-left, top-right, bottom-right,
+    bottom-left). The OCR, deduplication and rendering stages pass this container
+    along; `to_json` builds the dict shape of the API only at the end.
+    """
+    __slots__ = ("texts", "confidences", "points", "_boxes", "_normalized_texts")
+
+    def __init__(self, texts: Sequence[str], confidences, points):
+        self.texts = list(texts)
+        self.confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+        self.points = np.asarray(points, dtype=np.int32).reshape(-1, 4, 2)
+        if not len(self.texts) == len(self.confidences) == len(self.points):
+            raise ValueError("texts, confidences and points must have the same length")
+        self._boxes = None
+        self._normalized_texts = None
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls([], np.zeros(0), np.zeros((0, 4, 2)))
+
+    @classmethod
+    def from_regions(cls, texts: Sequence[str], confidences, points, scale_factor: float = 1,
+                     offsets=(0, 0)) -> "Detections":
+        """
+        Detections from boxes found in scaled and offset image regions.
+
+        Args:
+            points: The 4 corner points of every box in its scaled region
+            scale_factor: Factor the regions were upscaled by before OCR
+            offsets: (x, y) position of the region in the image, or one (x, y) per box
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 4, 2)
+        offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 1, 2)
+        # Wie int(): Richtung null abschneiden, dann verschieben
+        return cls(texts, confidences, np.trunc(points / scale_factor).astype(np.int64) + offsets)
+
+    @classmethod
+    def from_json(cls, magnets: Iterable[Dict[str, Any]]) -> "Detections":
+        """Detections from the dict shape produced by to_json"""
+        magnets = list(magnets)
+        if not magnets:
+            return cls.empty()
+        return cls([magnet["text"] for magnet in magnets],
+                   [magnet.get("confidence", 0.0) for magnet in magnets],
+                   [magnet["position"]["points"] for magnet in magnets])
+
+    @classmethod
+    def concatenate(cls, parts: Iterable["Detections"]) -> "Detections":
+        parts = list(parts)
+        if not parts:
+            return cls.empty()
+        return cls([text for part in parts for text in part.texts],
+                   np.concatenate([part.confidences for part in parts]),
+                   np.concatenate([part.points for part in parts]))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index) -> "Detections":
+        """The detections selected by an index array, boolean mask or slice"""
+        if isinstance(index, slice):
+            return Detections(self.texts[index], self.confidences[index], self.points[index])
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        return Detections([self.texts[i] for i in index], self.confidences[index], self.points[index])
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """(n, 4) float64 array of axis-aligned (x_min, y_min, x_max, y_max) boxes"""
+        if self._boxes is None:
+            points = self.points.astype(np.float64)
+            self._boxes = np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1).reshape(-1, 4)
+        return self._boxes
+
+    @property
+    def normalized_texts(self) -> List[str]:
+        """Lowercased, stripped texts for comparisons"""
+        if self._normalized_texts is None:
+            self._normalized_texts = [text.lower().strip() for text in self.texts]
+        return self._normalized_texts
+
+    @property
+    def nbytes(self) -> int:
+        return self.confidences.nbytes + self.points.nbytes + sum(len(text) for text in self.texts)
+
+    def scaled(self, scale: float) -> "Detections":
+        """The detections with their points multiplied by `scale`, e.g. back to the original resolution"""
+        if scale == 1:
+            return self
+        return Detections(self.texts, self.confidences, np.round(self.points * scale))
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        """One {"text", "confidence", "position"} dict per detection, as returned by the API"""
+        magnets = []
+        for text, confidence, points in zip(self.texts, self.confidences.tolist(), self.points.tolist()):
+            magnets.append({
+                "text": text,
+                "confidence": confidence,
+                "position": {
+                    "x": points[0][0],
+                    "y": points[0][1],
+                    "width": points[2][0] - points[0][0],
+                    "height": points[2][1] - points[0][1],
+                    "points": [tuple(point) for point in points]
+                }
+            })
+        return magnets
@@ -140,6 +140,30 @@ function App() {
     e.preventDefault();
     if (!file || loading) return;
   
+    // Same image as before: regenerate from its session instead of uploading and OCRing again
+    if (result && result.session_id) {
+      setError(null);
+      setLoading(true);
+      setProcessingStep('Generating sentence...');
+      try {
+        const params = instructions.trim() ? `?instructions=${encodeURIComponent(instructions.trim())}` : '';
+        const response = await fetch(`http://localhost:8000/sessions/${result.session_id}/sentence${params}`, {
+          method: 'POST',
+        });
+        if (response.ok) {
+          const data = await response.json();
+          setResult({ ...result, sentence: data.sentence, used_words: data.used_words });
+          return;
+        }
+        // Expired session: fall through to a fresh upload
+      } catch (err) {
+        console.error('Error:', err);
+      } finally {
+        setLoading(false);
+        setProcessingStep('');
+      }
+    }
+
     // Clear previous results
     setResult(null);
     setError(null);
@@ -167,16 +191,13 @@ function App() {
       setProcessingStep('Analyzing results...');
       const data = await response.json();
       
-      if (data.sentence && data.used_words && data.base64_image && data.ocr_data) {
-        // Encode the image once when we receive it
-        const encodedImage = data.base64_image.startsWith('data:image') 
-          ? data.base64_image 
-          : `data:image/jpeg;base64,${data.base64_image}`;
-        
+      if (data.sentence && data.used_words && data.image_url && data.ocr_data) {
         setResult({
           sentence: data.sentence,
           used_words: data.used_words,
-          image_base64: encodedImage,
+          image_id: data.image_id,
+          session_id: data.session_id,
+          image_url: `http://localhost:8000${data.image_url}`,
           ocr_data: data.ocr_data
         });
         setError(null);
@@ -192,6 +213,37 @@ function App() {
     }
   };
 
+  const handleNextSentence = async () => {
+    if (!result || loading) return;
+
+    setError(null);
+    setLoading(true);
+    setProcessingStep('Fetching next sentence...');
+
+    try {
+      const params = new URLSearchParams();
+      if (result.session_id) params.set('session_id', result.session_id);
+      if (instructions.trim()) params.set('instructions', instructions.trim());
+      const response = await fetch(`http://localhost:8000/next-sentence/${result.image_id}?${params}`, {
+        method: 'POST',
+      });
+
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'Server error occurred');
+      }
+
+      const data = await response.json();
+      setResult({ ...result, sentence: data.sentence, used_words: data.used_words });
+    } catch (err) {
+      console.error('Error:', err);
+      setError(err.message || 'An unexpected error occurred');
+    } finally {
+      setLoading(false);
+      setProcessingStep('');
+    }
+  };
+
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
     setFile(selectedFile);
@@ -373,6 +425,26 @@ function App() {
           >
             {loading ? 'Processing...' : 'Generate Sentence'}
           </button>
+
+          {result && (
+            <button
+              type="button"
+              onClick={handleNextSentence}
+              disabled={loading}
+              style={{
+                padding: '10px 20px',
+                fontSize: '16px',
+                backgroundColor: loading ? '#ccc' : '#6c757d',
+                color: '#fff',
+                border: 'none',
+                borderRadius: '4px',
+                cursor: loading ? 'not-allowed' : 'pointer',
+                transition: 'background-color 0.3s'
+              }}
+            >
+              Next Sentence
+            </button>
+          )}
         </form>
         
         {error && (
@@ -570,7 +642,7 @@ function App() {
                 height: '100%'
               }}>
                 <ImageWithWords 
-                  imageData={result.image_base64} 
+                  imageData={result.image_url} 
                   ocrData={result.ocr_data} 
                   usedWords={result.used_words}
                   zoom={zoom}
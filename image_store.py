@@ -0,0 +1,102 @@
+import hashlib
+import io
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+from PIL import Image
+
+from bounded_store import BoundedStore
+from ocr_processor import load_image
+
+RENDITION_MEDIA_TYPE = "image/jpeg"
+RENDITION_JPEG_QUALITY = 85
+
+def sniff_media_type(content: bytes, fallback: Optional[str] = None) -> str:
+    """Media type of encoded image bytes, read from the image header"""
+    try:
+        with Image.open(io.BytesIO(content)) as header:
+            media_type = Image.MIME.get(header.format)
+    except Exception:
+        media_type = None
+    return media_type or fallback or "application/octet-stream"
+
+class StoredImage:
+    """An uploaded image and the downscaled renditions rendered from it so far"""
+    def __init__(self, image_id: str, content: bytes, media_type: str):
+        self.id = image_id
+        self.content = content
+        self.media_type = media_type
+        self.renditions: Dict[int, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(r) for r in self.renditions.values())
+
+class ImageStore:
+    """
+    Bounded in-memory store for uploaded images, addressed by the SHA-256 of their content.
+
+    Clients get an id back instead of the image itself and fetch the original or
+    a downscaled JPEG rendition by id. Renditions are rendered on first request
+    and kept with their image. The least recently used images are evicted once
+    `max_entries` or `max_bytes` is exceeded.
+    """
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._images = BoundedStore(max_entries, max_bytes)
+        self._lock = threading.Lock()
+
+    def put(self, content: bytes, media_type: Optional[str] = None) -> str:
+        """Store image bytes (a no-op if they are already stored) and return their id"""
+        image_id = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if self._images.get(image_id, touch=True) is not None:
+                return image_id
+        stored = StoredImage(image_id, content, sniff_media_type(content, media_type))
+        with self._lock:
+            if image_id not in self._images:
+                self._images.add(image_id, stored)
+            return image_id
+
+    def get(self, image_id: str) -> Optional[StoredImage]:
+        with self._lock:
+            return self._images.get(image_id, touch=True)
+
+    def rendition(self, image_id: str, max_side: Optional[int] = None) -> Optional[Tuple[bytes, str]]:
+        """
+        Get the original image or a rendition whose longest side is at most `max_side`.
+
+        Returns:
+            (content, media_type), or None if the image is unknown or was evicted
+        """
+        stored = self.get(image_id)
+        if stored is None:
+            return None
+        if not max_side:
+            return stored.content, stored.media_type
+
+        with self._lock:
+            content = stored.renditions.get(max_side)
+        if content is None:
+            image, scale = load_image(stored.content, max_side=max_side)
+            if scale == 1:
+                # Already small enough: the original is the rendition
+                return stored.content, stored.media_type
+            _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, RENDITION_JPEG_QUALITY])
+            content = buffer.tobytes()
+            with self._lock:
+                if image_id in self._images and max_side not in stored.renditions:
+                    stored.renditions[max_side] = content
+                    self._images.grow(len(content))
+        return content, RENDITION_MEDIA_TYPE
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "bytes": self._images.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
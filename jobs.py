@@ -0,0 +1,169 @@
+import asyncio
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Stages a job moves through, in order
+JOB_STAGES = ("queued", "preprocess", "ocr", "dedup", "llm", "done")
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the job queue is full"""
+
+class Job:
+    """A single asynchronous image-to-sentence request and its progress"""
+    def __init__(self, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"  # queued, running, done, failed
+        self.stage = "queued"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job for status responses"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [event for event in self.events if event["event"] == "stage"],
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobManager:
+    """
+    Bounded in-process job queue with worker tasks and result expiry.
+
+    `handler(job, **params)` does the actual work; it may report progress with
+    `report_stage` (from the event loop) or with the callable returned by
+    `stage_reporter` (from any thread). Finished jobs are kept for `result_ttl`
+    seconds so clients can poll or stream their result.
+    """
+    def __init__(self, handler: Callable[..., Awaitable[Dict[str, Any]]], workers: int = 2,
+                 max_queue: int = 32, result_ttl: float = 600):
+        self.handler = handler
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.jobs: Dict[str, Job] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Start worker tasks and the expiry task on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._expire_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, **params) -> Job:
+        """Queue a job, raising JobQueueFullError if the queue has no room"""
+        job = Job(params)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+        self.jobs[job.id] = job
+        self._publish(job, {"event": "stage", "stage": "queued", "time": job.created_at})
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def report_stage(self, job: Job, stage: str) -> None:
+        """Advance a job to a later stage; reports for earlier stages are ignored"""
+        if job.finished or JOB_STAGES.index(stage) <= JOB_STAGES.index(job.stage):
+            return
+        job.stage = stage
+        self._publish(job, {"event": "stage", "stage": stage, "time": time.time()})
+
+    def stage_reporter(self, job: Job) -> Callable[[str], None]:
+        """Thread-safe progress callback for work running outside the event loop"""
+        loop = self._loop
+        return lambda stage: loop.call_soon_threadsafe(self.report_stage, job, stage)
+
+    async def subscribe(self, job: Job) -> AsyncIterator[Dict[str, Any]]:
+        """Yield all past and future events of a job until it finishes"""
+        queue: asyncio.Queue = asyncio.Queue()
+        history = list(job.events)
+        if not job.finished:
+            job.subscribers.append(queue)
+        try:
+            for event in history:
+                yield event
+            if queue not in job.subscribers:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in ("done", "failed"):
+                    return
+        finally:
+            if queue in job.subscribers:
+                job.subscribers.remove(queue)
+
+    def _publish(self, job: Job, event: Dict[str, Any]) -> None:
+        job.events.append(event)
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                job.result = await self.handler(job, **job.params)
+                job.status = "done"
+                job.stage = "done"
+                job.finished_at = time.time()
+                self._publish(job, {"event": "done", "stage": "done", "time": job.finished_at,
+                                    "result": job.result})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = time.time()
+                self._publish(job, {"event": "failed", "stage": job.stage, "time": job.finished_at,
+                                    "error": job.error})
+            finally:
+                # Parameters can hold the uploaded image; drop them once the job is finished
+                job.params = {}
+                self._queue.task_done()
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Forget finished jobs older than result_ttl, returning how many were removed"""
+        now = now if now is not None else time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+        return len(expired)
+
+    async def _expire_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.result_ttl, 30))
+            self.expire()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "workers": self.workers,
+            "jobs": len(self.jobs)
+        }
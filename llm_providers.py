@@ -0,0 +1,330 @@
+import asyncio
+import email.utils
+import importlib.util
+import itertools
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+import ollama
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Responses worth retrying: rate limiting and transient server/gateway errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# HTTP/2 needs the optional h2 package; without it httpx falls back to HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class Completion:
+    """A finished completion with the token usage the provider reported (None where unknown)"""
+    def __init__(self, text: str, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                 truncated: bool = False, timings: Optional[Dict[str, float]] = None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.truncated = truncated
+        # Server-side durations in seconds (load_seconds, prompt_eval_seconds, eval_seconds), if reported
+        self.timings = timings or {}
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "truncated": self.truncated,
+            **self.timings
+        }
+
+class RetryableError(Exception):
+    """A provider failure worth retrying, optionally with the delay the server asked for"""
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delta seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class AsyncProvider:
+    """
+    Base class for asynchronous LLM providers.
+
+    Subclasses implement `_generate` and `_stream` and raise RetryableError for
+    failures worth retrying. This class retries those with jittered exponential
+    backoff (or the delay the server asked for) and caps the number of
+    concurrent requests per provider.
+
+    A `system` prompt is sent ahead of the prompt. Passing a JSON `schema`
+    constrains the output to it when the provider's `structured_output` setting
+    is on. `max_tokens` from the config caps every completion unless a call
+    passes its own `max_tokens`.
+
+    Providers hold connection pools bound to the event loop they were created on.
+    """
+    name = "provider"
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.max_retries = config.get("max_retries", 3)
+        self.backoff_base = config.get("backoff_base", 0.5)
+        self.backoff_max = config.get("backoff_max", 8.0)
+        self.max_retry_after = config.get("max_retry_after", 30.0)
+        self._semaphore = asyncio.Semaphore(config.get("max_concurrency", 4))
+
+    def timeout(self) -> httpx.Timeout:
+        read_timeout = self.config.get("read_timeout", 60.0)
+        return httpx.Timeout(read_timeout, connect=self.config.get("connect_timeout", 5.0))
+
+    def limits(self) -> httpx.Limits:
+        max_connections = self.config.get("max_connections", 16)
+        return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, unless the server said how long to wait"""
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @property
+    def structured_output(self) -> bool:
+        return self.config.get("structured_output", True)
+
+    async def generate(self, prompt: str, **options) -> Completion:
+        """Return the full completion for a prompt"""
+        for attempt in itertools.count():
+            try:
+                async with self._semaphore:
+                    return await self._generate(prompt, **options)
+            except RetryableError as e:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.retry_delay(attempt, e.retry_after))
+
+    async def stream(self, prompt: str, usage: Optional[Dict[str, Any]] = None, **options) -> AsyncIterator[str]:
+        """
+        Yield the completion in chunks; a failed attempt is only retried before its first chunk.
+
+        If given, `usage` is updated with the token usage once the stream ends.
+        """
+        usage = usage if usage is not None else {}
+        for attempt in itertools.count():
+            started = False
+            try:
+                async with self._semaphore:
+                    async for chunk in self._stream(prompt, usage, **options):
+                        started = True
+                        yield chunk
+                return
+            except RetryableError as e:
+                if started or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.retry_delay(attempt, e.retry_after))
+
+    async def _generate(self, prompt: str, **options) -> Completion:
+        raise NotImplementedError
+
+    def _stream(self, prompt: str, usage: Dict[str, Any], **options) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+class OpenRouterProvider(AsyncProvider):
+    """OpenRouter chat completions over a shared, keep-alive (HTTP/2 if available) connection pool"""
+    name = "openrouter"
+
+    def __init__(self, config: Dict[str, Any], transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(config)
+        self.client = httpx.AsyncClient(
+            transport=transport,
+            headers={
+                "Authorization": f"Bearer {config.get('api_key', '')}",
+                "Content-Type": "application/json"
+            },
+            timeout=self.timeout(),
+            limits=self.limits(),
+            http2=config.get("http2", True) and HTTP2_AVAILABLE
+        )
+
+    def _payload(self, prompt: str, stream: bool, system: Optional[str] = None,
+                 schema: Optional[Dict[str, Any]] = None, max_tokens: Optional[int] = None,
+                 **options) -> Dict[str, Any]:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": self.config.get("model", "qwen/qwq-32b:free"),
+            "messages": messages,
+            "temperature": self.config.get("temperature", 0.7),
+            "stream": stream,
+            # Ask OpenRouter to report token usage (in the last chunk when streaming)
+            "usage": {"include": True}
+        }
+        max_tokens = max_tokens or self.config.get("max_tokens")
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        if schema and self.structured_output:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "strict": True, "schema": schema}
+            }
+        payload.update(options)
+        return payload
+
+    def _check(self, response: httpx.Response) -> None:
+        if response.status_code in RETRY_STATUS_CODES:
+            raise RetryableError(f"OpenRouter returned HTTP {response.status_code}",
+                                 parse_retry_after(response.headers.get("Retry-After")))
+        response.raise_for_status()
+
+    async def _generate(self, prompt: str, **options) -> Completion:
+        try:
+            response = await self.client.post(OPENROUTER_URL, json=self._payload(prompt, False, **options))
+        except httpx.TransportError as e:
+            raise RetryableError(f"OpenRouter request failed: {e!r}")
+        self._check(response)
+        response_data = response.json()
+        if "error" in response_data:
+            raise RuntimeError(response_data["error"].get("message", "OpenRouter error"))
+        choice = response_data["choices"][0]
+        usage = response_data.get("usage") or {}
+        return Completion(
+            choice["message"]["content"] or "",
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            truncated=choice.get("finish_reason") == "length"
+        )
+
+    async def _stream(self, prompt: str, usage: Dict[str, Any], **options) -> AsyncIterator[str]:
+        try:
+            async with self.client.stream("POST", OPENROUTER_URL,
+                                          json=self._payload(prompt, True, **options)) as response:
+                self._check(response)
+                async for line in response.aiter_lines():
+                    # Server-sent events; lines starting with ":" are keep-alive comments
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        return
+                    chunk = json.loads(data)
+                    if "error" in chunk:
+                        raise RuntimeError(chunk["error"].get("message", "OpenRouter stream error"))
+                    if chunk.get("usage"):
+                        usage["prompt_tokens"] = chunk["usage"].get("prompt_tokens")
+                        usage["completion_tokens"] = chunk["usage"].get("completion_tokens")
+                    if not chunk.get("choices"):
+                        continue
+                    choice = chunk["choices"][0]
+                    if choice.get("finish_reason") == "length":
+                        usage["truncated"] = True
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        yield content
+        except httpx.TransportError as e:
+            raise RetryableError(f"OpenRouter request failed: {e!r}")
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+class OllamaProvider(AsyncProvider):
+    """Ollama generate API through ollama.AsyncClient with a pooled connection"""
+    name = "ollama"
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.client = ollama.AsyncClient(host=config.get("host"), timeout=self.timeout(), limits=self.limits())
+
+    def _request(self, prompt: str, stream: bool, system: Optional[str] = None,
+                 schema: Optional[Dict[str, Any]] = None, max_tokens: Optional[int] = None,
+                 **options) -> Awaitable:
+        model_options = {
+            "temperature": self.config.get("temperature", 0.7),
+            "top_p": self.config.get("top_p", 0.9)
+        }
+        max_tokens = max_tokens or self.config.get("max_tokens")
+        if max_tokens:
+            model_options["num_predict"] = max_tokens
+        if schema and self.structured_output:
+            options["format"] = schema
+        return self.client.generate(
+            model=self.config.get("model", "thirdeyeai/DeepSeek-R1-Distill-Qwen-7B-uncensored"),
+            prompt=prompt,
+            system=system,
+            options=model_options,
+            # Keep the model (and its cached prompt prefix) loaded between requests
+            keep_alive=self.config.get("keep_alive", "30m"),
+            stream=stream,
+            **options
+        )
+
+    @staticmethod
+    def _timings(response) -> Dict[str, float]:
+        # Ollama reports durations in nanoseconds
+        timings = {}
+        for key, name in (("load_duration", "load_seconds"), ("prompt_eval_duration", "prompt_eval_seconds"),
+                          ("eval_duration", "eval_seconds")):
+            if response.get(key) is not None:
+                timings[name] = response.get(key) / 1e9
+        return timings
+
+    @classmethod
+    def _usage(cls, response) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": response.get("prompt_eval_count"),
+            "completion_tokens": response.get("eval_count"),
+            "truncated": response.get("done_reason") == "length",
+            **cls._timings(response)
+        }
+
+    async def _call(self, call: Callable[[], Awaitable]):
+        try:
+            return await call()
+        except ollama.ResponseError as e:
+            if e.status_code in RETRY_STATUS_CODES:
+                raise RetryableError(f"Ollama returned HTTP {e.status_code}: {e.error}")
+            raise
+        except (ConnectionError, httpx.TransportError) as e:
+            raise RetryableError(f"Ollama request failed: {e!r}")
+
+    async def _generate(self, prompt: str, **options) -> Completion:
+        response = await self._call(lambda: self._request(prompt, False, **options))
+        usage = self._usage(response)
+        return Completion(response["response"], usage["prompt_tokens"], usage["completion_tokens"],
+                          usage["truncated"], self._timings(response))
+
+    async def _stream(self, prompt: str, usage: Dict[str, Any], **options) -> AsyncIterator[str]:
+        stream = await self._call(lambda: self._request(prompt, True, **options))
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                chunk = await self._call(iterator.__anext__)
+            except StopAsyncIteration:
+                return
+            if chunk.get("done"):
+                usage.update(self._usage(chunk))
+            if chunk["response"]:
+                yield chunk["response"]
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+PROVIDERS = {
+    "openrouter": OpenRouterProvider,
+    "ollama": OllamaProvider
+}
+
+def create_provider(name: str, config: Dict[str, Any]) -> AsyncProvider:
+    """Create the provider registered under `name` from its config section"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unsupported provider: {name}")
+    return PROVIDERS[name](config)
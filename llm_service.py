@@ -1,167 +1,850 @@
+import asyncio
 import json
-import re
-import requests
-import ollama
+import logging
 import random
-from typing import Dict, List, Any, Optional
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
 from config import Config
+from llm_providers import AsyncProvider, Completion, create_provider
+from metrics import LLM_PARSE_FALLBACKS, LLM_PROVIDER_ERRORS, record_stage, timed
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the "sentence" returned when a provider fails
+ERROR_PREFIXES = {"openrouter": "API-Fehler", "ollama": "Ollama-Fehler"}
+
+# Longest part of an unusable answer quoted back to the model when asking again
+REASK_ANSWER_MAX_CHARS = 1500
+
+# Static instructions, sent first so the inference server can cache their processed prefix
+SENTENCE_RULES = (
+    "Antworte nur auf deutsch. Baue aus den Wörtern, die du bekommst, einen Satz mit maximal 10 Wörtern. Es können noch wörter bei den zusätzlichen Anweisungen hinzukommen aber sonst benutze KEINE weiteren Wörter außer den gegebenen. "
+    "Die benutzten Wörter können sich auch nur so anhören wie die gegebenen Wörter. (so etwas wie weil und teil hört sich nicht gleich an und darf deswegen nicht einfach getauscht werden!)"
+    "Die Sätze/Wortzusammensetzungen sollen lustig, unhinged, eventuell beleidigend und kurz sein und nicht einfach nur zufällig die ersten paar Wörter aus der Liste sein. "
+)
+SYSTEM_PROMPT = SENTENCE_RULES + (
+    "WICHTIG: Deine Antwort MUSS ein valides JSON-Objekt sein, ohne Erklärungen drumherum. "
+    "In sentence schreibe den generierten Satz und in used_words die benutzten Wörter des generierten Satzes(wichtig vergiss nicht auch Konjunktionswörter oder ähnliches zu markieren):"
+    "{"
+    '  "sentence": "<der generierte Satz>",'
+    '  "used_words": ["<Wort1>", "<Wort2>", ...]'
+    "}"
+)
+VARIANTS_SYSTEM_PROMPT = SENTENCE_RULES + (
+    "Schreibe so viele verschiedene Sätze wie verlangt; jeder Satz soll sich deutlich von den anderen unterscheiden. "
+    "WICHTIG: Deine Antwort MUSS ein valides JSON-Objekt sein, ohne Erklärungen drumherum. "
+    "Schreibe für jeden Satz in sentence den generierten Satz und in used_words die benutzten Wörter dieses Satzes(wichtig vergiss nicht auch Konjunktionswörter oder ähnliches zu markieren):"
+    "{"
+    '  "sentences": [{"sentence": "<Satz 1>", "used_words": ["<Wort1>", ...]}, ...]'
+    "}"
+)
+
+# JSON schema of a sentence response, used to constrain providers with structured output
+SENTENCE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sentence": {"type": "string"},
+        "used_words": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["sentence", "used_words"],
+    "additionalProperties": False
+}
+VARIANTS_SCHEMA = {
+    "type": "object",
+    "properties": {"sentences": {"type": "array", "items": SENTENCE_SCHEMA}},
+    "required": ["sentences"],
+    "additionalProperties": False
+}
+
+def is_sentence_result(item: Any) -> bool:
+    """Whether a parsed object is {"sentence": str, "used_words": [str, ...]}"""
+    return (isinstance(item, dict) and isinstance(item.get("sentence"), str)
+            and isinstance(item.get("used_words"), list)
+            and all(isinstance(word, str) for word in item["used_words"]))
+
+def normalize_sentence(sentence: str) -> str:
+    """Comparison key for sentences: case, punctuation and spacing are ignored"""
+    return " ".join("".join(c for c in sentence.casefold() if c.isalnum() or c.isspace()).split())
+
+class SentenceBatchCache:
+    """
+    Pre-generated sentence variants per word list and instructions, served one at a time.
+    
+    Every entry remembers the sentences it already handed out, so refills never
+    repeat them. Entries expire `ttl` seconds after their last use, and at most
+    `max_entries` are kept (least recently used first out).
+    """
+    def __init__(self, max_entries: int = 256, ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+    
+    @staticmethod
+    def key(words: List[str], instructions: Optional[str]) -> Tuple:
+        return tuple(words), instructions or ""
+    
+    def entry(self, words: List[str], instructions: Optional[str]) -> Dict[str, Any]:
+        """The entry for a word list, created empty if it is missing or expired"""
+        key = self.key(words, instructions)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None or now - entry["used_at"] > self.ttl:
+            entry = {"sentences": deque(), "seen": set(), "refill": None}
+            self._entries[key] = entry
+        entry["used_at"] = now
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            if evicted["refill"] is not None:
+                evicted["refill"].cancel()
+        return entry
+    
+    def add(self, entry: Dict[str, Any], sentences: List[Dict[str, Any]]) -> int:
+        """Queue sentences that were not served or queued before; returns how many were new"""
+        added = 0
+        for sentence in sentences:
+            normalized = normalize_sentence(sentence["sentence"])
+            if normalized and normalized not in entry["seen"]:
+                entry["seen"].add(normalized)
+                entry["sentences"].append(sentence)
+                added += 1
+        return added
+    
+    def mark_served(self, entry: Dict[str, Any], sentences: List[Dict[str, Any]]) -> None:
+        """Remember sentences the client got elsewhere, so they are neither queued nor served again"""
+        served = {normalize_sentence(sentence["sentence"]) for sentence in sentences}
+        entry["seen"].update(served)
+        entry["sentences"] = deque(sentence for sentence in entry["sentences"]
+                                   if normalize_sentence(sentence["sentence"]) not in served)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "queued_sentences": sum(len(entry["sentences"]) for entry in self._entries.values()),
+            "max_entries": self.max_entries
+        }
+
+class IncrementalJSONExtractor:
+    """
+    Pull JSON objects out of LLM output as it streams in.
+    
+    Text is fed in arbitrary chunks. Braces are matched while tracking string
+    literals and escapes, and every object that closes (at any nesting level) is
+    parsed once. Objects containing all `required_keys` are collected. `result`
+    is the last of them, since reasoning models often sketch an answer before
+    giving the final one.
+    """
+    def __init__(self, required_keys=("sentence", "used_words")):
+        self.required_keys = required_keys
+        self.objects: List[Dict[str, Any]] = []
+        self._buffer = []
+        self._length = 0
+        self._open = []  # start offsets of the objects that are still open
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        return self.objects[-1] if self.objects else None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next chunk and return the objects it completed"""
+        completed = []
+        for char in text:
+            self._buffer.append(char)
+            self._length += 1
+            if not self._open:
+                # Outside of an object only an opening brace matters
+                if char == "{":
+                    self._open.append(self._length - 1)
+                else:
+                    self._buffer.clear()
+                    self._length = 0
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._open.append(self._length - 1)
+            elif char == "}":
+                start = self._open.pop()
+                obj = self._parse("".join(self._buffer[start:]))
+                if obj is not None:
+                    completed.append(obj)
+                if not self._open:
+                    self._buffer.clear()
+                    self._length = 0
+        self.objects.extend(completed)
+        return completed
+
+    def _parse(self, candidate: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(obj, dict) and all(key in obj for key in self.required_keys):
+            return obj
+        return None
+
+class UsageStats:
+    """Counts LLM requests, completions, parse failures, re-asks and token usage"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.completions = 0
+        self.parse_failures = 0
+        self.reasks = 0
+        self.fallbacks = 0
+        self.truncated = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Server-side timings, only reported by Ollama
+        self.timed_completions = 0
+        self.load_seconds = 0.0
+        self.prompt_eval_seconds = 0.0
+        self.eval_seconds = 0.0
+    
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+    
+    def record_completion(self, usage: Dict[str, Any], parsed: bool, reask: bool = False) -> None:
+        with self._lock:
+            self.completions += 1
+            self.parse_failures += not parsed
+            self.reasks += reask
+            self.truncated += bool(usage.get("truncated"))
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.completion_tokens += usage.get("completion_tokens") or 0
+            if usage.get("eval_seconds") is not None:
+                self.timed_completions += 1
+                self.load_seconds += usage.get("load_seconds") or 0.0
+                self.prompt_eval_seconds += usage.get("prompt_eval_seconds") or 0.0
+                self.eval_seconds += usage["eval_seconds"]
+    
+    def record_fallback(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
+        LLM_PARSE_FALLBACKS.inc()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timed = self.timed_completions
+            return {
+                "requests": self.requests,
+                "completions": self.completions,
+                "parse_failures": self.parse_failures,
+                "parse_failure_rate": self.parse_failures / self.completions if self.completions else 0.0,
+                "reasks": self.reasks,
+                "fallbacks": self.fallbacks,
+                "truncated": self.truncated,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "tokens_per_request": ((self.prompt_tokens + self.completion_tokens) / self.requests
+                                       if self.requests else 0.0),
+                "timed_completions": self.timed_completions,
+                "avg_load_seconds": self.load_seconds / timed if timed else None,
+                "avg_prompt_eval_seconds": self.prompt_eval_seconds / timed if timed else None,
+                "avg_eval_seconds": self.eval_seconds / timed if timed else None
+            }
+
+class CircuitBreaker:
+    """
+    Tracks the recent health of one LLM backend.
+    
+    The breaker opens when at least `max_error_rate` of the last `window` calls
+    failed (calls slower than `slow_call_seconds` count as failures). After
+    `cooldown` seconds a single trial call is let through: success closes the
+    breaker again, failure keeps it open for another cooldown.
+    """
+    def __init__(self, window: int = 20, min_calls: int = 5, max_error_rate: float = 0.5,
+                 slow_call_seconds: Optional[float] = None, cooldown: float = 30.0):
+        self.min_calls = min_calls
+        self.max_error_rate = max_error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.calls = deque(maxlen=window)  # (success, latency of successful calls)
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+    
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._trial_in_flight)
+    
+    def start(self) -> None:
+        """Note that a call is starting; in the half-open state this is the trial call"""
+        if self.state == "half_open":
+            self._trial_in_flight = True
+    
+    def cancel(self) -> None:
+        """A started call was abandoned without an outcome"""
+        self._trial_in_flight = False
+    
+    def record(self, ok: bool, latency: float) -> None:
+        success = ok and not (self.slow_call_seconds and latency > self.slow_call_seconds)
+        if self.opened_at is not None:
+            # Outcome of the trial call (or of a call started before the breaker opened)
+            self._trial_in_flight = False
+            if success:
+                self.opened_at = None
+                self.calls.clear()
+            elif self.state == "half_open":
+                self.opened_at = time.monotonic()
+            return
+        self.calls.append((success, latency if ok else None))
+        failures = sum(1 for call_success, _ in self.calls if not call_success)
+        if len(self.calls) >= self.min_calls and failures / len(self.calls) >= self.max_error_rate:
+            self.opened_at = time.monotonic()
+    
+    def error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(1 for success, _ in self.calls if not success) / len(self.calls)
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile (0-1) of recent successful calls, or None without enough samples"""
+        latencies = sorted(latency for _, latency in self.calls if latency is not None)
+        if len(latencies) < self.min_calls:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+class Backend:
+    """One provider/model/host combination the router can send requests to"""
+    def __init__(self, name: str, provider: str, config: Dict[str, Any], weight: float = 1.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.provider = provider
+        self.config = config
+        self.weight = weight
+        self.breaker = breaker or CircuitBreaker()
+
+class LLMRoutingError(Exception):
+    """Raised when no backend produced a usable response"""
+    def __init__(self, message: str, provider: Optional[str] = None, unparsed: bool = False):
+        super().__init__(message)
+        self.provider = provider
+        self.unparsed = unparsed
+
+class LLMRouter:
+    """
+    Sends LLM requests across several backends.
+    
+    Backends are picked at random in proportion to their weight, skipping those
+    whose circuit breaker is open. If the first request has not returned a
+    parsable answer after the backend's `hedge_percentile` latency (or
+    `hedge_delay` while there are too few samples), or fails outright, a second
+    request goes to another backend. The first response that parses wins and
+    the other request is cancelled. A backend whose answer does not parse is
+    asked again up to `max_reasks` times.
+    """
+    def __init__(self, backends: List[Backend], hedge_percentile: float = 0.9, hedge_delay: float = 5.0,
+                 min_hedge_delay: float = 0.5, max_attempts: int = 2, max_reasks: int = 1):
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_attempts = max_attempts
+        self.max_reasks = max_reasks
+        self.usage = UsageStats()
+    
+    @classmethod
+    def from_config(cls, config: Config) -> "LLMRouter":
+        routing = config.get_routing_config()
+        backends = []
+        for backend_config in config.get_llm_backends():
+            provider = backend_config["provider"]
+            if provider == "openrouter" and not backend_config.get("api_key"):
+                logger.warning("Skipping LLM backend %s: no API key", backend_config["name"])
+                continue
+            breaker = CircuitBreaker(
+                window=routing.get("breaker_window", 20),
+                min_calls=routing.get("breaker_min_calls", 5),
+                max_error_rate=routing.get("breaker_error_rate", 0.5),
+                slow_call_seconds=routing.get("breaker_slow_call_seconds"),
+                cooldown=routing.get("breaker_cooldown", 30.0)
+            )
+            backends.append(Backend(backend_config["name"], provider, backend_config,
+                                    backend_config.get("weight", 1.0), breaker))
+        return cls(
+            backends,
+            hedge_percentile=routing.get("hedge_percentile", 0.9),
+            hedge_delay=routing.get("hedge_delay", 5.0),
+            min_hedge_delay=routing.get("min_hedge_delay", 0.5),
+            max_attempts=routing.get("max_attempts", 2),
+            max_reasks=routing.get("max_reasks", 1)
+        )
+    
+    def choose(self, exclude=()) -> Optional[Backend]:
+        """Weighted random backend with a closed (or trial-ready) breaker, not in `exclude`"""
+        candidates = [b for b in self.backends if b not in exclude and b.weight > 0]
+        healthy = [b for b in candidates if b.breaker.available()]
+        # With every breaker open, a request still goes somewhere rather than failing outright
+        pool = healthy or candidates
+        if not pool:
+            return None
+        return random.choices(pool, weights=[b.weight for b in pool])[0]
+    
+    def hedge_delay(self, backend: Backend) -> float:
+        delay = backend.breaker.latency_percentile(self.hedge_percentile)
+        return max(self.min_hedge_delay, delay if delay is not None else self.default_hedge_delay)
+    
+    async def _attempt(self, backend: Backend, provider: AsyncProvider, prompt: str,
+                       parse: Callable[[str], Optional[Dict[str, Any]]],
+                       reask: Optional[Callable[[str, str], str]], options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        backend.breaker.start()
+        start = time.monotonic()
+        result = None
+        try:
+            current_prompt = prompt
+            for asked in range(self.max_reasks + 1):
+                with timed("llm_request", observe=True):
+                    completion: Completion = await provider.generate(current_prompt, **options)
+                logger.debug("Raw %s response: %s", backend.name, completion.text)
+                with timed("llm_parse", observe=True):
+                    result = parse(completion.text)
+                self.usage.record_completion(completion.usage(), result is not None, reask=asked > 0)
+                if result is not None or reask is None:
+                    break
+                current_prompt = reask(prompt, completion.text)
+        except asyncio.CancelledError:
+            backend.breaker.cancel()
+            raise
+        except Exception:
+            backend.breaker.record(False, time.monotonic() - start)
+            raise
+        backend.breaker.record(result is not None, time.monotonic() - start)
+        return result
+    
+    async def generate(self, prompt: str, provider_for: Callable[[Backend], AsyncProvider],
+                       parse: Callable[[str], Optional[Dict[str, Any]]],
+                       reask: Optional[Callable[[str, str], str]] = None,
+                       **options) -> Tuple[Dict[str, Any], Backend]:
+        """
+        Get the first parsable response for a prompt.
+        
+        Args:
+            prompt: Prompt to send
+            provider_for: Returns the provider client for a backend
+            parse: Turns a raw completion into a result, or None if it is unusable
+            reask: Builds the follow-up prompt from (prompt, unusable answer); None disables re-asks
+            options: Passed on to the provider (e.g. `schema`)
+            
+        Returns:
+            (parsed result, backend that produced it)
+        """
+        attempts: Dict[asyncio.Task, Backend] = {}
+        tried: List[Backend] = []
+        errors: List[Tuple[Backend, Exception]] = []
+        unparsed = False
+        
+        def launch() -> bool:
+            if len(tried) >= self.max_attempts:
+                return False
+            backend = self.choose(exclude=tried)
+            if backend is None:
+                return False
+            tried.append(backend)
+            task = asyncio.create_task(self._attempt(backend, provider_for(backend), prompt, parse, reask, options))
+            attempts[task] = backend
+            return True
+        
+        if not launch():
+            raise LLMRoutingError("No LLM backend configured")
+        can_hedge = True
+        try:
+            while attempts:
+                timeout = self.hedge_delay(tried[-1]) if can_hedge and len(tried) < self.max_attempts else None
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The request is slower than usual: hedge it on another backend
+                    can_hedge = launch()
+                    continue
+                for task in done:
+                    backend = attempts.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning("Error with %s: %s", backend.name, e)
+                        LLM_PROVIDER_ERRORS.labels(backend=backend.name, provider=backend.provider).inc()
+                        errors.append((backend, e))
+                        continue
+                    if result is not None:
+                        return result, backend
+                    unparsed = True
+                if not attempts:
+                    # Everything in flight failed; fail over to another backend if allowed
+                    can_hedge = launch()
+        finally:
+            for task in attempts:
+                task.cancel()
+        
+        if errors:
+            backend, error = errors[-1]
+            raise LLMRoutingError(str(error), provider=backend.provider, unparsed=unparsed)
+        raise LLMRoutingError("No parsable response", unparsed=unparsed)
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{
+            "name": backend.name,
+            "provider": backend.provider,
+            "weight": backend.weight,
+            "state": backend.breaker.state,
+            "error_rate": backend.breaker.error_rate(),
+            "p50_latency_s": backend.breaker.latency_percentile(0.5),
+            "hedge_latency_s": backend.breaker.latency_percentile(self.hedge_percentile)
+        } for backend in self.backends]
 
 class LLMService:
     def __init__(self):
         self.config = Config()
+        self.router = LLMRouter.from_config(self.config)
+        variants_config = self.config.get_variants_config()
+        self.variant_cache = SentenceBatchCache(
+            max_entries=variants_config.get("max_entries", 256),
+            ttl=variants_config.get("ttl", 900.0)
+        )
+        # Providers hold connection pools, which belong to one event loop
+        self._providers = weakref.WeakKeyDictionary()
 
-    def usePrompt(self, words: List[str], additional_prompt: Optional[str] = None) -> str:
+    def build_prompt(self, words: List[str], additional_prompt: Optional[str] = None,
+                     count: Optional[int] = None) -> Tuple[str, str]:
+        """
+        Build the (system prompt, user prompt) pair for a word list.
+        
+        Everything that changes per request (words, instructions, number of sentences,
+        timestamp and seed) is in the short user prompt after the static system prompt,
+        so inference servers can reuse the cached prefix. With `count`, the prompt asks
+        for that many sentences at once.
+        """
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         random_seed = random.randint(1, 1000)
         
-        prompt = (
-            f"Antworte nur auf deutsch. Baue aus diesen Wörtern einen Satz mit maximal 10 Wörtern: {', '.join(words)}. Es können noch wörter bei den zusätzlichen Anweisungen hinzukommen aber sonst benutze KEINE weiteren Wörter außer den gegebenen. "
-            "Die benutzten Wörter können sich auch nur so anhören wie die gegebenen Wörter. (so etwas wie weil und teil hört sich nicht gleich an und darf deswegen nicht einfach getauscht werden!)"
-            "Die Sätze/Wortzusammensetzungen sollen lustig, unhinged, eventuell beleidigend und kurz sein und nicht einfach nur zufällig die ersten paar Wörter aus der Liste sein. "
-        )
-        
+        prompt = f"Wörter: {', '.join(words)}\n"
         if additional_prompt:
-            prompt += f"\nZusätzliche Anweisungen: {additional_prompt}\n"
-            
+            prompt += f"Zusätzliche Anweisungen: {additional_prompt}\n"
+        if count:
+            prompt += f"Anzahl Sätze: {count}\n"
         prompt += (
             f"Aktueller Zeitpunkt: {current_time}. "
-            f"Zufälliger Seed für Variation: {random_seed}. "
-            "WICHTIG: Deine Antwort MUSS ein valides JSON-Objekt sein, ohne Erklärungen drumherum. "
-            "In sentence schreibe den generierten Satz und in used_words die benutzten Wörter des generierten Satzes(wichtig vergiss nicht auch Konjunktionswörter oder ähnliches zu markieren):"
-            "{"
-            '  "sentence": "<der generierte Satz>",'
-            '  "used_words": ["<Wort1>", "<Wort2>", ...]'
-            "}"
+            f"Zufälliger Seed für Variation: {random_seed}."
         )
-        return prompt
+        return (VARIANTS_SYSTEM_PROMPT if count else SYSTEM_PROMPT), prompt
 
     
+    def provider(self, backend: Backend) -> AsyncProvider:
+        """The provider client for a backend on the running event loop"""
+        providers = self._providers.setdefault(asyncio.get_running_loop(), {})
+        if backend.name not in providers:
+            providers[backend.name] = create_provider(backend.provider, backend.config)
+        return providers[backend.name]
+    
+    async def aclose(self) -> None:
+        """Close the connection pools of the providers used on the running event loop"""
+        providers = self._providers.pop(asyncio.get_running_loop(), {})
+        for provider in providers.values():
+            await provider.aclose()
+    
     def generate_sentence(self, words: list, additional_prompt: Optional[str] = None) -> Dict[str, Any]:
-        """Generate a sentence using the configured LLM provider"""
-        provider = self.config.get_current_provider()
-        
+        """Blocking wrapper around agenerate_sentence for callers without an event loop"""
+        async def generate():
+            try:
+                return await self.agenerate_sentence(words, additional_prompt)
+            finally:
+                await self.aclose()
+        return asyncio.run(generate())
+    
+    def _check_provider(self, words: list) -> Optional[Dict[str, Any]]:
+        """Validate the configured backends, returning a ready response if no request should be made"""
         if not words or len(words) == 0:
             return {"sentence": "Keine Wörter gefunden", "used_words": []}
-        
-        if provider == "openrouter":
-            return self._generate_with_openrouter(words, additional_prompt)
-        elif provider == "ollama":
-            return self._generate_with_ollama(words, additional_prompt)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        if not self.router.backends:
+            return {"sentence": "API-Schlüssel fehlt", "used_words": words}
+        return None
     
-    def _generate_with_openrouter(self, words: list, additional_prompt: Optional[str] = None) -> Dict[str, Any]:
-        """Generate text using OpenRouter API"""
-        config = self.config.get_provider_config()
-        api_key = config.get("api_key", "")
-        model = config.get("model", "qwen/qwq-32b:free")
+    def _error_result(self, provider: Optional[str], error: Exception, words: list) -> Dict[str, Any]:
+        prefix = ERROR_PREFIXES.get(provider, "API-Fehler")
+        return {"sentence": f"{prefix}: {str(error)}", "used_words": words}
+    
+    async def agenerate_sentence(self, words: list, additional_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a sentence, routed across the configured LLM backends"""
+        early_response = self._check_provider(words)
+        if early_response is not None:
+            return early_response
         
-        if not api_key:
-            return {"sentence": "API-Schlüssel fehlt", "used_words": words}
+        self.router.usage.record_request()
+        system, prompt = self.build_prompt(words, additional_prompt)
+        try:
+            result, _ = await self.router.generate(prompt, self.provider, self._extract_sentence,
+                                                   reask=self._reask_prompt, system=system, schema=SENTENCE_SCHEMA)
+            return result
+        except LLMRoutingError as e:
+            if e.unparsed:
+                self.router.usage.record_fallback()
+                return self._fallback_result(words)
+            return self._error_result(e.provider, e, words)
+    
+    async def _generate_variants_once(self, words: list, additional_prompt: Optional[str],
+                                      count: int) -> List[Dict[str, Any]]:
+        """One routed request for `count` sentences; returns the valid ones (possibly none)"""
+        system, prompt = self.build_prompt(words, additional_prompt, count=count)
+        max_tokens = self.config.get_provider_config().get("max_tokens")
+        options = {"system": system, "schema": VARIANTS_SCHEMA}
+        if max_tokens:
+            # Room for every sentence, not just one
+            options["max_tokens"] = max_tokens * count
+        try:
+            sentences, _ = await self.router.generate(prompt, self.provider, self._extract_variants,
+                                                      reask=self._reask_prompt, **options)
+            return sentences
+        except LLMRoutingError as e:
+            logger.warning("Error generating sentence variants: %s", e)
+            return []
+    
+    async def _generate_sentence_once(self, words: list, additional_prompt: Optional[str]) -> List[Dict[str, Any]]:
+        """One routed request for a single sentence; returns it in a list (empty on failure)"""
+        system, prompt = self.build_prompt(words, additional_prompt)
+        try:
+            result, _ = await self.router.generate(prompt, self.provider, self._extract_sentence,
+                                                   reask=self._reask_prompt, system=system, schema=SENTENCE_SCHEMA)
+            return [result]
+        except LLMRoutingError as e:
+            logger.warning("Error generating sentence variant: %s", e)
+            return []
+    
+    async def agenerate_variants(self, words: list, count: int, additional_prompt: Optional[str] = None,
+                                 exclude=()) -> List[Dict[str, Any]]:
+        """
+        Generate up to `count` distinct sentences for one word list.
         
-        prompt = self.usePrompt(words, additional_prompt)
+        With the "single_prompt" strategy one request asks for all sentences at once
+        and missing ones (duplicates or a short answer) are topped up by concurrent
+        single-sentence requests. "fan_out" sends `count` single-sentence requests
+        concurrently, which spreads them over all routed backends.
         
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        Args:
+            exclude: Normalized sentences that must not be returned again
+        """
+        if not words:
+            return []
+        self.router.usage.record_request()
+        seen = set(exclude)
+        variants = []
         
-        payload = {
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": config.get("temperature", 0.7)
-        }
+        def collect(sentences):
+            for sentence in sentences:
+                normalized = normalize_sentence(sentence["sentence"])
+                if normalized and normalized not in seen and len(variants) < count:
+                    seen.add(normalized)
+                    variants.append(sentence)
         
+        if self.config.get_variants_config().get("strategy", "single_prompt") == "single_prompt":
+            collect(await self._generate_variants_once(words, additional_prompt, count))
+        missing = count - len(variants)
+        if missing > 0:
+            for sentences in await asyncio.gather(*(self._generate_sentence_once(words, additional_prompt)
+                                                    for _ in range(missing))):
+                collect(sentences)
+        return variants
+    
+    async def _refill(self, entry: Dict[str, Any], words: list, additional_prompt: Optional[str]) -> None:
         try:
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            response_data = response.json()
-            print(response_data)
-            raw_response = response_data["choices"][0]["message"]["content"]
-            print(f"Raw OpenRouter response: {raw_response}")
-            return self._parse_llm_response(raw_response, words)
-        except Exception as e:
-            print(f"Error with OpenRouter API: {str(e)}")
-            return {"sentence": f"API-Fehler: {str(e)}", "used_words": words}
+            batch_size = self.config.get_variants_config().get("batch_size", 3)
+            sentences = await self.agenerate_variants(words, batch_size, additional_prompt, exclude=entry["seen"])
+            self.variant_cache.add(entry, sentences)
+        finally:
+            entry["refill"] = None
+    
+    def _start_refill(self, entry: Dict[str, Any], words: list, additional_prompt: Optional[str]) -> asyncio.Task:
+        if entry["refill"] is None:
+            entry["refill"] = asyncio.create_task(self._refill(entry, words, additional_prompt))
+        return entry["refill"]
+    
+    def is_generated(self, result: Dict[str, Any], words: list) -> bool:
+        """Whether a sentence result came from the model rather than an error, a missing backend or the fallback"""
+        if not words or not self.router.backends:
+            return False
+        sentence = result.get("sentence", "")
+        if sentence.startswith(tuple(f"{prefix}: " for prefix in ERROR_PREFIXES.values())):
+            return False
+        return sentence != self._fallback_result(words)["sentence"]
+    
+    def prefetch_variants(self, words: list, additional_prompt: Optional[str] = None,
+                          served: List[Dict[str, Any]] = ()) -> None:
+        """
+        Prepare next_sentence for a word list right after its first sentences were returned.
+        
+        The `served` sentences are never handed out again, and the next batch is generated
+        in the background so the first "next" is answered from it. Nothing is prefetched
+        unless a served sentence was generated, so failing backends get no extra load.
+        Needs a running event loop.
+        """
+        if not self.config.get_variants_config().get("prefetch", True):
+            return
+        if not any(self.is_generated(sentence, words) for sentence in served):
+            return
+        entry = self.variant_cache.entry(words, additional_prompt)
+        self.variant_cache.mark_served(entry, list(served))
+        if not entry["sentences"]:
+            self._start_refill(entry, words, additional_prompt)
+    
+    async def next_sentence(self, words: list, additional_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Serve the next pre-generated sentence for a word list.
+        
+        Uploads start generating the first batch in the background (see prefetch_variants);
+        otherwise the first call generates it. Later calls are answered from that batch,
+        and the next batch is generated in the background as soon as the current one
+        runs out.
+        
+        Returns:
+            {"sentence", "used_words", "remaining"} where remaining counts the queued variants
+        """
+        if not words:
+            return {"sentence": "Keine Wörter gefunden", "used_words": [], "remaining": 0}
+        entry = self.variant_cache.entry(words, additional_prompt)
+        if not entry["sentences"]:
+            refill = self._start_refill(entry, words, additional_prompt)
+            try:
+                await asyncio.shield(refill)
+            except asyncio.CancelledError:
+                # Cache eviction cancels the refill; only a cancelled request is passed on
+                if not refill.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        if not entry["sentences"]:
+            # No new variant could be generated; answer like a single request would
+            result = await self.agenerate_sentence(words, additional_prompt)
+            return {**result, "remaining": 0}
+        sentence = entry["sentences"].popleft()
+        if not entry["sentences"]:
+            self._start_refill(entry, words, additional_prompt)
+        return {**sentence, "remaining": len(entry["sentences"])}
     
-    def _generate_with_ollama(self, words: list, additional_prompt: Optional[str] = None) -> Dict[str, Any]:
-        """Generate text using local Ollama instance"""
-        config = self.config.get_provider_config()
-        model = config.get("model", "thirdeyeai/DeepSeek-R1-Distill-Qwen-7B-uncensored")
+    async def astream_sentence(self, words: list, additional_prompt: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a sentence while streaming the raw completion.
         
-        prompt = self.usePrompt(words, additional_prompt)
+        Streams come from a single backend picked by the router (tokens cannot be hedged).
+        Yields {"event": "token", "text": ...} for every chunk the provider sends and
+        finally {"event": "result", "sentence": ..., "used_words": [...]}.
+        """
+        early_response = self._check_provider(words)
+        if early_response is not None:
+            yield {"event": "result", **early_response}
+            return
         
+        self.router.usage.record_request()
+        backend = self.router.choose()
+        extractor = IncrementalJSONExtractor()
+        raw_response = []
+        usage = {}
+        system, prompt = self.build_prompt(words, additional_prompt)
+        backend.breaker.start()
+        start = time.monotonic()
         try:
-               
-            response = ollama.generate(
-                model=model,
-                prompt=prompt,
-                options={
-                    "temperature": config.get("temperature", 0.7),
-                    "top_p": config.get("top_p", 0.9)
-                }
-            )
-            
-            raw_response = response["response"]
-            print(f"Raw Ollama response: {raw_response}")
-            return self._parse_llm_response(raw_response, words)
+            async for chunk in self.provider(backend).stream(prompt, usage=usage, system=system,
+                                                             schema=SENTENCE_SCHEMA):
+                raw_response.append(chunk)
+                extractor.feed(chunk)
+                yield {"event": "token", "text": chunk}
         except Exception as e:
-            print(f"Error with Ollama: {str(e)}")
-            return {"sentence": f"Ollama-Fehler: {str(e)}", "used_words": words}
+            backend.breaker.record(False, time.monotonic() - start)
+            LLM_PROVIDER_ERRORS.labels(backend=backend.name, provider=backend.provider).inc()
+            logger.warning("Error streaming from %s: %s", backend.name, e)
+            yield {"event": "result", **self._error_result(backend.provider, e, words)}
+            return
+        except BaseException:
+            # Client went away (generator closed or task cancelled)
+            backend.breaker.cancel()
+            raise
+        
+        result = extractor.result if is_sentence_result(extractor.result) else None
+        backend.breaker.record(result is not None, time.monotonic() - start)
+        record_stage("llm_request", time.monotonic() - start, observe=True)
+        self.router.usage.record_completion(usage, result is not None)
+        logger.debug("Raw streamed response: %s", "".join(raw_response))
+        if result is None:
+            self.router.usage.record_fallback()
+            result = self._fallback_result(words)
+        yield {"event": "result", **result}
+    
+    def _reask_prompt(self, prompt: str, invalid_response: str) -> str:
+        """
+        Follow-up prompt after an answer that contained no valid JSON object.
+        
+        Requests are stateless, so the unusable answer is quoted in the prompt (without
+        its reasoning block and cut to its last REASK_ANSWER_MAX_CHARS characters).
+        """
+        answer = re.sub(r"<think>.*?(</think>|$)", "", invalid_response, flags=re.DOTALL).strip()
+        answer = answer[-REASK_ANSWER_MAX_CHARS:] or "(leer)"
+        return (
+            f"{prompt}\n"
+            f"Deine letzte Antwort war:\n\"\"\"\n{answer}\n\"\"\"\n"
+            "Sie enthielt kein valides JSON-Objekt. Antworte jetzt NUR mit dem JSON-Objekt "
+            "im verlangten Format, ohne Text davor oder danach."
+        )
+    
+    def _extract_sentence(self, raw_response: str) -> Optional[Dict[str, Any]]:
+        """The last JSON object with sentence and used_words in a completion, or None if it has none or wrong types"""
+        extractor = IncrementalJSONExtractor()
+        extractor.feed(raw_response)
+        # Ohne Schema-Zwang kommen auch falsche Typen vor; die werden wie fehlendes JSON neu erfragt
+        return extractor.result if is_sentence_result(extractor.result) else None
+    
+    def _extract_variants(self, raw_response: str) -> Optional[List[Dict[str, Any]]]:
+        """The valid sentences of the last {"sentences": [...]} object in a completion, or None"""
+        extractor = IncrementalJSONExtractor(required_keys=("sentences",))
+        extractor.feed(raw_response)
+        if extractor.result is None or not isinstance(extractor.result["sentences"], list):
+            return None
+        sentences = [
+            {"sentence": item["sentence"], "used_words": item["used_words"]}
+            for item in extractor.result["sentences"]
+            if is_sentence_result(item)
+        ]
+        return sentences or None
     
     def _parse_llm_response(self, raw_response: str, words: list) -> Dict[str, Any]:
         """Parse the LLM response to extract the generated sentence and used words"""
         try:
-            # First attempt: direct JSON parsing
-            try:
-                result = json.loads(raw_response.strip())
-                if "sentence" in result and "used_words" in result:
-                    return result
-            except json.JSONDecodeError:
-                pass
-            
-            # Second attempt: find JSON-like content using regex
-            json_match = re.search(r'({[\s\S]*?})', raw_response)
-            if json_match:
-                json_str = json_match.group(1)
-                try:
-                    result = json.loads(json_str)
-                    if "sentence" in result and "used_words" in result:
-                        return result
-                except json.JSONDecodeError:
-                    pass
-            
-            # Third attempt: construct JSON from parts
-            sentence_match = re.search(r'"sentence"\s*:\s*"([^"]+)"', raw_response)
-            words_match = re.search(r'"used_words"\s*:\s*\[(.*?)\]', raw_response, re.DOTALL)
-            
-            if sentence_match and words_match:
-                sentence = sentence_match.group(1)
-                words_text = words_match.group(1)
-                used_words = [w.strip(' "\'') for w in re.findall(r'"([^"]+)"', words_text)]
-                
-                return {
-                    "sentence": sentence,
-                    "used_words": used_words
-                }
+            result = self._extract_sentence(raw_response)
+            if result is not None:
+                return result
             
             # If all parsing attempts failed, fallback to simple response
-            fallback_sentence = " ".join(words[:5]) + "..."
-            return {
-                "sentence": fallback_sentence,
-                "used_words": words
-            }
+            return self._fallback_result(words)
             
         except Exception as e:
-            print(f"Error parsing LLM response: {str(e)}")
+            logger.warning("Error parsing LLM response: %s", e)
             # Fallback response
             return {
                 "sentence": f"Lustiger Satz mit: {', '.join(words[:3])}...",
                 "used_words": words
             }
+    
+    def _fallback_result(self, words: list) -> Dict[str, Any]:
+        """Response used when no valid JSON object could be found in the completion"""
+        fallback_sentence = " ".join(words[:5]) + "..."
+        return {
+            "sentence": fallback_sentence,
+            "used_words": words
+        }
@@ -1,12 +1,26 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Header, UploadFile
+from typing import List, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from ocr_processor import process_image, create_marked_image
-import tempfile
-import os
+from ocr_processor import QUALITY_PROFILES, create_marked_image, ocr_parameters
+import asyncio
 import base64
+import logging
 
 from llm_service import LLMService
+from config import Config
+from ocr_cache import OCRResultCache, make_cache_key
+from ocr_workers import OCRWorkerPool, OCRQueueFullError
+from jobs import JobManager, JobQueueFullError
+from image_store import ImageStore
+from sessions import SessionStore
+from artifacts import ARTIFACT_KINDS, ARTIFACT_MEDIA_TYPE, ArtifactStore
+from metrics import (OCR_CACHE_LOOKUPS, collect_timings, current_timings, observe_ocr_stats, observe_stages,
+                     render_metrics, timed, track_queue)
+from batch import BatchTooLargeError, PipelineStage, is_zip, run_pipeline, zip_images
+import serialization
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 app.add_middleware(
@@ -19,80 +33,607 @@ app.add_middleware(
 
 # Initialize LLM service
 llm_service = LLMService()
+config = Config()
 
-@app.post("/process-image/")
-async def process_image_run(file: UploadFile = File(...)):
-    try:
-        # Temporäre Datei erstellen
-        with tempfile.NamedTemporaryFile(delete=False) as temp:
-            contents = await file.read()  # await the file read
-            temp.write(contents)
-            temp_path = temp.name
+# Cache für OCR-Ergebnisse wiederholt hochgeladener Bilder
+cache_config = config.get_cache_config()
+ocr_cache = OCRResultCache(
+    max_entries=cache_config.get("max_entries", 128),
+    disk_dir=cache_config.get("disk_dir")
+)
+
+# Hochgeladene Bilder werden per ID ausgeliefert statt als Base64 in jeder Antwort
+images_config = config.get_images_config()
+image_store = ImageStore(
+    max_entries=images_config.get("max_entries", 64),
+    max_bytes=images_config.get("max_bytes", 256 * 1024 * 1024)
+)
+
+# Sitzungen: OCR-Ergebnis wiederverwenden, wenn nur die Anweisungen geändert werden
+sessions_config = config.get_sessions_config()
+session_store = SessionStore(
+    max_sessions=sessions_config.get("max_sessions", 1024),
+    max_bytes=sessions_config.get("max_bytes", 64 * 1024 * 1024),
+    ttl=sessions_config.get("ttl", 1800)
+)
+
+# Debug-Bilder werden erst auf Anfrage aus den aufbewahrten Erkennungen gezeichnet
+artifacts_config = config.get_artifacts_config()
+artifact_store = ArtifactStore(
+    max_entries=artifacts_config.get("max_entries", 32),
+    max_bytes=artifacts_config.get("max_bytes", 64 * 1024 * 1024),
+    ttl=artifacts_config.get("ttl", 900)
+)
+
+# OCR läuft in eigenen Prozessen, damit der Event-Loop frei bleibt
+ocr_config = config.get_ocr_config()
+ocr_pool = OCRWorkerPool(
+    workers=ocr_config.get("worker_processes", 2),
+    max_queue=ocr_config.get("max_queue", 16),
+    engine_pool_size=ocr_config.get("engine_pool_size", 1),
+    engine_settings={
+        "cpu_threads": ocr_config.get("cpu_threads", 4),
+        "enable_mkldnn": ocr_config.get("enable_mkldnn", False),
+        "rec_batch_num": ocr_config.get("rec_batch_num", 16),
+        "det_max_side": ocr_config.get("det_max_side", 1920)
+    }
+)
+
+@app.on_event("startup")
+def warm_ocr_engines():
+    # OCR-Modelle einmalig laden, damit kein Request die Modellinitialisierung bezahlt
+    ocr_pool.warm_up()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    ocr_pool.shutdown()
+    # Verbindungspools der LLM-Provider schließen
+    await llm_service.aclose()
+
+def ocr_settings(quality: str = None) -> dict:
+    """Per-request keyword arguments for process_image taken from the OCR config"""
+    ocr_config = config.get_ocr_config()
+    return {
+        "mode": ocr_config.get("pipeline_mode", "sliding_window"),
+        "det_max_side": ocr_config.get("det_max_side", 1920),
+        "min_ink_ratio": ocr_config.get("min_ink_ratio", 0.002),
+        "decode_max_side": ocr_config.get("decode_max_side"),
+        "profile": quality or ocr_config.get("quality_profile", "balanced")
+    }
+
+def quality_error(quality: str = None) -> Optional[JSONResponse]:
+    """A 400 response for an unknown quality profile, or None if it is valid or not given"""
+    if quality is None or quality in QUALITY_PROFILES:
+        return None
+    return JSONResponse({"error": f"quality must be one of {list(QUALITY_PROFILES)}"}, status_code=400)
+
+async def run_ocr(contents: bytes, progress=None, debug: bool = False, quality: str = None) -> dict:
+    """
+    Run OCR on uploaded image bytes in the worker pool, serving repeated uploads from the cache.
+
+    `quality` overrides the configured quality profile. With `debug`, the detections
+    removed by deduplication are kept as an artifact and the result gets its
+    request_id and the URLs of the debug images.
+    """
+    settings = ocr_settings(quality)
+    parameters = ocr_parameters(**settings)
+    if debug:
+        # Ergebnisse mit verworfenen Erkennungen getrennt cachen
+        parameters["keep_rejected"] = True
+    key = make_cache_key(contents, parameters)
+    result = ocr_cache.get(key)
+    OCR_CACHE_LOOKUPS.labels(result="miss" if result is None else "hit").inc()
+    if result is None:
+        with timed("ocr_pool", observe=True):
+            result = await ocr_pool.run(contents, progress=progress, keep_rejected=debug, **settings)
+        # Stufenzeiten kommen aus dem Worker-Prozess mit dem Ergebnis zurück; sie gehören nicht in den Cache
+        stage_timings = result.pop("timings", {})
+        observe_stages(stage_timings)
+        observe_ocr_stats(result.get("stats", {}))
+        request_timings = current_timings()
+        if request_timings is not None:
+            request_timings.merge(stage_timings)
+        ocr_cache.put(key, result)
+    if debug:
+        artifact = artifact_store.create(contents, result["magnets"], result.get("rejected", []))
+        result = {key: value for key, value in result.items() if key != "rejected"}
+        result.update(request_id=artifact.id, artifacts=artifact.urls())
+    return result
+
+class NoTextDetectedError(Exception):
+    """Raised when OCR finds no words to build a sentence from"""
+
+async def detect_words(file_content: bytes, progress=None, debug: bool = False, quality: str = None) -> tuple:
+    """
+    OCR an uploaded image and return (ocr_data, words), raising NoTextDetectedError if it has no text.
+    """
+    # Process OCR, reusing the cached result for repeated uploads
+    ocr_data = await run_ocr(file_content, progress=progress, debug=debug, quality=quality)
+    
+    # Check if we got valid OCR results
+    if not ocr_data or "magnets" not in ocr_data or not ocr_data["magnets"]:
+        raise NoTextDetectedError("No text detected in image")
+    
+    # Ensure each magnet has the expected structure
+    for magnet in ocr_data["magnets"]:
+        if "text" not in magnet:
+            magnet["text"] = "Unknown"
+        
+        # If box is missing or incomplete, add a default box
+        if "box" not in magnet or not all(k in magnet["box"] for k in ["x", "y", "w", "h"]):
+            magnet["box"] = {"x": 10, "y": 10, "w": 100, "h": 30}
+    
+    words = [item["text"] for item in ocr_data.get("magnets", [])]
+    logger.debug("Detected words: %s", words)
+    return ocr_data, words
+
+def image_reference(file_content: bytes, media_type: str = None, include_base64: bool = False) -> dict:
+    """Store the uploaded image and describe where the client can fetch it"""
+    image_id = image_store.put(file_content, media_type)
+    reference = {"image_id": image_id, "image_url": f"/images/{image_id}"}
+    if include_base64:
+        reference["base64_image"] = base64.b64encode(file_content).decode('utf-8')
+    return reference
+
+def upload_reference(file_content: bytes, ocr_data: dict, words: list, media_type: str = None,
+                     include_base64: bool = False) -> dict:
+    """Image reference plus a session bound to the OCR result, for regenerating without re-uploading"""
+    reference = image_reference(file_content, media_type, include_base64)
+    session = session_store.create(ocr_data, words, image_id=reference["image_id"])
+    return {**reference, "session_id": session.id, "session_url": f"/sessions/{session.id}"}
+
+async def generate_sentence_result(file_content: bytes, instructions: str = None, include_base64: bool = False,
+                                   media_type: str = None, progress=None, on_llm_start=None,
+                                   debug: bool = False, quality: str = None) -> dict:
+    """
+    OCR an uploaded image and generate a sentence from the detected words.
+
+    Args:
+        file_content: Uploaded image bytes
+        instructions: Optional extra instructions for the LLM
+        include_base64: Also return the uploaded image inline as base64
+        media_type: Content type sent with the upload, used if the format cannot be sniffed
+        progress: Optional callback receiving OCR stage names (called from a worker thread)
+        on_llm_start: Optional callback invoked on the event loop before the LLM call
+        debug: Keep the detections for debug images (see run_ocr)
+        quality: Quality profile overriding the configured one
 
-        # Bildverarbeitung durchführen - no await needed since it's synchronous
-        result = process_image(temp_path)
+    Returns:
+        Dict with sentence, used_words, ocr_data, image_id, image_url, session_id
+        and session_url (plus base64_image, request_id and artifacts if requested)
+    """
+    ocr_data, words = await detect_words(file_content, progress=progress, debug=debug, quality=quality)
+    debug_reference = {key: ocr_data.pop(key) for key in ("request_id", "artifacts") if key in ocr_data}
+    
+    if on_llm_start:
+        on_llm_start()
+    # Generate sentence using the service with optional instructions
+    sentence_result = await llm_service.agenerate_sentence(words, instructions)
+    logger.debug("Generated sentence result: %s", sentence_result)
+    # "Nächster Satz" soll sofort aus dem Vorrat antworten und diesen Satz nicht wiederholen
+    llm_service.prefetch_variants(words, instructions, [sentence_result])
+    
+    # Combine results
+    return {
+        "sentence": sentence_result.get("sentence", "Error generating sentence"),
+        "used_words": sentence_result.get("used_words", words),
+        "ocr_data": ocr_data,
+        **upload_reference(file_content, ocr_data, words, media_type, include_base64),
+        **debug_reference
+    }
 
-        # Temporäre Datei löschen
-        os.unlink(temp_path)
+def api_response(content, accept: str = None, status_code: int = 200) -> Response:
+    """Response body serialized with orjson, or as MessagePack if the Accept header asks for it"""
+    body, media_type = serialization.encode(content, accept)
+    return Response(content=body, media_type=media_type, status_code=status_code)
 
-        return JSONResponse(result)
+def sse_event(name: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {name}\ndata: {serialization.dumps(data).decode()}\n\n"
+
+async def run_sentence_job(job, file_content: bytes, instructions: str = None, include_base64: bool = False,
+                           media_type: str = None, quality: str = None) -> dict:
+    """Job handler: the sentence pipeline with stage updates published on the job"""
+    return await generate_sentence_result(
+        file_content,
+        instructions,
+        include_base64=include_base64,
+        media_type=media_type,
+        progress=job_manager.stage_reporter(job),
+        on_llm_start=lambda: job_manager.report_stage(job, "llm"),
+        quality=quality
+    )
+
+# Asynchrone Jobs: Upload sofort bestätigen, Fortschritt per Polling oder SSE
+jobs_config = config.get_jobs_config()
+job_manager = JobManager(
+    run_sentence_job,
+    workers=jobs_config.get("workers", 2),
+    max_queue=jobs_config.get("max_queue", 32),
+    result_ttl=jobs_config.get("result_ttl", 600)
+)
+
+@app.on_event("startup")
+async def start_job_manager():
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def stop_job_manager():
+    await job_manager.stop()
+
+# Warteschlangen für /metrics
+track_queue("ocr_in_flight", lambda: ocr_pool.stats()["in_flight"])
+track_queue("ocr_queued", lambda: ocr_pool.stats()["queued"])
+track_queue("jobs_queued", lambda: job_manager.stats()["queued"])
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/ocr-cache/stats")
+async def ocr_cache_stats():
+    return JSONResponse(ocr_cache.stats())
+
+@app.get("/images/stats")
+async def image_store_stats():
+    return JSONResponse(image_store.stats())
+
+@app.get("/images/{image_id}")
+async def get_image(image_id: str, max_side: int = None, if_none_match: str = Header(None)):
+    """Serve an uploaded image, or a JPEG rendition downscaled to max_side, with cache validators"""
+    if max_side is not None and max_side <= 0:
+        return JSONResponse({"error": "max_side must be positive"}, status_code=400)
+    # Images are addressed by their content hash, so a response never changes
+    etag = f'"{image_id}-{max_side}"' if max_side else f'"{image_id}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if image_store.get(image_id) is None:
+        return JSONResponse({"error": "Unknown or expired image"}, status_code=404)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    rendition = await asyncio.to_thread(image_store.rendition, image_id, max_side)
+    if rendition is None:
+        return JSONResponse({"error": "Unknown or expired image"}, status_code=404)
+    content, media_type = rendition
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@app.get("/artifacts/stats")
+async def artifact_store_stats():
+    return JSONResponse(artifact_store.stats())
+
+@app.get("/artifacts/{request_id}/{kind}")
+async def get_artifact(request_id: str, kind: str):
+    """Serve a debug image of a request made with debug=true, drawing it on first access"""
+    if kind not in ARTIFACT_KINDS:
+        return JSONResponse({"error": f"Unknown artifact kind, expected one of {list(ARTIFACT_KINDS)}"},
+                            status_code=404)
+    content = await asyncio.to_thread(artifact_store.render, request_id, kind)
+    if content is None:
+        return JSONResponse({"error": "Unknown or expired artifact"}, status_code=404)
+    return Response(content=content, media_type=ARTIFACT_MEDIA_TYPE, headers={"Cache-Control": "private"})
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return JSONResponse({
+        "backends": llm_service.router.stats(),
+        "usage": llm_service.router.usage.snapshot(),
+        "variants": llm_service.variant_cache.stats()
+    })
+
+@app.get("/ocr-workers/stats")
+async def ocr_worker_stats():
+    return JSONResponse(ocr_pool.stats())
+
+@app.post("/process-image/")
+async def process_image_run(file: UploadFile = File(...), timings: bool = False, debug: bool = False,
+                            quality: str = None, accept: str = Header(None)):
+    error = quality_error(quality)
+    if error:
+        return error
+    try:
+        contents = await file.read()  # await the file read
+        with collect_timings() as request_timings:
+            result = await run_ocr(contents, debug=debug, quality=quality)
+        if timings:
+            result = {**result, "timings": request_timings.totals()}
+
+        return api_response(result, accept)
+    except OCRQueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
 @app.post("/generate-sentence-from-image/")
-async def generate_sentence_from_image(file: UploadFile = File(...), instructions: str = None):
+async def generate_sentence_from_image(file: UploadFile = File(...), instructions: str = None,
+                                       include_base64: bool = False, timings: bool = False, debug: bool = False,
+                                       quality: str = None, accept: str = Header(None)):
+    error = quality_error(quality)
+    if error:
+        return error
     try:
         # Save the file content for later use
         file_content = await file.read()
-        
-        # Create a temporary file for OCR processing
-        with tempfile.NamedTemporaryFile(delete=False) as temp:
-            temp.write(file_content)
-            temp_path = temp.name
-        
-        try:
-            # Process OCR directly with the temporary file path
-            ocr_data = process_image(temp_path)
-            
-            # Check if we got valid OCR results
-            if not ocr_data or "magnets" not in ocr_data or not ocr_data["magnets"]:
-                return JSONResponse({"error": "No text detected in image"}, status_code=400)
-            
-            # Ensure each magnet has the expected structure
-            for magnet in ocr_data["magnets"]:
-                if "text" not in magnet:
-                    magnet["text"] = "Unknown"
-                
-                # If box is missing or incomplete, add a default box
-                if "box" not in magnet or not all(k in magnet["box"] for k in ["x", "y", "w", "h"]):
-                    magnet["box"] = {"x": 10, "y": 10, "w": 100, "h": 30}
-            
-            words = [item["text"] for item in ocr_data.get("magnets", [])]
-            print(f"Detected words: {words}")
-            
-            # Generate sentence using the service with optional instructions
-            sentence_result = llm_service.generate_sentence(words, instructions)
-            print(f"Generated sentence result: {sentence_result}")
-            
-            # Return the original image
-            original_image_base64 = base64.b64encode(file_content).decode('utf-8')
-            
-            # Combine results
-            complete_result = {
-                "sentence": sentence_result.get("sentence", "Error generating sentence"),
-                "used_words": sentence_result.get("used_words", words),
-                "ocr_data": ocr_data,
-                "base64_image": original_image_base64
-            }
-            
-            return JSONResponse(content=complete_result)
-            
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        with collect_timings() as request_timings:
+            complete_result = await generate_sentence_result(file_content, instructions, include_base64,
+                                                             media_type=file.content_type, debug=debug,
+                                                             quality=quality)
+        if timings:
+            complete_result["timings"] = request_timings.totals()
+        return api_response(complete_result, accept)
             
+    except NoTextDetectedError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except OCRQueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JSONResponse({"error": f"Processing error: {str(e)}"}, status_code=500)
+
+@app.post("/generate-sentences-from-image/")
+async def generate_sentences_from_image(file: UploadFile = File(...), count: int = None, instructions: str = None,
+                                        include_base64: bool = False, quality: str = None,
+                                        accept: str = Header(None)):
+    """OCR an uploaded image and generate up to `count` distinct sentences from its words"""
+    error = quality_error(quality)
+    if error:
+        return error
+    variants_config = config.get_variants_config()
+    count = count or variants_config.get("batch_size", 3)
+    if not 1 <= count <= variants_config.get("max_count", 10):
+        return JSONResponse({"error": f"count must be between 1 and {variants_config.get('max_count', 10)}"},
+                            status_code=400)
+    try:
+        file_content = await file.read()
+        ocr_data, words = await detect_words(file_content, quality=quality)
+        sentences = await llm_service.agenerate_variants(words, count, instructions)
+        llm_service.prefetch_variants(words, instructions, sentences)
+        return api_response({
+            "sentences": sentences,
+            "ocr_data": ocr_data,
+            **upload_reference(file_content, ocr_data, words, file.content_type, include_base64)
+        }, accept)
+    except NoTextDetectedError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except OCRQueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JSONResponse({"error": f"Processing error: {str(e)}"}, status_code=500)
+
+@app.post("/next-sentence/{image_id}")
+async def next_sentence(image_id: str, instructions: str = None, session_id: str = None, quality: str = None,
+                        accept: str = Header(None)):
+    """
+    Serve the next sentence for an uploaded image from its pre-generated batch.
+
+    The image is referenced by the image_id of an earlier upload. The words come from
+    that upload's session (`session_id`, or the latest session of the image), so the
+    OCR result matches the one the upload was answered with. Only without a session
+    is the stored image OCRed again, with the given `quality` profile.
+    """
+    error = quality_error(quality)
+    if error:
+        return error
+    session = session_store.get(session_id) if session_id else session_store.find_by_image(image_id)
+    try:
+        if session is not None and session.image_id == image_id:
+            words = session.words
+        else:
+            stored = image_store.get(image_id)
+            if stored is None:
+                return JSONResponse({"error": "Unknown or expired image"}, status_code=404)
+            _, words = await detect_words(stored.content, quality=quality)
+        result = await llm_service.next_sentence(words, instructions)
+        return api_response({**result, "image_id": image_id, "image_url": f"/images/{image_id}"}, accept)
+    except NoTextDetectedError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except OCRQueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JSONResponse({"error": f"Processing error: {str(e)}"}, status_code=500)
+
+@app.get("/sessions/stats")
+async def session_stats():
+    return JSONResponse(session_store.stats())
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, accept: str = Header(None)):
+    session = session_store.get(session_id)
+    if session is None:
+        return JSONResponse({"error": "Unknown or expired session"}, status_code=404)
+    return api_response(session.to_dict(), accept)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        return JSONResponse({"error": "Unknown or expired session"}, status_code=404)
+    return Response(status_code=204)
+
+@app.post("/sessions/{session_id}/sentence")
+async def generate_session_sentence(session_id: str, instructions: str = None, timings: bool = False,
+                                    accept: str = Header(None)):
+    """Generate a new sentence from a session's stored words; no upload and no OCR"""
+    session = session_store.get(session_id)
+    if session is None:
+        return JSONResponse({"error": "Unknown or expired session"}, status_code=404)
+    try:
+        with collect_timings() as request_timings:
+            sentence_result = await llm_service.agenerate_sentence(session.words, instructions)
+        logger.debug("Generated sentence result: %s", sentence_result)
+        response = {
+            "sentence": sentence_result.get("sentence", "Error generating sentence"),
+            "used_words": sentence_result.get("used_words", session.words),
+            **session.to_dict()
+        }
+        if timings:
+            response["timings"] = request_timings.totals()
+        return api_response(response, accept)
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return JSONResponse({"error": f"Processing error: {str(e)}"}, status_code=500)
\ No newline at end of file
+        return JSONResponse({"error": f"Processing error: {str(e)}"}, status_code=500)
+
+@app.post("/batch/")
+async def process_batch(files: List[UploadFile] = File(...), instructions: str = None,
+                        generate_sentences: bool = True, timings: bool = False, quality: str = None):
+    """
+    Process many images (several multipart files and/or ZIP archives) as a pipeline
+    and stream one NDJSON line per image as soon as it is done.
+    """
+    error = quality_error(quality)
+    if error:
+        return error
+    batch_config = config.get_batch_config()
+    max_files = batch_config.get("max_files", 200)
+    max_file_bytes = batch_config.get("max_file_bytes", 25 * 1024 * 1024)
+    # Uploads vollständig lesen, solange die Anfrage noch offen ist
+    uploads = [(file.filename, await file.read()) for file in files]
+    try:
+        # Limits prüfen, bevor das erste Ergebnis gestreamt wird; ZIP-Einträge werden erst später entpackt
+        sources = []
+        for filename, content in uploads:
+            if is_zip(content):
+                sources.extend(zip_images(content, max_files, max_file_bytes))
+            elif len(content) > max_file_bytes:
+                raise BatchTooLargeError(f"{filename} is larger than {max_file_bytes} bytes")
+            else:
+                sources.append((filename, lambda content=content: content))
+        if len(sources) > max_files:
+            raise BatchTooLargeError(f"Batch has {len(sources)} files, at most {max_files} are allowed")
+    except BatchTooLargeError as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+    except Exception as e:
+        return JSONResponse({"error": f"Invalid batch: {str(e)}"}, status_code=400)
+    del uploads
+
+    def items():
+        for index, (filename, read) in enumerate(sources):
+            yield {"index": index, "filename": filename, "read": read}
+
+    async def read_stage(item):
+        # ZIP-Einträge entpacken blockiert; nicht auf der Event-Loop
+        item["content"] = await asyncio.to_thread(item.pop("read"))
+
+    async def ocr_stage(item):
+        content = item.pop("content")
+        with collect_timings() as item_timings:
+            item["ocr_data"], item["words"] = await detect_words(content, quality=quality)
+        if timings:
+            item["timings"] = item_timings.totals()
+        item.update(upload_reference(content, item["ocr_data"], item["words"]))
+
+    async def llm_stage(item):
+        with collect_timings() as item_timings:
+            sentence_result = await llm_service.agenerate_sentence(item["words"], instructions)
+        if timings:
+            item.setdefault("timings", {}).update(item_timings.totals())
+        item["sentence"] = sentence_result.get("sentence", "Error generating sentence")
+        item["used_words"] = sentence_result.get("used_words", item["words"])
+
+    # Jede Stufe so breit wie ihre Ressource: OCR-Slots bzw. parallele LLM-Anfragen
+    stages = [PipelineStage("read", read_stage, concurrency=batch_config.get("read_concurrency", 1)),
+              PipelineStage("ocr", ocr_stage, concurrency=max(ocr_pool.workers, ocr_pool.engine_pool_size, 1))]
+    if generate_sentences:
+        stages.append(PipelineStage("llm", llm_stage, concurrency=batch_config.get("llm_concurrency", 4)))
+
+    async def ndjson_stream():
+        processed = failed = 0
+        try:
+            async for item in run_pipeline(items(), stages, queue_size=batch_config.get("queue_size", 2)):
+                item.pop("read", None)
+                item.pop("content", None)
+                item.pop("words", None)
+                processed += 1
+                failed += "error" in item
+                yield serialization.dumps(item) + b"\n"
+        except Exception as e:
+            yield serialization.dumps({"error": f"Processing error: {str(e)}"}) + b"\n"
+        yield serialization.dumps({"summary": {"images": processed, "failed": failed}}) + b"\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/generate-sentence-from-image/stream")
+async def generate_sentence_stream(file: UploadFile = File(...), instructions: str = None,
+                                   include_base64: bool = False, quality: str = None):
+    """
+    Stream sentence generation as Server-Sent Events: one `ocr` event with the OCR data,
+    `token` events with the raw LLM output as it arrives, then `result` (or `error`).
+    """
+    error = quality_error(quality)
+    if error:
+        return error
+    file_content = await file.read()
+    try:
+        ocr_data, words = await detect_words(file_content, quality=quality)
+    except NoTextDetectedError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except OCRQueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except Exception as e:
+        return JSONResponse({"error": f"Processing error: {str(e)}"}, status_code=500)
+
+    async def event_stream():
+        yield sse_event("ocr", {"ocr_data": ocr_data,
+                                **upload_reference(file_content, ocr_data, words, file.content_type,
+                                                   include_base64)})
+        try:
+            async for event in llm_service.astream_sentence(words, instructions):
+                name = event.pop("event")
+                if name == "result":
+                    logger.debug("Generated sentence result: %s", event)
+                    event.setdefault("used_words", words)
+                    llm_service.prefetch_variants(words, instructions, [event])
+                yield sse_event(name, event)
+        except Exception as e:
+            yield sse_event("error", {"error": f"Processing error: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/jobs/")
+async def submit_job(file: UploadFile = File(...), instructions: str = None, include_base64: bool = False,
+                     quality: str = None):
+    error = quality_error(quality)
+    if error:
+        return error
+    file_content = await file.read()
+    try:
+        job = job_manager.submit(file_content=file_content, instructions=instructions,
+                                 include_base64=include_base64, media_type=file.content_type, quality=quality)
+    except JobQueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    return JSONResponse({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }, status_code=202)
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return JSONResponse(job_manager.stats())
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, accept: str = Header(None)):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired job"}, status_code=404)
+    return api_response(job.to_dict(), accept)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired job"}, status_code=404)
+
+    async def event_stream():
+        async for event in job_manager.subscribe(job):
+            yield sse_event(event["event"], event)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,121 @@
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Sliding-window OCR of one window takes tens of milliseconds, a whole image or LLM call seconds
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "freezer_stage_seconds", "Duration of one pipeline stage", ["stage"], buckets=STAGE_BUCKETS)
+OCR_WINDOWS = Counter(
+    "freezer_ocr_windows_total", "Sliding windows, by whether they were OCRed or skipped as blank", ["result"])
+OCR_DETECTIONS = Counter(
+    "freezer_ocr_detections_total", "OCR detections before (raw) and after (kept) deduplication", ["kind"])
+OCR_CACHE_LOOKUPS = Counter(
+    "freezer_ocr_cache_lookups_total", "OCR result cache lookups", ["result"])
+LLM_PARSE_FALLBACKS = Counter(
+    "freezer_llm_parse_fallbacks_total", "Sentences replaced by the fallback because no valid JSON came back")
+LLM_PROVIDER_ERRORS = Counter(
+    "freezer_llm_provider_errors_total", "Failed LLM requests", ["backend", "provider"])
+QUEUE_DEPTH = Gauge(
+    "freezer_queue_depth", "Items waiting in or being processed by a pool or queue", ["queue"])
+
+_current_timings: contextvars.ContextVar[Optional["Timings"]] = contextvars.ContextVar("timings", default=None)
+
+class Timings:
+    """
+    Durations of the stages of one request, collected with `timed`.
+
+    A stage can run several times per request (e.g. once per sliding window), so every
+    stage keeps a list of samples.
+    """
+    def __init__(self, samples: Optional[Dict[str, List[float]]] = None):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        for stage, durations in (samples or {}).items():
+            self.samples[stage].extend(durations)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.samples[stage].append(seconds)
+
+    def merge(self, samples: Dict[str, List[float]]) -> None:
+        for stage, durations in samples.items():
+            self.samples[stage].extend(durations)
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        """Picklable, JSON-ready samples, e.g. to return them from a worker process"""
+        return {stage: list(durations) for stage, durations in self.samples.items()}
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds per stage, for per-request breakdowns in responses"""
+        return {stage: round(sum(durations), 6) for stage, durations in self.samples.items()}
+
+@contextmanager
+def collect_timings(propagate: bool = True) -> Iterator[Timings]:
+    """
+    Collect the `timed` stages of everything run inside the block (including awaited tasks).
+
+    Blocks can be nested. The stages of an inner block also count for the outer one
+    unless `propagate` is off, for code that returns its timings explicitly instead.
+    """
+    parent = _current_timings.get() if propagate else None
+    timings = Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+        if parent is not None:
+            parent.merge(timings.samples)
+
+@contextmanager
+def timed(stage: str, observe: bool = False) -> Iterator[None]:
+    """
+    Time a stage for the timings being collected, if any.
+
+    With `observe`, the duration also goes into the stage histogram right away. Code
+    that may run in a worker process leaves it off: its samples travel back with the
+    result and are observed by `observe_stages` in the server process.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, observe=observe)
+
+def record_stage(stage: str, seconds: float, observe: bool = False) -> None:
+    """Record a stage duration measured by the caller, like `timed` does"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+    if observe:
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+def current_timings() -> Optional[Timings]:
+    return _current_timings.get()
+
+def observe_stages(samples: Dict[str, List[float]]) -> None:
+    """Put stage samples collected elsewhere (e.g. in an OCR worker) into the stage histogram"""
+    for stage, durations in samples.items():
+        histogram = STAGE_SECONDS.labels(stage=stage)
+        for seconds in durations:
+            histogram.observe(seconds)
+
+def observe_ocr_stats(stats: Dict[str, int]) -> None:
+    """Count the windows and detections of one OCR run from its result stats"""
+    skipped = stats.get("windows_skipped", 0)
+    OCR_WINDOWS.labels(result="processed").inc(stats.get("windows_total", 0) - skipped)
+    OCR_WINDOWS.labels(result="skipped").inc(skipped)
+    OCR_DETECTIONS.labels(kind="raw").inc(stats.get("detections_raw", 0))
+    OCR_DETECTIONS.labels(kind="kept").inc(stats.get("detections_kept", 0))
+
+def track_queue(name: str, depth: Callable[[], float]) -> None:
+    """Report `depth()` as the queue depth gauge for `name` whenever metrics are scraped"""
+    QUEUE_DEPTH.labels(queue=name).set_function(depth)
+
+def render_metrics() -> tuple:
+    """(body, content type) of the Prometheus text exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
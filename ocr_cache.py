@@ -0,0 +1,128 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(image_bytes: bytes, params: Dict[str, Any]) -> str:
+    """
+    Build a content-addressed cache key from the image bytes and the OCR parameters.
+
+    Args:
+        image_bytes: Image file content as uploaded
+        params: Every setting that influences the OCR result (see ocr_processor.ocr_parameters)
+
+    Returns:
+        Hex digest identifying this image/parameter combination
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+class OCRResultCache:
+    """
+    Two-tier cache for OCR results.
+
+    The memory tier is a bounded LRU. The optional disk tier stores one JSON file
+    per key and survives restarts; disk hits are promoted into memory. Results are
+    copied on the way in and out, so callers may modify what they get back.
+    """
+    def __init__(self, max_entries: int = 128, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        # Caller holds the lock
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a result, returning None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._entries[key])
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    result = serialization.loads(f.read())
+            except (OSError, ValueError):
+                result = None
+            if result is not None:
+                with self._lock:
+                    self._remember(key, result)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return copy.deepcopy(result)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result in memory and, if configured, on disk"""
+        with self._lock:
+            self._remember(key, copy.deepcopy(result))
+
+        if self.disk_dir:
+            # Write to a temporary file first so readers never see a partial entry
+            path = self._disk_path(key)
+            temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(serialization.dumps(result))
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.warning("Error writing OCR cache entry: %s", e)
+
+    def get_or_compute(self, image_bytes: bytes, params: Dict[str, Any],
+                       compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the cached result for this image and parameters, computing and storing it on a miss"""
+        key = make_cache_key(image_bytes, params)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None
+            }
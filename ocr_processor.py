@@ -1,10 +1,203 @@
 from paddleocr import PaddleOCR, draw_ocr
+from paddleocr.tools.infer.predict_system import sorted_boxes
+from paddleocr.tools.infer.utility import get_rotate_crop_image
+import argparse
 import cv2
+import io
+import json
+import math
 import os
+import time
 import numpy as np
+from PIL import Image
 from collections import defaultdict
 import difflib
 import re
+import copy
+import queue
+import threading
+from contextlib import contextmanager
+
+from detections import Detections
+from metrics import collect_timings, timed
+
+OCR_LANG = "german"
+OCR_VERSION = "PP-OCRv4"
+
+DEFAULT_REC_BATCH_NUM = 16
+# Longest side used for text detection; sliding windows (at most 800px after upscaling) are unaffected
+DEFAULT_DET_MAX_SIDE = 1920
+PIPELINE_MODES = ("sliding_window", "detect_once")
+# Sliding window layout and upscaling used by the sliding-window pipeline
+DEFAULT_WINDOW_SIZE = 400
+DEFAULT_OVERLAP_PERCENT = 30
+WINDOW_SCALE_FACTOR = 2
+# Windows with a smaller fraction of dark (ink) pixels are treated as blank and skipped
+DEFAULT_MIN_INK_RATIO = 0.002
+DEFAULT_PIPELINE_MODE = "sliding_window"
+# Quality profiles: working resolution, noise filter and window layout of the OCR pipeline.
+# target_text_height picks the image pyramid level at which the estimated letter height comes
+# closest to (but not below) the target; None works at full resolution. "balanced" is the
+# pipeline's long-standing behaviour.
+QUALITY_PROFILES = {
+    "fast": {
+        "target_text_height": 24,
+        "filter": "gaussian",
+        "morphology_iterations": 1,
+        "window_size": 400,
+        "overlap_percent": 20,
+        "scale_factor": 1
+    },
+    "balanced": {
+        "target_text_height": None,
+        "filter": "bilateral",
+        "morphology_iterations": 3,
+        "window_size": DEFAULT_WINDOW_SIZE,
+        "overlap_percent": DEFAULT_OVERLAP_PERCENT,
+        "scale_factor": WINDOW_SCALE_FACTOR
+    },
+    "accurate": {
+        "target_text_height": 48,
+        "filter": "bilateral",
+        "morphology_iterations": 3,
+        "window_size": 480,
+        "overlap_percent": 40,
+        "scale_factor": 2
+    }
+}
+DEFAULT_QUALITY_PROFILE = "balanced"
+NOISE_FILTERS = ("bilateral", "gaussian", "none")
+# The pyramid never goes below this longest side or beyond 1/8 of the decoded resolution
+PYRAMID_MIN_SIDE = 1024
+PYRAMID_MAX_LEVEL = 3
+# Letter heights are estimated on the first pyramid level at most this large
+TEXT_HEIGHT_PREVIEW_SIDE = 1024
+MIN_LETTER_COMPONENTS = 8
+# Reduced-resolution decode flags by downscale factor; JPEG and WebP decoders scale while decoding
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+def create_ocr_engine(cpu_threads=None, enable_mkldnn=False, rec_batch_num=DEFAULT_REC_BATCH_NUM,
+                      det_max_side=DEFAULT_DET_MAX_SIDE):
+    """
+    Construct a PaddleOCR engine with the model settings used throughout the project.
+    
+    Args:
+        cpu_threads: Number of CPU math threads for the engine (None keeps Paddle's default)
+        enable_mkldnn: Whether to enable MKLDNN acceleration on CPU
+        rec_batch_num: Number of text crops the recognizer processes per inference batch
+        det_max_side: Longest side the detector resizes its input down to
+        
+    Returns:
+        A ready-to-use PaddleOCR instance
+    """
+    kwargs = {}
+    if cpu_threads:
+        kwargs["cpu_threads"] = cpu_threads
+    return PaddleOCR(use_angle_cls=False, lang=OCR_LANG, ocr_version=OCR_VERSION, use_space_char=True,
+                     enable_mkldnn=enable_mkldnn, rec_batch_num=rec_batch_num,
+                     det_limit_side_len=det_max_side, det_limit_type="max", **kwargs)
+
+# How often a caller waiting for a busy pool re-checks whether a free slot appeared
+ENGINE_WAIT_POLL_SECONDS = 1.0
+
+class OCREnginePool:
+    """
+    Process-wide pool of long-lived PaddleOCR engines.
+    
+    Engines are created lazily up to `size` (or all at once via `warm_up`) and handed
+    out to callers one at a time, so concurrent requests never share an engine and
+    never pay model construction more than once.
+    """
+    def __init__(self, size=1, cpu_threads=None, enable_mkldnn=False, rec_batch_num=DEFAULT_REC_BATCH_NUM,
+                 det_max_side=DEFAULT_DET_MAX_SIDE):
+        if size < 1:
+            raise ValueError(f"Engine pool size must be at least 1, got {size}")
+        self.size = size
+        self.cpu_threads = cpu_threads
+        self.enable_mkldnn = enable_mkldnn
+        self.rec_batch_num = rec_batch_num
+        self.det_max_side = det_max_side
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _create_engine(self):
+        return create_ocr_engine(cpu_threads=self.cpu_threads, enable_mkldnn=self.enable_mkldnn,
+                                 rec_batch_num=self.rec_batch_num, det_max_side=self.det_max_side)
+    
+    def _reserve_slot(self):
+        """Claim a slot for a new engine if the pool is not full yet."""
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+    
+    def _new_engine(self):
+        """Construct an engine for a reserved slot, giving the slot back if construction fails."""
+        try:
+            return self._create_engine()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def warm_up(self):
+        """Construct all remaining engines up front so no request pays model loading."""
+        while self._reserve_slot():
+            self._idle.put(self._new_engine())
+    
+    @contextmanager
+    def acquire(self):
+        """Borrow an engine for the duration of a `with` block."""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            if self._reserve_slot():
+                engine = self._new_engine()
+                break
+            # Regelmäßig neu prüfen: ein fehlgeschlagener Aufbau gibt seinen Platz wieder frei
+            try:
+                engine = self._idle.get(timeout=ENGINE_WAIT_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+_engine_pool = None
+_engine_pool_lock = threading.Lock()
+
+def configure_engine_pool(size=1, cpu_threads=None, enable_mkldnn=False, rec_batch_num=DEFAULT_REC_BATCH_NUM,
+                          det_max_side=DEFAULT_DET_MAX_SIDE, warm=True):
+    """
+    Replace the process-wide engine pool, optionally constructing all engines immediately.
+    
+    Returns:
+        The new OCREnginePool
+    """
+    global _engine_pool
+    pool = OCREnginePool(size=size, cpu_threads=cpu_threads, enable_mkldnn=enable_mkldnn,
+                         rec_batch_num=rec_batch_num, det_max_side=det_max_side)
+    if warm:
+        pool.warm_up()
+    with _engine_pool_lock:
+        _engine_pool = pool
+    return pool
+
+def get_engine_pool():
+    """Return the process-wide engine pool, creating a single-engine pool on first use."""
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            _engine_pool = OCREnginePool()
+        return _engine_pool
 
 def generate_sliding_windows(image, window_size=400, overlap_percent=30):
     """
@@ -52,6 +245,28 @@ def generate_sliding_windows(image, window_size=400, overlap_percent=30):
     
     return windows
 
+def score_windows_by_ink(image_binary, windows):
+    """
+    Score each window by the fraction of dark (ink) pixels it contains.
+    
+    Uses an integral image, so scoring costs O(1) per window regardless of window size.
+    
+    Args:
+        image_binary: Binarized image with dark text (0) on a light background (255)
+        windows: List of (x, y, width, height) tuples
+        
+    Returns:
+        NumPy array with one ink ratio in [0, 1] per window
+    """
+    if not windows:
+        return np.zeros(0)
+    ink = (image_binary == 0).astype(np.uint8)
+    integral = cv2.integral(ink)
+    
+    x, y, w, h = np.array(windows).T
+    ink_sums = integral[y + h, x + w] - integral[y, x + w] - integral[y + h, x] + integral[y, x]
+    return ink_sums / (w * h)
+
 def calculate_iou(box1, box2):
     """Calculate Intersection over Union for two bounding boxes."""
     # Extract points from boxes
@@ -156,7 +371,146 @@ def get_box_coordinates(detection):
     y_max = max(p[1] for p in points)
     return x_min, y_min, x_max, y_max
 
-def remove_duplicates_and_subwords(detections):
+def detections_to_boxes(detections):
+    """
+    Convert detections into an (n, 4) array of (x_min, y_min, x_max, y_max) boxes.
+    
+    Coordinates are stored as float64, which represents the integer pixel
+    coordinates exactly, so ratios computed from them match the scalar helpers.
+    Accepts a Detections container or a list of detection dicts.
+    """
+    if isinstance(detections, Detections):
+        return detections.boxes
+    if not detections:
+        return np.zeros((0, 4))
+    return np.array([get_box_coordinates(det) for det in detections], dtype=np.float64)
+
+class BoxGrid:
+    """
+    Uniform-grid spatial index over axis-aligned boxes.
+    
+    Every box is registered in each grid cell it touches, so finding the boxes
+    near a region only looks at the few cells that region covers instead of
+    comparing against every box.
+    """
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = boxes
+        if cell_size is None:
+            # Roughly one text box per cell keeps both buckets and per-box cell spans small
+            sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]) if len(boxes) else [1]
+            cell_size = float(np.median(sides))
+        self.cell_size = max(cell_size, 1.0)
+        self.cells = defaultdict(list)
+        
+        cell_ranges = np.floor(boxes / self.cell_size).astype(np.int64)
+        for index, (cx_min, cy_min, cx_max, cy_max) in enumerate(cell_ranges):
+            for cy in range(cy_min, cy_max + 1):
+                for cx in range(cx_min, cx_max + 1):
+                    self.cells[(cx, cy)].append(index)
+    
+    def query(self, x_min, y_min, x_max, y_max):
+        """
+        Indices of all boxes touching the given rectangle (edges included), in ascending order.
+        """
+        cx_min, cy_min = int(np.floor(x_min / self.cell_size)), int(np.floor(y_min / self.cell_size))
+        cx_max, cy_max = int(np.floor(x_max / self.cell_size)), int(np.floor(y_max / self.cell_size))
+        candidates = set()
+        for cy in range(cy_min, cy_max + 1):
+            for cx in range(cx_min, cx_max + 1):
+                candidates.update(self.cells.get((cx, cy), ()))
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+        
+        candidates = np.array(sorted(candidates))
+        boxes = self.boxes[candidates]
+        touching = ((boxes[:, 0] <= x_max) & (boxes[:, 2] >= x_min) &
+                    (boxes[:, 1] <= y_max) & (boxes[:, 3] >= y_min))
+        return candidates[touching]
+    
+    def overlapping_pairs(self):
+        """
+        All ordered pairs (i, j), i != j, whose boxes overlap with positive area.
+        
+        Returns:
+            Tuple of (rows, cols) index arrays sorted by row, then column
+        """
+        n = len(self.boxes)
+        keys = []
+        for members in self.cells.values():
+            if len(members) > 1:
+                members = np.array(members)
+                keys.append((members[:, None] * n + members[None, :]).ravel())
+        if not keys:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        
+        keys = np.unique(np.concatenate(keys))
+        rows, cols = keys // n, keys % n
+        overlapping = (rows != cols) & (pair_intersections(self.boxes, rows, cols) > 0)
+        return rows[overlapping], cols[overlapping]
+
+def box_areas(boxes):
+    """Area of every box in an (n, 4) box array."""
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+def pair_intersections(boxes, rows, cols):
+    """Intersection area of box rows[k] and box cols[k] for every k."""
+    first, second = boxes[rows], boxes[cols]
+    x_overlap = np.minimum(first[:, 2], second[:, 2]) - np.maximum(first[:, 0], second[:, 0])
+    y_overlap = np.minimum(first[:, 3], second[:, 3]) - np.maximum(first[:, 1], second[:, 1])
+    return np.maximum(x_overlap, 0) * np.maximum(y_overlap, 0)
+
+def pair_iou(boxes, rows, cols, intersection=None):
+    """IoU of box rows[k] and box cols[k]; the vectorized form of calculate_iou."""
+    if intersection is None:
+        intersection = pair_intersections(boxes, rows, cols)
+    areas = box_areas(boxes)
+    union = areas[rows] + areas[cols] - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, intersection / union, 0.0)
+
+def pair_containment(boxes, rows, cols, intersection=None):
+    """
+    How much of box cols[k] lies inside box rows[k], i.e. calculate_containment(cols[k], rows[k]).
+    """
+    if intersection is None:
+        intersection = pair_intersections(boxes, rows, cols)
+    areas = box_areas(boxes)[cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(areas > 0, intersection / areas, 0.0)
+
+def _suppress(keep, rows, cols, suppresses):
+    """
+    Greedily apply a pairwise suppression mask in index order.
+    
+    Every still-kept detection rows[k] removes cols[k] where suppresses[k] is set,
+    exactly like iterating i and j over a shrinking keep set.
+    """
+    rows, cols = rows[suppresses], cols[suppresses]
+    bounds = np.searchsorted(rows, np.arange(len(keep) + 1))
+    for i in np.unique(rows):
+        if keep[i]:
+            keep[cols[bounds[i]:bounds[i + 1]]] = False
+
+def _suppress_by_text(keep, rows, cols, candidates, texts, predicate):
+    """
+    Greedy suppression where the spatial mask only preselects candidate pairs.
+    
+    The text predicate is evaluated for pairs that pass `candidates` while both
+    detections are still kept.
+    """
+    rows, cols = rows[candidates], cols[candidates]
+    bounds = np.searchsorted(rows, np.arange(len(keep) + 1))
+    for i in np.unique(rows):
+        if not keep[i]:
+            continue
+        for j in cols[bounds[i]:bounds[i + 1]]:
+            if keep[j] and predicate(texts[i], texts[j]):
+                keep[j] = False
+
+# Vertical distance between box centers below which two boxes count as the same text line
+LINE_TOLERANCE = 10
+
+def remove_duplicates_and_subwords(detections: Detections, return_rejected: bool = False):
     """
     Multi-strategy approach to aggressively filter duplicate and partial word detections.
     
@@ -165,200 +519,479 @@ def remove_duplicates_and_subwords(detections):
     2. Text overlap analysis with exact character matching
     3. Relaxed matching based on common word prefixes/suffixes
     4. Confidence-based replacement for similar detections
+    
+    Boxes are converted once into a NumPy array and indexed in a BoxGrid, so
+    only spatially overlapping pairs are ever compared; each strategy is then
+    a mask over those pairs applied greedily in sorted order.
+    
+    Args:
+        detections: All detections of an image
+        return_rejected: Also return the removed detections, in their original order
+        
+    Returns:
+        The kept detections, longest and most confident first, or a tuple of
+        (kept, rejected) with return_rejected
     """
     if len(detections) <= 1:
-        return detections
+        return (detections, Detections.empty()) if return_rejected else detections
     
-    # First - normalize text for better comparisons
-    for det in detections:
-        det["normalized_text"] = det["text"].lower().strip()
+    # Sort by length (longer texts first) then by confidence; sorted() is stable for ties
+    normalized = detections.normalized_texts
+    confidences = detections.confidences.tolist()
+    order = np.array(sorted(range(len(detections)), key=lambda k: (len(normalized[k]), confidences[k]),
+                            reverse=True))
     
-    # Sort by length (longer texts first) then by confidence
-    sorted_detections = sorted(detections, key=lambda x: (len(x["normalized_text"]), x["confidence"]), reverse=True)
+    n = len(order)
+    texts = [normalized[k] for k in order]
+    lengths = np.array([len(text) for text in texts])
+    boxes = detections.boxes[order]
+    grid = BoxGrid(boxes)
+    
+    # Only overlapping pairs can pass any IoU or containment threshold
+    rows, cols = grid.overlapping_pairs()
+    intersection = pair_intersections(boxes, rows, cols)
+    iou = pair_iou(boxes, rows, cols, intersection)
+    containment = pair_containment(boxes, rows, cols, intersection)
+    shorter = lengths[cols] < lengths[rows]
+    
+    # Mask tracking which detections to keep
+    keep = np.ones(n, dtype=bool)
+    
+    # STRATEGY 1: box j is almost completely contained within box i (85% or more)
+    # and j's text is shorter than i's text
+    _suppress(keep, rows, cols, (containment > 0.85) & shorter)
     
-    # Set to track which detections to keep
-    to_keep = set(range(len(sorted_detections)))
-
-    for i in range(len(sorted_detections)):
-        if i not in to_keep:
-            continue
-            
-        for j in range(len(sorted_detections)):
-            if i == j or j not in to_keep:
-                continue
-                
-            # Check if box j is almost completely contained within box i
-            containment = calculate_containment(sorted_detections[j], sorted_detections[i])
-            
-            if containment > 0.85:  # If 85% or more of the box is contained
-                # Additional check: j's text should be shorter than i's text
-                if len(sorted_detections[j]["normalized_text"]) < len(sorted_detections[i]["normalized_text"]):
-                    to_keep.remove(j)  # Remove the contained subword
-                    
     # STRATEGY 2: Text overlap analysis - detect when most characters overlap
-    for i in range(len(sorted_detections)):
-        if i not in to_keep:
-            continue
-            
-        for j in range(len(sorted_detections)):
-            if i == j or j not in to_keep:
-                continue
-                
-            # Check spatial overlap is significant
-            if calculate_iou(sorted_detections[i], sorted_detections[j]) > 0.25:
-                # If texts have significant character overlap but aren't identical
-                text_i = sorted_detections[i]["normalized_text"]
-                text_j = sorted_detections[j]["normalized_text"]
-                
-                # Count matching characters in both texts
-                common_chars = sum(c in text_i for c in text_j)
-                if common_chars / len(text_j) > 0.7:  # If 70% of shorter text's chars are in longer text
-                    to_keep.remove(j)
-    
-    # STRATEGY 3: Relaxed matching for common prefixes/suffixes
-    for i in range(len(sorted_detections)):
-        if i not in to_keep:
-            continue
-            
-        for j in range(len(sorted_detections)):
-            if i == j or j not in to_keep:
-                continue
-                
-            # Check if boxes are close to each other
-            iou = calculate_iou(sorted_detections[i], sorted_detections[j])
-            if iou > 0.2:
-                text_i = sorted_detections[i]["normalized_text"]
-                text_j = sorted_detections[j]["normalized_text"]
-                
-                # Check if one text starts or ends with the other (common prefix/suffix)
-                if (text_i.startswith(text_j) or text_i.endswith(text_j)) and len(text_j) < len(text_i):
-                    to_keep.remove(j)
-    
-    # STRATEGY 4: Position-based filtering for small subwords
-    # Group by approximate vertical position (text lines)
-    line_groups = defaultdict(list)
-    for i in to_keep:
-        y_min, _, _, y_max = get_box_coordinates(sorted_detections[i])
-        y_center = (y_min + y_max) / 2
-        # Group by vertical position with some tolerance
-        line_key = int(y_center / 10) * 10  # Group in 10-pixel bands
-        line_groups[line_key].append(i)
-    
-    # For each line, check for small contained words
-    for _, indices in line_groups.items():
-        if len(indices) <= 1:
+    # If 70% of shorter text's chars are in longer text and spatial overlap is significant
+    _suppress_by_text(keep, rows, cols, iou > 0.25, texts,
+                      lambda text_i, text_j: sum(c in text_i for c in text_j) / len(text_j) > 0.7)
+    
+    # STRATEGY 3: Relaxed matching for common prefixes/suffixes of nearby boxes
+    _suppress_by_text(keep, rows, cols, (iou > 0.2) & shorter, texts,
+                      lambda text_i, text_j: text_i.startswith(text_j) or text_i.endswith(text_j))
+    
+    # STRATEGY 4: Position-based filtering for small subwords on the same text line.
+    # Sweep over the index: for each kept box, look at boxes whose vertical center is
+    # within LINE_TOLERANCE of its own and that lie horizontally inside it
+    y_center = (boxes[:, 1] + boxes[:, 3]) / 2
+    for i in range(n):
+        if not keep[i]:
             continue
-            
-        for i in indices:
-            if i not in to_keep:
-                continue
-                
-            for j in indices:
-                if i == j or j not in to_keep:
-                    continue
-                    
-                # Get bounding box coordinates
-                i_x_min, i_y_min, i_x_max, i_y_max = get_box_coordinates(sorted_detections[i])
-                j_x_min, j_y_min, j_x_max, j_y_max = get_box_coordinates(sorted_detections[j])
-                
-                # Check if j is fully contained within i horizontally
-                if (j_x_min >= i_x_min and j_x_max <= i_x_max):
-                    # If j's text is significantly shorter
-                    if len(sorted_detections[j]["normalized_text"]) < 0.7 * len(sorted_detections[i]["normalized_text"]):
-                        to_keep.remove(j)
-    
-    # Create final filtered list
-    result = [sorted_detections[i] for i in to_keep]
+        x_min, _, x_max, _ = boxes[i]
+        js = grid.query(x_min, y_center[i] - LINE_TOLERANCE, x_max, y_center[i] + LINE_TOLERANCE)
+        js = js[(js != i) & keep[js]]
+        same_line = np.abs(y_center[js] - y_center[i]) < LINE_TOLERANCE
+        horizontally_contained = (boxes[js, 0] >= x_min) & (boxes[js, 2] <= x_max)
+        # j's text is significantly shorter
+        much_shorter = lengths[js] < 0.7 * lengths[i]
+        keep[js[same_line & horizontally_contained & much_shorter]] = False
     
     # Final sanity check - remove any very short (1-2 char) text that's close to a longer text
-    result = [det for det in result if not (
-        len(det["normalized_text"]) <= 2 and 
-        any(calculate_iou(det, other) > 0.1 and len(other["normalized_text"]) > 2 
-            for other in result if other != det)
-    )]
+    close = (iou > 0.1) & keep[cols] & (lengths[cols] > 2)
+    near_longer = np.zeros(n, dtype=bool)
+    near_longer[rows[close]] = True
+    keep &= ~((lengths <= 2) & near_longer)
     
-    return result
+    kept = detections[order[keep]]
+    if return_rejected:
+        return kept, detections[np.sort(order[~keep])]
+    return kept
+
+def draw_annotations(image, magnets: Detections):
+    """Draw the boxes and texts of the final detections on a copy of the image"""
+    image_with_boxes = image.copy()
+    for text, bbox in zip(magnets.texts, magnets.points):
+        cv2.polylines(image_with_boxes, [bbox], isClosed=True, color=(0, 255, 0), thickness=2)
+        cv2.putText(image_with_boxes, text, (int(bbox[0][0]), int(bbox[0][1])-5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return image_with_boxes
 
-def create_debug_visualization(image, all_detections, filtered_detections):
+def create_debug_visualization(image, filtered_detections: Detections, rejected_detections: Detections):
     """
     Create a comprehensive debug visualization showing which detections are kept and which are filtered.
     Also includes more information about why detections were filtered.
+    
+    Args:
+        image: Image the detections were found on
+        filtered_detections: Detections kept by remove_duplicates_and_subwords
+        rejected_detections: Detections it removed (see recognize_text with keep_rejected)
     """
     debug_image = image.copy()
     
-    # Create mapping for quick lookup
-    filtered_ids = {id(det): det for det in filtered_detections}
-    
     # Group filtered-out detections by possible reason
     substrings = []
     overlapping = []
     low_confidence = []
     
-    for det in all_detections:
-        if id(det) not in filtered_ids:
-            # Try to determine why this detection was filtered out
-            is_substring = any(det["text"].lower() in other["text"].lower() and det["text"].lower() != other["text"].lower() 
-                              for other in filtered_detections)
-            
-            has_overlap = any(calculate_iou(det, other) > 0.2 for other in filtered_detections)
-            
-            if is_substring and has_overlap:
-                substrings.append(det)
-            elif has_overlap:
-                overlapping.append(det)
-            else:
-                low_confidence.append(det)
-    
-    # Draw filtered out substrings in red
-    for det in substrings:
-        bbox = np.array(det["position"]["points"])
-        text = det["text"]
-        cv2.polylines(debug_image, [bbox], isClosed=True, color=(0, 0, 255), thickness=1)
-        cv2.putText(debug_image, f"SUB: {text}", (bbox[0][0], bbox[0][1]-5),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
-    
-    # Draw filtered out overlapping detections in yellow
-    for det in overlapping:
-        bbox = np.array(det["position"]["points"])
-        text = det["text"]
-        cv2.polylines(debug_image, [bbox], isClosed=True, color=(0, 255, 255), thickness=1)
-        cv2.putText(debug_image, f"OVER: {text}", (bbox[0][0], bbox[0][1]-5),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
-    
-    # Draw other filtered detections in blue
-    for det in low_confidence:
-        bbox = np.array(det["position"]["points"])
-        text = det["text"]
-        cv2.polylines(debug_image, [bbox], isClosed=True, color=(255, 0, 0), thickness=1)
-        cv2.putText(debug_image, f"OTHER: {text}", (bbox[0][0], bbox[0][1]-5),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
+    # Kept and filtered-out boxes in one array; the kept ones are indexed so each
+    # filtered-out one is only compared with its neighbours
+    kept_count = len(filtered_detections)
+    boxes = np.concatenate([filtered_detections.boxes, rejected_detections.boxes])
+    grid = BoxGrid(boxes[:kept_count])
+    kept_texts = [text.lower() for text in filtered_detections.texts]
+    
+    for index, text in enumerate(rejected_detections.texts):
+        # Try to determine why this detection was filtered out
+        neighbours = grid.query(*boxes[kept_count + index])
+        rows = np.full(len(neighbours), kept_count + index)
+        has_overlap = bool(np.any(pair_iou(boxes, rows, neighbours) > 0.2))
+        
+        lowered = text.lower()
+        is_substring = has_overlap and any(lowered in other and lowered != other for other in kept_texts)
+        
+        if is_substring and has_overlap:
+            substrings.append(index)
+        elif has_overlap:
+            overlapping.append(index)
+        else:
+            low_confidence.append(index)
+    
+    # Filtered out substrings in red, overlapping detections in yellow, others in blue
+    for indices, label, color in ((substrings, "SUB", (0, 0, 255)), (overlapping, "OVER", (0, 255, 255)),
+                                  (low_confidence, "OTHER", (255, 0, 0))):
+        for index in indices:
+            bbox = rejected_detections.points[index]
+            cv2.polylines(debug_image, [bbox], isClosed=True, color=color, thickness=1)
+            cv2.putText(debug_image, f"{label}: {rejected_detections.texts[index]}",
+                        (int(bbox[0][0]), int(bbox[0][1])-5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
     
     # Draw kept detections in green with confidence
-    for det in filtered_detections:
-        bbox = np.array(det["position"]["points"])
-        text = det["text"]
-        conf = det["confidence"]
+    for text, conf, bbox in zip(filtered_detections.texts, filtered_detections.confidences,
+                                filtered_detections.points):
         cv2.polylines(debug_image, [bbox], isClosed=True, color=(0, 255, 0), thickness=2)
-        cv2.putText(debug_image, f"{text} ({conf:.2f})", (bbox[0][0], bbox[0][1]-5),
+        cv2.putText(debug_image, f"{text} ({conf:.2f})", (int(bbox[0][0]), int(bbox[0][1])-5),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
     
     return debug_image
 
-def process_image(image_path: str) -> dict:
+def image_header_size(buffer):
+    """
+    Read the (width, height) of an encoded image from its header without decoding the pixels.
+    
+    Returns:
+        (width, height), or None if the format is not recognized
+    """
     try:
-        # Bild einlesen
-        image = cv2.imread(image_path)
+        with Image.open(io.BytesIO(buffer)) as header:
+            return header.size
+    except Exception:
+        return None
+
+def load_image(source, max_side=None):
+    """
+    Load an image from a path, encoded bytes or a decoded array without temporary files.
+    
+    Args:
+        source: File path, encoded image bytes (bytes, bytearray, memoryview or a 1-D uint8
+                array) or an already decoded BGR/grayscale image array
+        max_side: Optional longest side; larger images are downscaled, during decoding where
+                  the format supports it and with area interpolation for the remainder
+        
+    Returns:
+        (image, scale): the BGR image and the factor mapping its coordinates back to the
+        original resolution (1.0 if it was not downscaled)
+    """
+    if isinstance(source, np.ndarray) and source.ndim >= 2:
+        image = source if source.ndim == 3 else cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+        original_side = max(image.shape[:2])
+    else:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                source = f.read()
+        # Wrap the encoded bytes without copying them
+        buffer = np.frombuffer(memoryview(source), dtype=np.uint8)
+        size = image_header_size(buffer) if max_side else None
+        flag = cv2.IMREAD_COLOR
+        if size:
+            for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                if max(size) / factor >= max_side:
+                    flag = reduced_flag
+                    break
+        image = cv2.imdecode(buffer, flag)
         if image is None:
-            raise ValueError(f"Could not read image at {image_path}")
+            raise ValueError("Could not decode image")
+        original_side = max(size) if size else max(image.shape[:2])
 
-        # 1. Vorverarbeitungspipeline
-        # a) Zu Graustufen konvertieren
-        image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if max_side and max(image.shape[:2]) > max_side:
+        resize = max_side / max(image.shape[:2])
+        image = cv2.resize(image, None, fx=resize, fy=resize, interpolation=cv2.INTER_AREA)
+    return image, original_side / max(image.shape[:2])
+
+def detect_text_boxes(ocr_model, image):
+    """
+    Run only the text detection stage of an engine on one image.
+    
+    Returns:
+        List of 4-point boxes in reading order (empty if nothing was found)
+    """
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    dt_boxes, _ = ocr_model.text_detector(image)
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return []
+    return sorted_boxes(dt_boxes)
+
+def crop_text_box(image, box):
+    """Cut out a (possibly rotated) text box as an upright crop for recognition."""
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return get_rotate_crop_image(image, copy.deepcopy(box))
+
+def recognize_crops(ocr_model, crops):
+    """
+    Recognize many text crops in one call; the engine splits them into batches of `rec_batch_num`.
+    
+    Returns:
+        List of (text, confidence) tuples, one per crop
+    """
+    if not crops:
+        return []
+    rec_res, _ = ocr_model.text_recognizer(crops)
+    return [(text, confidence) for text, confidence in rec_res]
+
+def detections_from_recognized(recognized, boxes, drop_score, scale_factor=1, offsets=(0, 0)):
+    """
+    Detections from recognize_crops results and their boxes, without the ones below `drop_score`.
+    
+    Args:
+        recognized: (text, confidence) per box
+        boxes: The 4 corner points of every box in its scaled region
+        scale_factor: Factor the regions were scaled by before detection
+        offsets: (x, y) position of the region in the image, or one (x, y) per box
+    """
+    if not recognized:
+        return Detections.empty()
+    confidences = np.array([confidence for _, confidence in recognized], dtype=np.float64)
+    keep = np.flatnonzero(confidences >= drop_score)
+    offsets = np.asarray(offsets).reshape(-1, 2)
+    if len(offsets) > 1:
+        offsets = offsets[keep]
+    return Detections.from_regions([recognized[k][0] for k in keep], confidences[keep],
+                                   np.asarray(boxes, dtype=np.float64)[keep], scale_factor, offsets)
+
+def ocr_sliding_windows(ocr_model, image_thresh, image_processed, min_ink_ratio=DEFAULT_MIN_INK_RATIO,
+                        window_size=DEFAULT_WINDOW_SIZE, overlap_percent=DEFAULT_OVERLAP_PERCENT,
+                        scale_factor=WINDOW_SCALE_FACTOR):
+    """
+    Detect text in overlapping, upscaled windows and recognize all crops in batches.
+    
+    Args:
+        ocr_model: PaddleOCR engine
+        image_thresh: Binarized image the text is read from
+        image_processed: Morphologically cleaned image used for window layout and ink scoring
+        min_ink_ratio: Windows with less ink than this are skipped without OCR (0 disables pruning)
+        window_size, overlap_percent: Window layout (see generate_sliding_windows)
+        scale_factor: Factor every window is upscaled by before OCR
+        
+    Returns:
+        Tuple of (detections in the coordinates of image_thresh, window statistics)
+    """
+    # Segmentierung: Verwende sliding windows statt quarter_image_with_padding
+    h, w = image_processed.shape[:2]
+    window_size = min(window_size, min(h, w) // 2)  # Dynamische Fenstergröße basierend auf Bildgröße
+    with timed("windows"):
+        windows = generate_sliding_windows(image_processed, window_size=window_size,
+                                           overlap_percent=overlap_percent)
         
-        # b) Rauschreduzierung mit bilateralem Filter (erhält Kanten)
-        image_filtered = cv2.bilateralFilter(image_gray, d=9, sigmaColor=75, sigmaSpace=75)
+        # Leere Fenster (nur Kühlschranktür, keine Schrift) vor dem OCR verwerfen
+        ink_ratios = score_windows_by_ink(image_processed, windows)
+        rois = [window for window, ratio in zip(windows, ink_ratios) if ratio >= min_ink_ratio]
+    window_stats = {
+        "windows_total": len(windows),
+        "windows_skipped": len(windows) - len(rois),
+        "skip_ratio": (len(windows) - len(rois)) / len(windows) if windows else 0.0
+    }
+    
+    # Erkennung pro Fenster, Textausschnitte aller Fenster werden gesammelt
+    crops = []
+    crop_boxes = []
+    crop_offsets = []
+    for (x, y, w, h) in rois:
+        with timed("ocr_window"):
+            # Ausschneiden des interessanten Bereichs
+            cropped = image_thresh[y:y+h, x:x+w]
+            # Optional: Upscaling des Ausschnitts, falls die Schrift zu klein ist
+            cropped_upscaled = cropped
+            if scale_factor != 1:
+                cropped_upscaled = cv2.resize(cropped, None, fx=scale_factor, fy=scale_factor,
+                                              interpolation=cv2.INTER_LINEAR)
+            cropped_upscaled = cv2.cvtColor(cropped_upscaled, cv2.COLOR_GRAY2BGR)
+            
+            for bbox in detect_text_boxes(ocr_model, cropped_upscaled):
+                crops.append(crop_text_box(cropped_upscaled, bbox))
+                crop_boxes.append(bbox)
+                crop_offsets.append((x, y))
+    
+    # Texterkennung für alle Ausschnitte in gebündelten Inferenzaufrufen
+    with timed("ocr_recognize"):
+        recognized = recognize_crops(ocr_model, crops)
+    
+    # Da wir die Ausschnitte skaliert haben, müssen wir die Koordinaten der erkannten Boxen anpassen
+    return detections_from_recognized(recognized, crop_boxes, ocr_model.drop_score, scale_factor,
+                                      crop_offsets), window_stats
+
+def ocr_detect_once(ocr_model, image_thresh, det_max_side=DEFAULT_DET_MAX_SIDE):
+    """
+    Detect text once on the whole image, then recognize each region at native resolution.
+    
+    Args:
+        ocr_model: PaddleOCR engine
+        image_thresh: Binarized image the text is read from
+        det_max_side: Longest side the image is downscaled to for detection
         
-        # c) Adaptive Thresholding mit optimierten Parametern
+    Returns:
+        Detections in original image coordinates
+    """
+    h, w = image_thresh.shape[:2]
+    det_scale = min(1.0, det_max_side / max(h, w))
+    image_det = image_thresh
+    if det_scale < 1.0:
+        image_det = cv2.resize(image_thresh, None, fx=det_scale, fy=det_scale, interpolation=cv2.INTER_AREA)
+    
+    image_native = cv2.cvtColor(image_thresh, cv2.COLOR_GRAY2BGR)
+    with timed("ocr_detect"):
+        boxes = detect_text_boxes(ocr_model, image_det)
+    with timed("ocr_recognize"):
+        crops = [crop_text_box(image_native, (bbox / det_scale).astype(np.float32)) for bbox in boxes]
+        recognized = recognize_crops(ocr_model, crops)
+    
+    return detections_from_recognized(recognized, boxes, ocr_model.drop_score, det_scale)
+
+def quality_profile(name):
+    """The settings of a quality profile, raising ValueError for unknown names"""
+    if name not in QUALITY_PROFILES:
+        raise ValueError(f"Unknown quality profile: {name}, expected one of {list(QUALITY_PROFILES)}")
+    return QUALITY_PROFILES[name]
+
+def ocr_parameters(mode=DEFAULT_PIPELINE_MODE, det_max_side=DEFAULT_DET_MAX_SIDE,
+                   min_ink_ratio=DEFAULT_MIN_INK_RATIO, decode_max_side=None, profile=DEFAULT_QUALITY_PROFILE):
+    """
+    Describe every setting that influences the result of process_image.
+    
+    Two calls with the same image and the same parameters produce the same
+    detections, which makes this dict suitable as part of a cache key.
+    """
+    settings = quality_profile(profile)
+    return {
+        "lang": OCR_LANG,
+        "ocr_version": OCR_VERSION,
+        "mode": mode,
+        "det_max_side": det_max_side,
+        "min_ink_ratio": min_ink_ratio,
+        "decode_max_side": decode_max_side,
+        "profile": profile,
+        "target_text_height": settings["target_text_height"],
+        "filter": settings["filter"],
+        "morphology_iterations": settings["morphology_iterations"],
+        "window_size": settings["window_size"],
+        "overlap_percent": settings["overlap_percent"],
+        "scale_factor": settings["scale_factor"]
+    }
+
+def estimate_text_height(image_gray):
+    """
+    Estimate the typical letter height of a grayscale image from the connected components of its ink.
+    
+    Components that are too flat, too sparse or too large to be letters (magnet edges,
+    noise, shadows) are ignored.
+    
+    Returns:
+        Median letter height in pixels, or None if too few letter-like components were found
+    """
+    ink = cv2.adaptiveThreshold(image_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV,
+                                blockSize=21, C=10)
+    _, _, component_stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    widths = component_stats[1:, cv2.CC_STAT_WIDTH]
+    heights = component_stats[1:, cv2.CC_STAT_HEIGHT]
+    fill = component_stats[1:, cv2.CC_STAT_AREA] / np.maximum(widths * heights, 1)
+    letters = ((heights >= 4) & (heights <= image_gray.shape[0] / 4) & (widths <= heights * 3)
+               & (fill >= 0.15) & (fill <= 0.9))
+    if np.count_nonzero(letters) < MIN_LETTER_COMPONENTS:
+        return None
+    return float(np.median(heights[letters]))
+
+def select_pyramid_level(image_gray, target_text_height):
+    """
+    Build an image pyramid and pick the level whose letters are closest to target_text_height.
+    
+    Letters are measured once on a small level. The chosen level keeps letters at least
+    `target_text_height` pixels high and its longest side at least PYRAMID_MIN_SIDE.
+    
+    Returns:
+        (level image, downscale factor of the level, estimated letter height at full resolution or None)
+    """
+    levels = [image_gray]
+    while len(levels) <= PYRAMID_MAX_LEVEL and max(levels[-1].shape[:2]) > TEXT_HEIGHT_PREVIEW_SIDE:
+        levels.append(cv2.pyrDown(levels[-1]))
+    preview_height = estimate_text_height(levels[-1])
+    if preview_height is None:
+        return image_gray, 1.0, None
+    text_height = preview_height * max(image_gray.shape[:2]) / max(levels[-1].shape[:2])
+    
+    level = 0
+    while (level + 1 < len(levels) and text_height / 2 ** (level + 1) >= target_text_height
+           and max(levels[level + 1].shape[:2]) >= PYRAMID_MIN_SIDE):
+        level += 1
+    working = levels[level]
+    return working, max(image_gray.shape[:2]) / max(working.shape[:2]), text_height
+
+def reduce_noise(image_gray, noise_filter):
+    if noise_filter == "bilateral":
+        # Rauschreduzierung mit bilateralem Filter (erhält Kanten)
+        return cv2.bilateralFilter(image_gray, d=9, sigmaColor=75, sigmaSpace=75)
+    if noise_filter == "gaussian":
+        return cv2.GaussianBlur(image_gray, (3, 3), 0)
+    if noise_filter == "none":
+        return image_gray
+    raise ValueError(f"Unknown noise filter: {noise_filter}")
+
+class PreprocessedImage:
+    """A decoded image and the binarized variants the OCR stage works on"""
+    def __init__(self, image, image_thresh, image_processed, scale=1.0, text_height=None,
+                 profile=DEFAULT_QUALITY_PROFILE):
+        self.image = image
+        self.image_thresh = image_thresh
+        self.image_processed = image_processed
+        # Faktor von den binarisierten Bildern zurück auf die Originalauflösung
+        self.scale = scale
+        self.text_height = text_height
+        self.profile = profile
+
+def preprocess_image(image_source, decode_max_side: int = None,
+                     profile: str = DEFAULT_QUALITY_PROFILE) -> PreprocessedImage:
+    """
+    Decode an image and binarize it for OCR; the CPU-only first stage of process_image.
+    
+    Args:
+        image_source: Path, encoded image bytes/buffer or decoded image array (see load_image)
+        decode_max_side: Optional longest side the image is downscaled to while decoding
+        profile: Quality profile (see QUALITY_PROFILES) choosing the working resolution and filter
+    """
+    settings = quality_profile(profile)
+    # Bild direkt aus dem Speicher dekodieren (optional verkleinert)
+    with timed("decode"):
+        image, decode_scale = load_image(image_source, max_side=decode_max_side)
+
+    # 1. Vorverarbeitungspipeline
+    # a) Zu Graustufen konvertieren
+    with timed("grayscale"):
+        image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    
+    # Arbeitsauflösung aus der geschätzten Schrifthöhe wählen
+    text_height = None
+    pyramid_scale = 1.0
+    if settings["target_text_height"]:
+        with timed("pyramid"):
+            image_gray, pyramid_scale, text_height = select_pyramid_level(image_gray, settings["target_text_height"])
+        if text_height is not None:
+            text_height *= decode_scale
+    
+    # b) Rauschreduzierung
+    with timed("filter"):
+        image_filtered = reduce_noise(image_gray, settings["filter"])
+    
+    # c) Adaptive Thresholding mit optimierten Parametern
+    with timed("threshold"):
         image_thresh = cv2.adaptiveThreshold(
             image_filtered, 
             255, 
@@ -367,96 +1000,221 @@ def process_image(image_path: str) -> dict:
             blockSize=21,  
             C=10
         )
-        
-        # d) Morphologische Operationen zum Rauschentfernen
+    
+    # d) Morphologische Operationen zum Rauschentfernen
+    with timed("morphology"):
         kernel = np.ones((2, 2), np.uint8)
-        image_processed = cv2.morphologyEx(image_thresh, cv2.MORPH_OPEN, kernel, iterations=3)
-        
-        # Segmentierung: Verwende sliding windows statt quarter_image_with_padding
-        h, w = image_processed.shape[:2]
-        window_size = min(400, min(h, w) // 2)  # Dynamische Fenstergröße basierend auf Bildgröße
-        rois = generate_sliding_windows(image_processed, window_size=window_size, overlap_percent=30)
-        
-        # Initialisiere das PaddleOCR-Modell
-        ocr_model = PaddleOCR(use_angle_cls=False, lang="german", ocr_version='PP-OCRv4', use_space_char=True)
-        
-        all_detections = []
-        # Erstelle eine Kopie des Originalbildes zur Visualisierung
-        image_with_boxes = image.copy()
+        image_processed = cv2.morphologyEx(image_thresh, cv2.MORPH_OPEN, kernel,
+                                           iterations=settings["morphology_iterations"])
+    return PreprocessedImage(image, image_thresh, image_processed, decode_scale * pyramid_scale, text_height, profile)
 
-        # Für jeden sliding window:
-        for (x, y, w, h) in rois:
-            # Ausschneiden des interessanten Bereichs
-            cropped = image_thresh[y:y+h, x:x+w]
-            # Optional: Upscaling des Ausschnitts, falls die Schrift zu klein ist
-            scale_factor = 2
-            cropped_upscaled = cv2.resize(cropped, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_LINEAR)
-            
-            # Führe OCR auf dem zugeschnittenen (und ggf. vergrößerten) Bild aus
-            results = ocr_model.ocr(cropped_upscaled, cls=False)
-            
-            # Da wir den Ausschnitt skaliert haben, müssen wir die Koordinaten der erkannten Boxen anpassen
-            for line in results:
-                if(line is None or not line):
-                    continue
-                for word_info in line:
-                    if word_info is None or not word_info:
-                        continue
-                    bbox = word_info[0]  # Liste der 4 Eckpunkte im skalierten Ausschnitt
-                    text, confidence = word_info[1]
-                    
-                    # Passe die Koordinaten zurück auf den Originalausschnitt
-                    adjusted_bbox = []
-                    for point in bbox:
-                        adj_x = int(point[0] / scale_factor) + x
-                        adj_y = int(point[1] / scale_factor) + y
-                        adjusted_bbox.append((adj_x, adj_y))
-                    
-                    all_detections.append({
-                        "text": text,
-                        "confidence": confidence,
-                        "position": {
-                            "x": adjusted_bbox[0][0],
-                            "y": adjusted_bbox[0][1],
-                            "width": adjusted_bbox[2][0] - adjusted_bbox[0][0],
-                            "height": adjusted_bbox[2][1] - adjusted_bbox[0][1],
-                            "points": adjusted_bbox
-                        }
-                    })
-        
-        # Apply the aggressive multi-strategy filtering approach
-        filtered_detections = remove_duplicates_and_subwords(all_detections)
-        
-        # Create detailed debug visualization
-        debug_image = create_debug_visualization(image, all_detections, filtered_detections)
-        
-        # Final result is our filtered detections
-        magnets = filtered_detections
-        
-        # Draw final detections in the result image
-        image_with_boxes = image.copy()
-        for detection in magnets:
-            bbox = np.array(detection["position"]["points"])
-            text = detection["text"]
-            cv2.polylines(image_with_boxes, [bbox], isClosed=True, color=(0, 255, 0), thickness=2)
-            cv2.putText(image_with_boxes, text, (bbox[0][0], bbox[0][1]-5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+def recognize_text(preprocessed: PreprocessedImage, engine_pool: OCREnginePool = None,
+                   mode: str = DEFAULT_PIPELINE_MODE, det_max_side: int = DEFAULT_DET_MAX_SIDE,
+                   min_ink_ratio: float = DEFAULT_MIN_INK_RATIO, progress=None,
+                   keep_rejected: bool = False) -> dict:
+    """
+    OCR and deduplicate a preprocessed image; the engine-bound second stage of process_image.
+    
+    Args:
+        keep_rejected: Also return the detections removed by deduplication, for debug images
         
-        # Save the images
-        cv2.imwrite("annotated_image.jpg", image_with_boxes)
-        #cv2.imwrite("debug_filtering.jpg", debug_image)
+    Returns:
+        {"magnets": [...], "stats": {...}} in the coordinates of the original image, plus
+        "rejected": [...] with keep_rejected
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unsupported pipeline mode: {mode}")
+    report = progress if progress is not None else (lambda stage: None)
+    image_thresh = preprocessed.image_thresh
+    settings = quality_profile(preprocessed.profile)
+    
+    all_detections = Detections.empty()
+    stats = {"windows_total": 0, "windows_skipped": 0, "skip_ratio": 0.0}
+
+    # Leihe ein vorgewärmtes PaddleOCR-Modell aus dem Pool aus
+    report("ocr")
+    pool = engine_pool if engine_pool is not None else get_engine_pool()
+    with pool.acquire() as ocr_model:
+        if mode == "detect_once":
+            all_detections = ocr_detect_once(ocr_model, image_thresh, det_max_side=det_max_side)
+        # Sliding windows als Standard und als Rückfallebene, falls die Gesamterkennung nichts findet
+        if mode == "sliding_window" or not all_detections:
+            all_detections, stats = ocr_sliding_windows(ocr_model, image_thresh, preprocessed.image_processed,
+                                                        min_ink_ratio=min_ink_ratio,
+                                                        window_size=settings["window_size"],
+                                                        overlap_percent=settings["overlap_percent"],
+                                                        scale_factor=settings["scale_factor"])
+    
+    # Apply the aggressive multi-strategy filtering approach
+    report("dedup")
+    with timed("dedup"):
+        filtered_detections, rejected = remove_duplicates_and_subwords(all_detections, return_rejected=True)
+    stats = {
+        **stats,
+        "detections_raw": len(all_detections),
+        "detections_kept": len(filtered_detections),
+        "profile": preprocessed.profile,
+        "text_height": round(preprocessed.text_height, 1) if preprocessed.text_height else None,
+        "working_scale": round(preprocessed.scale, 4)
+    }
+    
+    # Final result is our filtered detections
+    # Boxen auf die Originalauflösung zurückrechnen; erst hier entstehen die Dicts der API
+    result = {"magnets": filtered_detections.scaled(preprocessed.scale).to_json(), "stats": stats}
+    if keep_rejected:
+        # Verworfene Erkennungen nur für Debug-Bilder aufheben; gezeichnet wird erst auf Anfrage
+        result["rejected"] = rejected.scaled(preprocessed.scale).to_json()
+    return result
+
+def process_image(image_source, engine_pool: OCREnginePool = None, mode: str = DEFAULT_PIPELINE_MODE,
+                  det_max_side: int = DEFAULT_DET_MAX_SIDE, min_ink_ratio: float = DEFAULT_MIN_INK_RATIO,
+                  decode_max_side: int = None, progress=None, keep_rejected: bool = False,
+                  profile: str = DEFAULT_QUALITY_PROFILE) -> dict:
+    """
+    Run the full OCR pipeline on an image and return the deduplicated detections.
+    
+    Nothing is drawn or written to disk; see draw_annotations and create_debug_visualization.
+    
+    Args:
+        image_source: Path, encoded image bytes/buffer or decoded image array (see load_image)
+        engine_pool: Engine pool to borrow the OCR model from (defaults to the process-wide pool)
+        mode: "sliding_window" to OCR overlapping upscaled windows, or "detect_once" to detect
+              text on the whole image and recognize each region at native resolution. Detect-once
+              falls back to sliding windows if it finds no text.
+        det_max_side: Longest image side used for detection in detect-once mode
+        min_ink_ratio: Sliding windows with less ink than this are skipped without OCR
+        decode_max_side: Optional longest side the image is downscaled to while decoding;
+                         the returned boxes are mapped back to the original resolution
+        progress: Optional callable invoked with the name of each stage as it starts
+                  ("preprocess", "ocr", "dedup")
+        keep_rejected: Also return the detections removed by deduplication as "rejected"
+        profile: Quality profile, "fast", "balanced" or "accurate" (see QUALITY_PROFILES)
         
-        return {"magnets": magnets}
+    Returns:
+        {"magnets": [...], "stats": {...}, "timings": {...}} with one entry per detected word,
+        the window and detection counts, and the durations of every stage in seconds
+        (a list per stage, see metrics.Timings)
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unsupported pipeline mode: {mode}")
+    report = progress if progress is not None else (lambda stage: None)
+    try:
+        # Eigene Messung, die mit dem Ergebnis zurückgegeben wird (auch aus Worker-Prozessen)
+        with collect_timings(propagate=False) as timings:
+            report("preprocess")
+            preprocessed = preprocess_image(image_source, decode_max_side=decode_max_side, profile=profile)
+            result = recognize_text(preprocessed, engine_pool=engine_pool, mode=mode, det_max_side=det_max_side,
+                                    min_ink_ratio=min_ink_ratio, progress=progress,
+                                    keep_rejected=keep_rejected)
+        return {**result, "timings": timings.to_dict()}
     
     except Exception as e:
         raise Exception("Error processing image: " + str(e))
 
-def create_marked_image(image_path: str, ocr_data: dict, used_words: list) -> bytes:
+_PIPELINE_DONE = object()
+
+def process_images(image_sources, engine_pool: OCREnginePool = None, queue_size: int = 2,
+                   ocr_workers: int = None, mode: str = DEFAULT_PIPELINE_MODE,
+                   det_max_side: int = DEFAULT_DET_MAX_SIDE, min_ink_ratio: float = DEFAULT_MIN_INK_RATIO,
+                   decode_max_side: int = None, profile: str = DEFAULT_QUALITY_PROFILE):
+    """
+    OCR many images as a two-stage pipeline, yielding results as they complete.
+    
+    A preprocessing thread decodes and binarizes the next images while OCR threads
+    (one per engine in the pool by default) work on the previous ones. At most
+    `queue_size` preprocessed images wait between the stages, which bounds memory
+    for long batches.
+    
+    Args:
+        image_sources: Iterable of anything process_image accepts
+        
+    Yields:
+        (index, result, error) per image in completion order; exactly one of
+        result and error is None
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unsupported pipeline mode: {mode}")
+    quality_profile(profile)
+    pool = engine_pool if engine_pool is not None else get_engine_pool()
+    ocr_workers = ocr_workers or pool.size
+    preprocessed_queue = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def put(target, item):
+        # Blockiert nur, solange der Konsument noch liest
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def preprocess_stage():
+        try:
+            for index, source in enumerate(image_sources):
+                try:
+                    item = (index, preprocess_image(source, decode_max_side=decode_max_side, profile=profile), None)
+                except Exception as e:
+                    item = (index, None, Exception("Error processing image: " + str(e)))
+                if not put(preprocessed_queue, item):
+                    return
+        finally:
+            for _ in range(ocr_workers):
+                put(preprocessed_queue, _PIPELINE_DONE)
+
+    def ocr_stage():
+        try:
+            while not stop.is_set():
+                item = preprocessed_queue.get()
+                if item is _PIPELINE_DONE:
+                    return
+                index, preprocessed, error = item
+                if error is None:
+                    try:
+                        results.put((index, recognize_text(preprocessed, engine_pool=pool, mode=mode,
+                                                           det_max_side=det_max_side,
+                                                           min_ink_ratio=min_ink_ratio), None))
+                        continue
+                    except Exception as e:
+                        error = Exception("Error processing image: " + str(e))
+                results.put((index, None, error))
+        finally:
+            results.put(_PIPELINE_DONE)
+
+    threads = [threading.Thread(target=preprocess_stage, daemon=True)]
+    threads += [threading.Thread(target=ocr_stage, daemon=True) for _ in range(ocr_workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        running = ocr_workers
+        while running:
+            item = results.get()
+            if item is _PIPELINE_DONE:
+                running -= 1
+            else:
+                yield item
+    finally:
+        # Frühzeitig abgebrochener Konsument: Stufen anhalten
+        stop.set()
+        while True:
+            try:
+                preprocessed_queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in range(ocr_workers):
+            try:
+                preprocessed_queue.put_nowait(_PIPELINE_DONE)
+            except queue.Full:
+                break
+
+def create_marked_image(image_source, ocr_data: dict, used_words: list) -> bytes:
     """
     Create a new image with marked used words from the OCR data.
     
     Args:
-        image_path: Path to the original image
+        image_source: Path, encoded image bytes/buffer or decoded array of the original image
         ocr_data: OCR detection results
         used_words: List of words that were used in the sentence
         
@@ -464,7 +1222,7 @@ def create_marked_image(image_path: str, ocr_data: dict, used_words: list) -> by
         bytes: The marked image as bytes
     """
     # Read the original image
-    image = cv2.imread(image_path)
+    image, _ = load_image(image_source)
     
     # Create a copy for drawing
     marked_image = image.copy()
@@ -492,8 +1250,162 @@ def create_marked_image(image_path: str, ocr_data: dict, used_words: list) -> by
     _, buffer = cv2.imencode('.png', marked_image)
     return buffer.tobytes()
 
-# Beispielaufruf:
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+def find_images(directory, recursive=False):
+    """Sorted paths of the image files in a directory"""
+    if recursive:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+    else:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path))
+
+def compact_batch_output(output_path):
+    """
+    Prepare a JSONL output file for resuming and return the paths it already finished.
+    
+    The file is rewritten with only its successful records (the first one per path).
+    Error records are dropped because those images are retried and get a new record,
+    and so is a half-written last line from an interrupted run.
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    kept = []
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # z.B. eine halb geschriebene letzte Zeile nach einem Abbruch
+            if isinstance(record, dict) and "error" not in record and "path" in record \
+                    and record["path"] not in finished:
+                finished.add(record["path"])
+                kept.append(line.rstrip("\n") + "\n")
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.writelines(kept)
+    os.replace(temp_path, output_path)
+    return finished
+
+def latency_percentile(latencies, percentile):
+    """Nearest-rank percentile of a list of latencies"""
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(percentile * len(ordered)) - 1))]
+
+def run_batch(directory, output_path, workers=2, recursive=False, resume=True, settings=None,
+              engine_settings=None, log=print):
+    """
+    OCR every image in a directory across worker processes and append one JSONL record per image.
+    
+    With `resume`, images that already have a successful record in the output file
+    are skipped, so an interrupted run can simply be started again. Failed images are
+    retried, and their old error records are removed (see compact_batch_output).
+    
+    Returns:
+        Summary dict with counts, wall time, and throughput and latency percentiles
+        of the successfully processed images
+    """
+    from ocr_workers import bulk_process  # ocr_workers importiert dieses Modul
+    
+    paths = find_images(directory, recursive=recursive)
+    finished = compact_batch_output(output_path) if resume else set()
+    todo = [path for path in paths if path not in finished]
+    log(f"{len(paths)} images, {len(paths) - len(todo)} already done, {len(todo)} to process with {workers} workers")
+    
+    # Nur erfolgreiche Bilder zählen für Latenz und Durchsatz; schnelle Fehler verzerren sonst beides
+    latencies = []
+    processed = failed = 0
+    start = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+        for record in bulk_process(todo, workers=workers, settings=settings, engine_settings=engine_settings):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            processed += 1
+            if "error" in record:
+                failed += 1
+                log(f"Failed: {record['path']}: {record['error']}")
+            else:
+                latencies.append(record["timings"]["total_s"])
+            if processed % 50 == 0:
+                log(f"{processed}/{len(todo)} images, {len(latencies) / (time.perf_counter() - start):.2f} images/s")
+    wall_seconds = time.perf_counter() - start
+    
+    summary = {
+        "images": processed,
+        "failed": failed,
+        "skipped": len(paths) - len(todo),
+        "wall_s": wall_seconds,
+        "images_per_s": len(latencies) / wall_seconds if latencies else 0.0,
+        "p50_s": latency_percentile(latencies, 0.5) if latencies else None,
+        "p95_s": latency_percentile(latencies, 0.95) if latencies else None
+    }
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ocr_processor", description="Fridge magnet OCR")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    image_parser = commands.add_parser("image", help="OCR a single image and print the result as JSON")
+    image_parser.add_argument("path", help="Image file")
+    image_parser.add_argument("--annotate", metavar="PATH", help="Also write the image with the detected words drawn")
+    image_parser.add_argument("--debug-image", metavar="PATH",
+                              help="Also write the image with kept and filtered-out detections drawn")
+    
+    batch_parser = commands.add_parser("batch", help="OCR every image in a directory into a JSONL file")
+    batch_parser.add_argument("directory", help="Directory with images")
+    batch_parser.add_argument("--output", default="ocr_results.jsonl", help="JSONL output file")
+    batch_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                              help="Worker processes, each with its own OCR engine")
+    batch_parser.add_argument("--cpu-threads", type=int, default=1, help="CPU threads per OCR engine")
+    batch_parser.add_argument("--recursive", action="store_true", help="Include subdirectories")
+    batch_parser.add_argument("--no-resume", action="store_true",
+                              help="Process all images and overwrite the output file")
+    
+    for command_parser in (image_parser, batch_parser):
+        command_parser.add_argument("--mode", choices=PIPELINE_MODES, default=DEFAULT_PIPELINE_MODE)
+        command_parser.add_argument("--det-max-side", type=int, default=DEFAULT_DET_MAX_SIDE)
+        command_parser.add_argument("--min-ink-ratio", type=float, default=DEFAULT_MIN_INK_RATIO)
+        command_parser.add_argument("--decode-max-side", type=int, default=None)
+        command_parser.add_argument("--quality", choices=list(QUALITY_PROFILES), default=DEFAULT_QUALITY_PROFILE)
+    args = parser.parse_args(argv)
+    
+    settings = {
+        "mode": args.mode,
+        "det_max_side": args.det_max_side,
+        "min_ink_ratio": args.min_ink_ratio,
+        "decode_max_side": args.decode_max_side,
+        "profile": args.quality
+    }
+    if args.command == "image":
+        result = process_image(args.path, keep_rejected=bool(args.debug_image), **settings)
+        rejected = result.pop("rejected", [])
+        print(json.dumps(result, indent=2))
+        if args.annotate or args.debug_image:
+            image, _ = load_image(args.path)
+            magnets = Detections.from_json(result["magnets"])
+            if args.annotate:
+                cv2.imwrite(args.annotate, draw_annotations(image, magnets))
+            if args.debug_image:
+                cv2.imwrite(args.debug_image,
+                            create_debug_visualization(image, magnets, Detections.from_json(rejected)))
+        return
+    
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    summary = run_batch(
+        args.directory,
+        args.output,
+        workers=args.workers,
+        recursive=args.recursive,
+        resume=not args.no_resume,
+        settings=settings,
+        engine_settings={"cpu_threads": args.cpu_threads, "det_max_side": args.det_max_side}
+    )
+    print(f"{summary['images']} images ({summary['failed']} failed, {summary['skipped']} skipped) "
+          f"in {summary['wall_s']:.1f}s: {summary['images_per_s']:.2f} images/s")
+    if summary["images"]:
+        print(f"Latency p50 {summary['p50_s']:.2f}s, p95 {summary['p95_s']:.2f}s")
+
 if __name__ == "__main__":
-    image_path = "pfad/zum/deinem/bild.jpg"  # Passe den Pfad zum Bild an
-    result = process_image(image_path)
-    print(result)
+    main()
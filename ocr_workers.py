@@ -0,0 +1,246 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from metrics import collect_timings
+from ocr_processor import (DEFAULT_QUALITY_PROFILE, configure_engine_pool, preprocess_image, process_image,
+                           recognize_text)
+
+class OCRQueueFullError(Exception):
+    """Raised when more OCR jobs are submitted than the pool is allowed to queue"""
+
+def _init_worker(engine_settings: Dict[str, Any]) -> None:
+    """Process initializer: every worker loads its own OCR engine once"""
+    configure_engine_pool(size=1, warm=True, **engine_settings)
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+def process_image_bytes(contents: bytes, settings: Dict[str, Any],
+                        progress: Optional[Callable[[str], None]] = None) -> dict:
+    """Run process_image on uploaded image bytes, decoding them in memory"""
+    return process_image(contents, progress=progress, **settings)
+
+def process_image_file(path: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    OCR one image file in a worker process and time its stages.
+
+    Returns:
+        JSON-ready record with the path, magnets, stats and timings, or the error
+    """
+    settings = dict(settings)
+    decode_max_side = settings.pop("decode_max_side", None)
+    profile = settings.pop("profile", DEFAULT_QUALITY_PROFILE)
+    record = {"path": path, "worker": os.getpid()}
+    start = time.perf_counter()
+    try:
+        with collect_timings() as timings:
+            preprocessed = preprocess_image(path, decode_max_side=decode_max_side, profile=profile)
+            preprocessed_at = time.perf_counter()
+            result = recognize_text(preprocessed, **settings)
+        record.update(result)
+        record["timings"] = {
+            "preprocess_s": preprocessed_at - start,
+            "ocr_s": time.perf_counter() - preprocessed_at,
+            "stages": timings.totals()
+        }
+    except Exception as e:
+        record["error"] = str(e)
+    record.setdefault("timings", {})["total_s"] = time.perf_counter() - start
+    return record
+
+def bulk_process(paths: Iterable[str], workers: int = 2, settings: Optional[Dict[str, Any]] = None,
+                 engine_settings: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    OCR many image files across worker processes, yielding records as they complete.
+
+    Every worker loads its OCR engine once and keeps it warm for all of its images.
+    At most two images per worker are submitted ahead, so arbitrarily long path
+    lists never pile up in the executor.
+    """
+    settings = settings or {}
+    paths = iter(paths)
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(engine_settings or {},)) as executor:
+        pending = set()
+        while True:
+            for path in paths:
+                pending.add(executor.submit(process_image_file, path, settings))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+class _QueueProgress:
+    """Picklable progress callback that forwards stage names from a worker process"""
+    def __init__(self, queue, token: int):
+        self.queue = queue
+        self.token = token
+
+    def __call__(self, stage: str) -> None:
+        self.queue.put((self.token, stage))
+
+class _ProgressRelay:
+    """
+    Delivers stage updates from worker processes to callbacks in the server process.
+
+    Workers put (token, stage) tuples on a managed queue; a daemon thread reads
+    them and calls the callback registered for that token.
+    """
+    def __init__(self, mp_context):
+        self._manager = mp_context.Manager()
+        self.queue = self._manager.Queue()
+        self._callbacks = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def register(self, callback: Callable[[str], None]) -> _QueueProgress:
+        with self._lock:
+            token = next(self._tokens)
+            self._callbacks[token] = callback
+        return _QueueProgress(self.queue, token)
+
+    def unregister(self, progress: _QueueProgress) -> None:
+        with self._lock:
+            self._callbacks.pop(progress.token, None)
+
+    def _pump(self) -> None:
+        while True:
+            try:
+                item = self.queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            token, stage = item
+            with self._lock:
+                callback = self._callbacks.get(token)
+            if callback:
+                callback(stage)
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self._thread.join(timeout=1)
+        self._manager.shutdown()
+
+class OCRWorkerPool:
+    """
+    Runs OCR off the asyncio event loop.
+
+    With `workers` > 0, images are processed in a ProcessPoolExecutor whose
+    worker processes each hold a warm OCR engine, so OCR neither blocks the
+    event loop nor competes for the GIL. With `workers` = 0, OCR runs on a
+    thread using the in-process engine pool instead.
+
+    At most `workers` jobs run while up to `max_queue` more wait; further
+    submissions fail fast with OCRQueueFullError.
+    """
+    def __init__(self, workers: int = 2, max_queue: int = 16, engine_pool_size: int = 1,
+                 engine_settings: Optional[Dict[str, Any]] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.engine_pool_size = engine_pool_size
+        self.engine_settings = engine_settings or {}
+        self._capacity = max(workers, engine_pool_size, 1) + max_queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._executor = self._create_executor() if workers > 0 else None
+        self._progress_relay = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # "spawn" gives every worker a clean interpreter instead of a fork of the server process
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=(self.engine_settings,)
+        )
+
+    def warm_up(self) -> None:
+        """Start all workers (or in-process engines) and load their OCR models"""
+        if self._executor:
+            # One job per worker makes the executor start every process and run its initializer
+            wait([self._executor.submit(_worker_ready) for _ in range(self.workers)])
+        else:
+            configure_engine_pool(size=self.engine_pool_size, warm=True, **self.engine_settings)
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._in_flight >= self._capacity:
+                raise OCRQueueFullError(
+                    f"OCR queue is full ({self._in_flight} jobs in flight, capacity {self._capacity})")
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _relay(self) -> _ProgressRelay:
+        with self._lock:
+            if self._progress_relay is None:
+                self._progress_relay = _ProgressRelay(self._mp_context)
+            return self._progress_relay
+
+    async def run(self, contents: bytes, progress: Optional[Callable[[str], None]] = None, **settings) -> dict:
+        """
+        Process image bytes with process_image settings, without blocking the event loop.
+
+        `progress` is called with each pipeline stage name as it starts. It is called
+        from a background thread, never from the event loop.
+        """
+        self._reserve()
+        try:
+            if not self._executor:
+                return await asyncio.to_thread(process_image_bytes, contents, settings, progress)
+            worker_progress = self._relay().register(progress) if progress else None
+            executor = self._executor
+            try:
+                return await asyncio.wrap_future(
+                    executor.submit(process_image_bytes, contents, settings, worker_progress))
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); replace the pool so later requests still work
+                self._replace_executor(executor)
+                raise
+            finally:
+                if worker_progress:
+                    self._progress_relay.unregister(worker_progress)
+        finally:
+            self._release()
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            # Concurrent requests all see the same broken pool; only the first one replaces it
+            if self._executor is not broken:
+                return
+            self._executor = self._create_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load of the pool"""
+        with self._lock:
+            running_slots = max(self.workers, self.engine_pool_size, 1)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - running_slots)
+            }
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._progress_relay:
+            self._progress_relay.close()
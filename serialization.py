@@ -0,0 +1,73 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import orjson
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Neben dem registrierten Typ auch die älteren Bezeichnungen akzeptieren
+MSGPACK_ACCEPT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# NumPy-Werte (z. B. in den Statistiken) direkt serialisieren
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON with orjson"""
+    return orjson.dumps(data, option=JSON_OPTIONS)
+
+def loads(content) -> Any:
+    return orjson.loads(content)
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+def packb(data: Any) -> bytes:
+    """Serialize to MessagePack, raising RuntimeError if msgpack is not installed"""
+    if msgpack is None:
+        raise RuntimeError("MessagePack responses need the msgpack package")
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    Whether an Accept header asks for MessagePack.
+
+    Only explicitly listed MessagePack types count (wildcards keep JSON), and only if
+    msgpack is installed; q-values are not weighed against JSON.
+    """
+    if not accept or msgpack is None:
+        return False
+    for media_range in accept.split(","):
+        media_type, *parameters = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() not in MSGPACK_ACCEPT_TYPES:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            return True
+    return False
+
+def encode(data: Any, accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    Serialize a response body in the format negotiated by an Accept header.
+
+    Returns:
+        (body, media type): MessagePack if requested and available, JSON otherwise
+    """
+    if wants_msgpack(accept):
+        return packb(data), MSGPACK_MEDIA_TYPE
+    return dumps(data), JSON_MEDIA_TYPE
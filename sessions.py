@@ -0,0 +1,86 @@
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import serialization
+from bounded_store import BoundedStore
+
+class Session:
+    """OCR result of one upload, kept so sentences can be regenerated without re-sending the image"""
+    def __init__(self, ocr_data: Dict[str, Any], words: List[str], image_id: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.ocr_data = ocr_data
+        self.words = words
+        self.image_id = image_id
+        self.created_at = time.time()
+        self.used_at = time.monotonic()
+        # Grobe Schätzung des Speicherbedarfs über die serialisierte Größe
+        self.size = len(serialization.dumps(ocr_data)) + sum(len(word) for word in words)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the session"""
+        view = {
+            "session_id": self.id,
+            "words": self.words,
+            "ocr_data": self.ocr_data,
+            "created_at": self.created_at
+        }
+        if self.image_id:
+            view.update(image_id=self.image_id, image_url=f"/images/{self.image_id}")
+        return view
+
+class SessionStore:
+    """
+    Bounded in-memory session store with idle expiry.
+
+    A session expires `ttl` seconds after it was last used. Beyond that the least
+    recently used sessions are dropped once `max_sessions` or `max_bytes` (the
+    estimated size of the stored OCR data) is exceeded.
+    """
+    def __init__(self, max_sessions: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl: float = 1800):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Nach letzter Nutzung sortiert, damit Ablauf und Verdrängung beim ältesten Eintrag beginnen
+        self._sessions = BoundedStore(max_sessions, max_bytes, ttl=ttl, timestamp="used_at")
+        self._lock = threading.Lock()
+
+    def create(self, ocr_data: Dict[str, Any], words: List[str], image_id: Optional[str] = None) -> Session:
+        session = Session(ocr_data, words, image_id)
+        with self._lock:
+            self._sessions.add(session.id, session)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """The session, or None if it is unknown or expired; a hit counts as use"""
+        with self._lock:
+            session = self._sessions.get(session_id, touch=True)
+            if session is not None:
+                session.used_at = time.monotonic()
+            return session
+
+    def find_by_image(self, image_id: str) -> Optional[Session]:
+        """The most recently used session of an uploaded image, or None; a hit counts as use"""
+        with self._lock:
+            self._sessions.expire()
+            session = next((session for session in self._sessions.values() if session.image_id == image_id), None)
+            if session is not None:
+                self._sessions.get(session.id, touch=True)
+                session.used_at = time.monotonic()
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sessions.expire()
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._sessions.bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl
+            }
@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+import artifacts
+from artifacts import ArtifactStore
+from image_store import ImageStore
+
+def detection(text, x, y, w, h):
+    points = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    return {"text": text, "confidence": 0.9, "position": {"x": x, "y": y, "width": w, "height": h, "points": points}}
+
+MAGNETS = [detection("Hausboot", 20, 20, 160, 30)]
+REJECTED = [detection("boot", 100, 22, 78, 26), detection("Fisch", 20, 120, 80, 30)]
+
+class TestArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.content = cv2.imencode(".png", np.full((200, 300, 3), 255, dtype=np.uint8))[1].tobytes()
+
+    def test_images_are_drawn_on_first_request_and_kept(self):
+        store = ArtifactStore()
+        artifact = store.create(self.content, MAGNETS, REJECTED)
+        self.assertEqual(artifact.urls()["debug"], f"/artifacts/{artifact.id}/debug")
+        self.assertEqual(artifact.rendered, {})
+
+        with mock.patch("artifacts.load_image", wraps=artifacts.load_image) as load_image:
+            annotated = store.render(artifact.id, "annotated")
+            self.assertTrue(annotated.startswith(b"\xff\xd8"))
+            self.assertIs(store.render(artifact.id, "annotated"), annotated)
+            self.assertEqual(load_image.call_count, 1)
+
+        debug = cv2.imdecode(np.frombuffer(store.render(artifact.id, "debug"), np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(debug.shape, (200, 300, 3))
+        self.assertEqual(store.stats()["bytes"], artifact.size)
+
+    def test_unknown_and_expired_artifacts(self):
+        store = ArtifactStore(ttl=10)
+        with mock.patch("artifacts.time.monotonic", return_value=100.0):
+            artifact = store.create(self.content, MAGNETS, REJECTED)
+        with self.assertRaises(ValueError):
+            store.render(artifact.id, "thumbnail")
+        self.assertIsNone(store.render("missing", "annotated"))
+        with mock.patch("artifacts.time.monotonic", return_value=111.0):
+            self.assertIsNone(store.render(artifact.id, "annotated"))
+            self.assertEqual(store.stats()["artifacts"], 0)
+
+    def test_artifact_outlives_the_image_store(self):
+        images = ImageStore(max_entries=1)
+        store = ArtifactStore()
+        artifact = store.create(self.content, MAGNETS, REJECTED)
+        images.put(self.content)
+        images.put(cv2.imencode(".png", np.zeros((10, 10, 3), dtype=np.uint8))[1].tobytes())
+        self.assertEqual(images.stats()["images"], 1)
+        self.assertIsNotNone(store.render(artifact.id, "debug"))
+        self.assertGreaterEqual(artifact.size, len(self.content))
+
+    def test_oldest_artifacts_are_evicted(self):
+        store = ArtifactStore(max_entries=2)
+        first = store.create(self.content, MAGNETS, REJECTED)
+        store.create(self.content, MAGNETS, [])
+        store.create(self.content, [], [])
+        self.assertIsNone(store.get(first.id))
+        self.assertEqual(store.stats()["artifacts"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
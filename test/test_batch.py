@@ -0,0 +1,68 @@
+import asyncio
+import io
+import unittest
+import zipfile
+
+from batch import BatchTooLargeError, PipelineStage, is_zip, run_pipeline, zip_images
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+class TestRunPipeline(unittest.TestCase):
+    def test_stages_overlap_and_errors_skip_later_stages(self):
+        active = {"ocr": 0, "llm": 0}
+        overlap = []
+
+        async def ocr(item):
+            active["ocr"] += 1
+            await asyncio.sleep(0.01)
+            overlap.append(active["llm"] > 0)
+            active["ocr"] -= 1
+            if item["index"] == 2:
+                raise ValueError("no text")
+            item["words"] = ["Hund"]
+
+        async def llm(item):
+            active["llm"] += 1
+            await asyncio.sleep(0.02)
+            active["llm"] -= 1
+            item["sentence"] = "Hund"
+
+        stages = [PipelineStage("ocr", ocr), PipelineStage("llm", llm, concurrency=2)]
+
+        async def collect():
+            return [item async for item in run_pipeline(({"index": i} for i in range(5)), stages, queue_size=1)]
+
+        items = asyncio.run(collect())
+
+        self.assertEqual(sorted(item["index"] for item in items), [0, 1, 2, 3, 4])
+        failed = [item for item in items if "error" in item]
+        self.assertEqual(failed, [{"index": 2, "error": "no text", "failed_stage": "ocr"}])
+        self.assertTrue(all(item["sentence"] == "Hund" for item in items if "error" not in item))
+        self.assertTrue(any(overlap))  # OCR ran while an earlier image was in the LLM
+
+    def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            PipelineStage("ocr", None, concurrency=0)
+
+class TestZipImages(unittest.TestCase):
+    def test_lists_files_and_extracts_lazily(self):
+        content = make_zip({"a.jpg": b"a", "album/b.jpg": b"bb", "__MACOSX/._a.jpg": b"x", ".DS_Store": b"x"})
+        self.assertTrue(is_zip(content))
+        self.assertFalse(is_zip(b"a.jpg"))
+        images = zip_images(content, max_files=10, max_file_bytes=10)
+        self.assertEqual([(name, read()) for name, read in images], [("a.jpg", b"a"), ("album/b.jpg", b"bb")])
+
+    def test_limits_are_checked_up_front(self):
+        content = make_zip({"a.jpg": b"a" * 20, "b.jpg": b"b"})
+        with self.assertRaises(BatchTooLargeError):
+            zip_images(content, max_files=1, max_file_bytes=100)
+        with self.assertRaises(BatchTooLargeError):
+            zip_images(content, max_files=10, max_file_bytes=10)
+
+if __name__ == "__main__":
+    unittest.main()
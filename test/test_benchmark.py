@@ -0,0 +1,37 @@
+import unittest
+
+from benchmark.e2e import match_words
+from benchmark.micro import board_detections
+from benchmark.synthetic import render_board
+from ocr_processor import remove_duplicates_and_subwords
+
+class TestSyntheticBoards(unittest.TestCase):
+    def test_boards_are_reproducible_and_boxes_fit(self):
+        image, truth = render_board(word_count=12, width=800, height=600, seed=3)
+        again, same_truth = render_board(word_count=12, width=800, height=600, seed=3)
+        self.assertEqual(image.shape, (600, 800, 3))
+        self.assertTrue((image == again).all())
+        self.assertEqual(truth, same_truth)
+        self.assertGreater(len(truth), 0)
+        for word in truth:
+            box = word["box"]
+            self.assertTrue(0 <= box["x"] and box["x"] + box["w"] <= 800)
+            self.assertTrue(0 <= box["y"] and box["y"] + box["h"] <= 600)
+            # Das Wort ist wirklich im Bild: dunkle Pixel in der Box
+            self.assertLess(image[box["y"]:box["y"] + box["h"], box["x"]:box["x"] + box["w"]].min(), 100)
+
+class TestRecall(unittest.TestCase):
+    def test_deduplicated_detections_match_ground_truth(self):
+        _, truth = render_board(word_count=15, width=1000, height=800, seed=1)
+        magnets = remove_duplicates_and_subwords(board_detections(truth)).to_json()
+        self.assertEqual(match_words(magnets, truth), len(truth))
+
+    def test_wrong_text_or_position_does_not_match(self):
+        truth = [{"text": "Hund", "box": {"x": 0, "y": 0, "w": 40, "h": 10}}]
+        far = {"text": "Hund", "position": {"x": 100, "y": 100, "width": 40, "height": 10}}
+        other = {"text": "Hand", "position": {"x": 0, "y": 0, "width": 40, "height": 10}}
+        self.assertEqual(match_words([far, other], truth), 0)
+        self.assertEqual(match_words([dict(far, position={"x": 2, "y": 1, "width": 40, "height": 10})], truth), 1)
+
+if __name__ == "__main__":
+    unittest.main()
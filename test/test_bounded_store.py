@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+from bounded_store import BoundedStore
+
+class Entry:
+    def __init__(self, size, created_at=0.0):
+        self.size = size
+        self.created_at = created_at
+
+class TestBoundedStore(unittest.TestCase):
+    def test_oldest_entries_are_evicted_by_count_and_bytes(self):
+        store = BoundedStore(max_entries=2, max_bytes=100)
+        store.add("a", Entry(10))
+        store.add("b", Entry(10))
+        store.get("a", touch=True)
+        store.add("c", Entry(10))
+        self.assertEqual(list(store.values()), [store.get("c"), store.get("a")])
+        self.assertEqual(store.bytes, 20)
+
+        store.add("d", Entry(500))
+        self.assertEqual(len(store), 1)
+        self.assertIn("d", store)
+        self.assertEqual(store.bytes, 500)
+
+    def test_grow_and_pop_keep_bytes_in_sync(self):
+        store = BoundedStore(max_entries=10, max_bytes=25)
+        first, second = Entry(10), Entry(10)
+        store.add("a", first)
+        store.add("b", second)
+        second.size += 10
+        store.grow(10)
+        self.assertNotIn("a", store)
+        self.assertIs(store.pop("b"), second)
+        self.assertIsNone(store.pop("b"))
+        self.assertEqual(store.bytes, 0)
+
+    def test_entries_expire_by_timestamp(self):
+        store = BoundedStore(max_entries=10, max_bytes=100, ttl=10)
+        with mock.patch("bounded_store.time.monotonic", return_value=105.0):
+            store.add("a", Entry(1, created_at=100.0))
+            store.add("b", Entry(1, created_at=105.0))
+        with mock.patch("bounded_store.time.monotonic", return_value=112.0):
+            self.assertIsNone(store.get("a"))
+            self.assertIsNotNone(store.get("b"))
+        self.assertEqual(store.bytes, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from config import Config
+
+class TestConfig(unittest.TestCase):
+    def load(self, data):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "config.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            with mock.patch.dict(os.environ, {"CONFIG_PATH": path}):
+                return Config()
+
+    def test_partial_provider_section_keeps_defaults(self):
+        config = self.load({"ollama": {"model": "m", "temperature": 0.5}, "routing": {"max_attempts": 3}})
+        backend = config.get_llm_backends()[0]
+        self.assertEqual(backend["model"], "m")
+        self.assertEqual(backend["temperature"], 0.5)
+        self.assertEqual(backend["keep_alive"], "30m")
+        self.assertEqual(backend["max_concurrency"], 2)
+        self.assertTrue(backend["structured_output"])
+        self.assertEqual(config.get_routing_config()["max_attempts"], 3)
+        self.assertEqual(config.get_routing_config()["max_reasks"], 1)
+
+    def test_non_section_values_are_replaced(self):
+        config = self.load({"llm_provider": "openrouter", "llm_backends": [{"provider": "ollama"}]})
+        self.assertEqual(config.get_current_provider(), "openrouter")
+        self.assertEqual([backend["provider"] for backend in config.get_llm_backends()], ["ollama"])
+
+if __name__ == "__main__":
+    unittest.main()
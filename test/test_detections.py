@@ -0,0 +1,53 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from detections import Detections
+
+def magnet(text, x, y, w, h, confidence=0.9):
+    points = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    return {"text": text, "confidence": confidence,
+            "position": {"x": x, "y": y, "width": w, "height": h, "points": points}}
+
+class TestDetections(unittest.TestCase):
+    def setUp(self):
+        self.magnets = [magnet("Hausboot", 100, 100, 160, 30), magnet(" Katze", 400, 90, 100, 40, confidence=0.75)]
+        self.detections = Detections.from_json(self.magnets)
+
+    def test_json_round_trip(self):
+        self.assertEqual(self.detections.to_json(), self.magnets)
+        self.assertEqual(self.detections.points.dtype, np.int32)
+        self.assertEqual(Detections.from_json([]).to_json(), [])
+
+    def test_boxes_and_normalized_texts(self):
+        self.assertEqual(self.detections.boxes.tolist(), [[100, 100, 260, 130], [400, 90, 500, 130]])
+        self.assertEqual(self.detections.normalized_texts, ["hausboot", "katze"])
+
+    def test_from_regions_maps_boxes_back_like_int(self):
+        points = [[[10.9, 20.2], [50.5, 20.2], [50.5, 41.7], [10.9, 41.7]]]
+        detections = Detections.from_regions(["Mond"], [0.8], points, scale_factor=2, offsets=[(300, 400)])
+        self.assertEqual(detections.points[0].tolist(), [[305, 410], [325, 410], [325, 420], [305, 420]])
+
+    def test_indexing_and_concatenate(self):
+        self.assertEqual(self.detections[np.array([1])].texts, [" Katze"])
+        self.assertEqual(self.detections[np.array([False, True])].confidences.tolist(), [0.75])
+        combined = Detections.concatenate([self.detections, self.detections[:1]])
+        self.assertEqual(combined.texts, ["Hausboot", " Katze", "Hausboot"])
+        self.assertEqual(combined.points.shape, (3, 4, 2))
+
+    def test_scaled_rounds_points(self):
+        scaled = Detections.from_json([magnet("Haus", 3, 5, 7, 9)]).scaled(1.5)
+        self.assertEqual(scaled.to_json()[0]["position"]["points"], [(4, 8), (15, 8), (15, 21), (4, 21)])
+        self.assertIs(self.detections.scaled(1), self.detections)
+
+    def test_mismatched_lengths_raise(self):
+        with self.assertRaises(ValueError):
+            Detections(["a", "b"], [0.9], np.zeros((2, 4, 2)))
+
+    def test_pickles_for_worker_processes(self):
+        restored = pickle.loads(pickle.dumps(self.detections))
+        self.assertEqual(restored.to_json(), self.magnets)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from image_store import ImageStore
+
+def encode(width, height, ext=".png"):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.circle(image, (width // 2, height // 2), min(width, height) // 3, (255, 255, 255), -1)
+    return cv2.imencode(ext, image)[1].tobytes()
+
+class TestImageStore(unittest.TestCase):
+    def test_images_are_content_addressed(self):
+        store = ImageStore()
+        content = encode(64, 32)
+        image_id = store.put(content)
+        self.assertEqual(store.put(content), image_id)
+        self.assertEqual(store.stats()["images"], 1)
+        self.assertEqual(store.rendition(image_id), (content, "image/png"))
+
+    def test_rendition_is_downscaled_and_cached(self):
+        store = ImageStore()
+        image_id = store.put(encode(800, 400, ".jpg"))
+        content, media_type = store.rendition(image_id, max_side=200)
+        self.assertEqual(media_type, "image/jpeg")
+        decoded = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape[:2], (100, 200))
+        self.assertIs(store.rendition(image_id, max_side=200)[0], content)
+
+    def test_small_image_rendition_is_the_original(self):
+        store = ImageStore()
+        content = encode(64, 32)
+        image_id = store.put(content)
+        self.assertEqual(store.rendition(image_id, max_side=200), (content, "image/png"))
+
+    def test_least_recently_used_images_are_evicted(self):
+        store = ImageStore(max_entries=2)
+        first = store.put(encode(10, 10))
+        second = store.put(encode(20, 20))
+        store.get(first)
+        third = store.put(encode(30, 30))
+        self.assertIsNotNone(store.get(first))
+        self.assertIsNone(store.get(second))
+        self.assertIsNone(store.rendition(second))
+        self.assertIsNotNone(store.get(third))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import unittest
+
+from jobs import JobManager, JobQueueFullError
+
+class TestJobManager(unittest.TestCase):
+    def test_job_reports_stages_and_result(self):
+        async def handler(job, value):
+            manager.report_stage(job, "ocr")
+            # Reports from other threads go through the thread-safe reporter
+            reporter = manager.stage_reporter(job)
+            await asyncio.to_thread(reporter, "dedup")
+            await asyncio.sleep(0)
+            manager.report_stage(job, "preprocess")  # earlier stage, ignored
+            manager.report_stage(job, "llm")
+            return {"value": value * 2}
+
+        manager = JobManager(handler, workers=1, max_queue=4)
+
+        async def scenario():
+            await manager.start()
+            job = manager.submit(value=21)
+            events = [event async for event in manager.subscribe(job)]
+            await manager.stop()
+            return job, events
+
+        job, events = asyncio.run(scenario())
+
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result, {"value": 42})
+        self.assertEqual(job.params, {})
+        self.assertEqual([e["stage"] for e in events], ["queued", "ocr", "dedup", "llm", "done"])
+        self.assertEqual(events[-1]["event"], "done")
+
+    def test_failed_job_keeps_error(self):
+        async def handler(job):
+            raise ValueError("no text")
+
+        manager = JobManager(handler, workers=1)
+
+        async def scenario():
+            await manager.start()
+            job = manager.submit()
+            events = [event async for event in manager.subscribe(job)]
+            # Subscribing after the job finished replays its history
+            replay = [event async for event in manager.subscribe(job)]
+            await manager.stop()
+            return job, events, replay
+
+        job, events, replay = asyncio.run(scenario())
+
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "no text")
+        self.assertEqual(events[-1]["event"], "failed")
+        self.assertEqual(replay, events)
+
+    def test_full_queue_is_rejected(self):
+        release = threading.Event()
+
+        async def handler(job):
+            await asyncio.to_thread(release.wait, 5)
+            return {}
+
+        manager = JobManager(handler, workers=1, max_queue=1)
+
+        async def scenario():
+            await manager.start()
+            manager.submit()
+            await asyncio.sleep(0.01)  # first job is picked up by the worker
+            manager.submit()
+            with self.assertRaises(JobQueueFullError):
+                manager.submit()
+            release.set()
+            await manager.stop()
+
+        asyncio.run(scenario())
+
+    def test_finished_jobs_expire(self):
+        async def handler(job):
+            return {}
+
+        manager = JobManager(handler, workers=1, result_ttl=10)
+
+        async def scenario():
+            await manager.start()
+            job = manager.submit()
+            [event async for event in manager.subscribe(job)]
+            await manager.stop()
+            return job
+
+        job = asyncio.run(scenario())
+
+        self.assertEqual(manager.expire(now=job.finished_at + 5), 0)
+        self.assertIs(manager.get(job.id), job)
+        self.assertEqual(manager.expire(now=job.finished_at + 11), 1)
+        self.assertIsNone(manager.get(job.id))
+
+if __name__ == "__main__":
+    unittest.main()
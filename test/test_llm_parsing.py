@@ -0,0 +1,310 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from llm_providers import Completion
+from llm_service import Backend, CircuitBreaker, IncrementalJSONExtractor, LLMRouter, LLMRoutingError, LLMService
+
+RAW_RESPONSE = (
+    '<think>Vielleicht {"sentence": "Der {alte} Hund", "used_words": ["Hund"]}, oder "doch nicht</think>\n'
+    '```json\n{"sentence": "Der \\"Hund\\" bellt}", "used_words": ["Der", "Hund", "bellt"]}\n```'
+)
+
+class TestIncrementalJSONExtractor(unittest.TestCase):
+    def test_last_object_wins_regardless_of_chunking(self):
+        for chunk_size in (1, 2, 5, len(RAW_RESPONSE)):
+            extractor = IncrementalJSONExtractor()
+            for start in range(0, len(RAW_RESPONSE), chunk_size):
+                extractor.feed(RAW_RESPONSE[start:start + chunk_size])
+            self.assertEqual(len(extractor.objects), 2)
+            self.assertEqual(extractor.result,
+                             {"sentence": 'Der "Hund" bellt}', "used_words": ["Der", "Hund", "bellt"]})
+
+    def test_objects_are_returned_as_soon_as_they_close(self):
+        extractor = IncrementalJSONExtractor()
+        self.assertEqual(extractor.feed('{"sentence": "Hallo", '), [])
+        self.assertEqual(extractor.feed('"used_words": ["Hallo"]} und mehr'),
+                         [{"sentence": "Hallo", "used_words": ["Hallo"]}])
+
+    def test_objects_without_required_keys_are_ignored(self):
+        extractor = IncrementalJSONExtractor()
+        extractor.feed('{"sentence": "Hallo"} {kein json}')
+        self.assertIsNone(extractor.result)
+
+class TestLLMService(unittest.TestCase):
+    def test_parse_falls_back_without_json(self):
+        service = LLMService()
+        self.assertEqual(service._parse_llm_response(RAW_RESPONSE, ["Hund"])["sentence"], 'Der "Hund" bellt}')
+        self.assertEqual(service._parse_llm_response("kein JSON", ["a", "b"]),
+                         {"sentence": "a b...", "used_words": ["a", "b"]})
+
+    def test_prompt_keeps_variable_parts_out_of_the_system_prompt(self):
+        service = LLMService()
+        system, prompt = service.build_prompt(["Hund", "bellt"], "mach es kurz")
+        self.assertEqual(system, service.build_prompt(["Katze"])[0])
+        self.assertNotIn("Hund", system)
+        self.assertTrue(prompt.startswith("Wörter: Hund, bellt\nZusätzliche Anweisungen: mach es kurz\n"))
+
+    def test_stream_sentence_emits_tokens_then_result(self):
+        service = LLMService()
+
+        class FakeProvider:
+            async def stream(self, prompt, usage=None, **options):
+                for start in range(0, len(RAW_RESPONSE), 7):
+                    yield RAW_RESPONSE[start:start + 7]
+
+        async def collect():
+            return [event async for event in service.astream_sentence(["Der", "Hund", "bellt"])]
+
+        with mock.patch.object(service.config, "get_current_provider", return_value="ollama"), \
+                mock.patch.object(service, "provider", return_value=FakeProvider()):
+            events = asyncio.run(collect())
+
+        tokens = [event["text"] for event in events if event["event"] == "token"]
+        self.assertEqual("".join(tokens), RAW_RESPONSE)
+        self.assertEqual(events[-1], {"event": "result", "sentence": 'Der "Hund" bellt}',
+                                      "used_words": ["Der", "Hund", "bellt"]})
+
+    def test_generate_sentence_reports_provider_errors(self):
+        service = LLMService()
+
+        class FailingProvider:
+            async def generate(self, prompt, **options):
+                raise RuntimeError("offline")
+
+        with mock.patch.object(service.config, "get_current_provider", return_value="ollama"), \
+                mock.patch.object(service, "provider", return_value=FailingProvider()):
+            result = service.generate_sentence(["Hund"])
+
+        self.assertEqual(result, {"sentence": "Ollama-Fehler: offline", "used_words": ["Hund"]})
+
+class FakeBackendProvider:
+    """Provider whose answer and delay are scripted per call"""
+    def __init__(self, delay=0.0, response='{"sentence": "Hallo", "used_words": ["Hallo"]}', error=None):
+        self.delay = delay
+        self.responses = response if isinstance(response, list) else [response]
+        self.error = error
+        self.prompts = []
+        self.cancelled = False
+
+    async def generate(self, prompt, **options):
+        self.prompts.append(prompt)
+        text = self.responses[min(len(self.prompts), len(self.responses)) - 1]
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return Completion(text, prompt_tokens=10, completion_tokens=5)
+
+def route(router, providers):
+    service = LLMService()
+    return asyncio.run(router.generate("prompt", lambda backend: providers[backend.name],
+                                       service._extract_sentence, reask=service._reask_prompt))
+
+VARIANTS_RESPONSE = (
+    '{"sentences": [{"sentence": "Der Hund bellt.", "used_words": ["Der", "Hund", "bellt"]},'
+    ' {"sentence": "der hund BELLT", "used_words": ["der", "hund", "bellt"]},'
+    ' {"sentence": "Bellt der Hund?", "used_words": ["Bellt", "der", "Hund"]}]}'
+)
+
+class TestSentenceVariants(unittest.TestCase):
+    def service(self, provider, strategy="single_prompt"):
+        service = LLMService()
+        service.router = LLMRouter([Backend("only", "ollama", {})], hedge_delay=10)
+        service.provider = lambda backend: provider
+        service.config.config["variants"] = {**service.config.get_variants_config(), "strategy": strategy}
+        return service
+
+    def test_batch_prompt_is_deduplicated_and_topped_up(self):
+        provider = FakeBackendProvider(response=[VARIANTS_RESPONSE,
+                                                 '{"sentence": "Hund bellt der", "used_words": ["Hund"]}'])
+        service = self.service(provider)
+
+        sentences = asyncio.run(service.agenerate_variants(["Der", "Hund", "bellt"], 3))
+
+        self.assertEqual([s["sentence"] for s in sentences], ["Der Hund bellt.", "Bellt der Hund?", "Hund bellt der"])
+        self.assertIn("Anzahl Sätze: 3", provider.prompts[0])
+        self.assertEqual(len(provider.prompts), 2)
+
+    def test_fan_out_sends_one_request_per_sentence(self):
+        provider = FakeBackendProvider(response=['{"sentence": "Eins", "used_words": []}',
+                                                 '{"sentence": "Zwei", "used_words": []}'])
+        service = self.service(provider, strategy="fan_out")
+
+        sentences = asyncio.run(service.agenerate_variants(["Hund"], 2))
+
+        self.assertEqual(sorted(s["sentence"] for s in sentences), ["Eins", "Zwei"])
+        self.assertTrue(all("Anzahl" not in prompt for prompt in provider.prompts))
+
+    def test_next_sentence_is_served_from_the_batch(self):
+        provider = FakeBackendProvider(response=[VARIANTS_RESPONSE,
+                                                 '{"sentence": "Hund bellt der", "used_words": ["Hund"]}',
+                                                 '{"sentences": [{"sentence": "Der Hund bellt", "used_words": []},'
+                                                 ' {"sentence": "Neu", "used_words": []}]}'])
+        service = self.service(provider)
+        words = ["Der", "Hund", "bellt"]
+
+        async def scenario():
+            served = [await service.next_sentence(words) for _ in range(3)]
+            requests = len(provider.prompts)
+            await asyncio.sleep(0.01)  # background refill of the empty batch
+            served.append(await service.next_sentence(words))
+            return served, requests
+
+        served, requests = asyncio.run(scenario())
+
+        self.assertEqual([s["sentence"] for s in served],
+                         ["Der Hund bellt.", "Bellt der Hund?", "Hund bellt der", "Neu"])
+        self.assertEqual([s["remaining"] for s in served[:3]], [2, 1, 0])
+        self.assertEqual(requests, 2)  # the first batch answered all three calls
+
+    def test_upload_prefetches_without_repeating_the_shown_sentence(self):
+        provider = FakeBackendProvider(response=[VARIANTS_RESPONSE,
+                                                 '{"sentence": "Hund bellt der", "used_words": ["Hund"]}'])
+        service = self.service(provider)
+        words = ["Der", "Hund", "bellt"]
+
+        async def scenario():
+            service.prefetch_variants(words, served=[{"sentence": "Der Hund bellt!", "used_words": words}])
+            await asyncio.sleep(0.01)  # background batch
+            requests = len(provider.prompts)
+            served = [await service.next_sentence(words) for _ in range(2)]
+            return served, requests
+
+        served, requests = asyncio.run(scenario())
+
+        # The batch repeats the shown sentence, so the two missing ones are topped up before "next"
+        self.assertEqual(requests, 3)
+        self.assertEqual([s["sentence"] for s in served], ["Bellt der Hund?", "Hund bellt der"])
+
+    def test_evicting_an_entry_during_its_refill_falls_back(self):
+        provider = FakeBackendProvider(delay=0.05, response='{"sentence": "Hallo Hund", "used_words": ["Hund"]}')
+        service = self.service(provider)
+        service.variant_cache.max_entries = 1
+
+        async def scenario():
+            request = asyncio.create_task(service.next_sentence(["Hund"]))
+            await asyncio.sleep(0.01)
+            service.variant_cache.entry(["Katze"], None)  # evicts and cancels the awaited refill
+            return await request
+
+        result = asyncio.run(scenario())
+
+        self.assertEqual(result, {"sentence": "Hallo Hund", "used_words": ["Hund"], "remaining": 0})
+        self.assertTrue(provider.cancelled)
+
+    def test_no_prefetch_after_a_failed_sentence(self):
+        provider = FakeBackendProvider()
+        service = self.service(provider)
+        words = ["Der", "Hund", "bellt"]
+
+        async def scenario():
+            service.prefetch_variants(words, served=[{"sentence": "Ollama-Fehler: offline", "used_words": words}])
+            service.prefetch_variants(words, served=[{"sentence": "Der Hund bellt...", "used_words": words}])
+            service.prefetch_variants(words, served=[])
+            await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(provider.prompts, [])
+        self.assertEqual(service.variant_cache.stats()["entries"], 0)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_on_error_rate_and_recovers_after_trial(self):
+        breaker = CircuitBreaker(window=4, min_calls=4, max_error_rate=0.5, cooldown=0.05)
+        for ok in (True, False, True, False):
+            breaker.record(ok, 0.1)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.available())
+
+        asyncio.run(asyncio.sleep(0.06))
+        self.assertTrue(breaker.available())
+        breaker.start()
+        self.assertFalse(breaker.available())  # only one trial call at a time
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker(window=2, min_calls=2, max_error_rate=1.0, slow_call_seconds=1.0)
+        breaker.record(True, 2.0)
+        breaker.record(True, 3.0)
+        self.assertEqual(breaker.state, "open")
+
+    def test_latency_percentile_needs_samples(self):
+        breaker = CircuitBreaker(min_calls=3)
+        breaker.record(True, 1.0)
+        self.assertIsNone(breaker.latency_percentile(0.9))
+        breaker.record(True, 2.0)
+        breaker.record(True, 3.0)
+        self.assertEqual(breaker.latency_percentile(0.9), 3.0)
+
+class TestLLMRouter(unittest.TestCase):
+    def test_slow_backend_is_hedged(self):
+        slow, fast = Backend("slow", "ollama", {}, weight=1e9), Backend("fast", "ollama", {})
+        providers = {"slow": FakeBackendProvider(delay=5), "fast": FakeBackendProvider()}
+        router = LLMRouter([slow, fast], hedge_delay=0.05, min_hedge_delay=0.01)
+
+        result, backend = route(router, providers)
+
+        self.assertEqual(result["sentence"], "Hallo")
+        self.assertIs(backend, fast)
+        self.assertTrue(providers["slow"].cancelled)
+
+    def test_failed_backend_fails_over(self):
+        broken, healthy = Backend("broken", "ollama", {}, weight=1e9), Backend("healthy", "ollama", {})
+        providers = {"broken": FakeBackendProvider(error=RuntimeError("down")), "healthy": FakeBackendProvider()}
+        router = LLMRouter([broken, healthy], hedge_delay=10)
+
+        _, backend = route(router, providers)
+
+        self.assertIs(backend, healthy)
+        self.assertEqual(broken.breaker.error_rate(), 1.0)
+
+    def test_invalid_answer_is_asked_again(self):
+        backend = Backend("only", "ollama", {})
+        provider = FakeBackendProvider(response=["<think>hmm</think> Satz ohne JSON",
+                                                 '{"sentence": "Hallo", "used_words": ["Hallo"]}'])
+        router = LLMRouter([backend], hedge_delay=10, max_reasks=1)
+
+        result, _ = route(router, {"only": provider})
+
+        self.assertEqual(result["sentence"], "Hallo")
+        self.assertEqual(len(provider.prompts), 2)
+        self.assertIn("kein valides JSON", provider.prompts[1])
+        self.assertIn("Satz ohne JSON", provider.prompts[1])
+        self.assertNotIn("hmm", provider.prompts[1])
+        usage = router.usage.snapshot()
+        self.assertEqual((usage["completions"], usage["parse_failures"], usage["reasks"]), (2, 1, 1))
+        self.assertEqual(usage["parse_failure_rate"], 0.5)
+        self.assertEqual(usage["completion_tokens"], 10)
+
+    def test_answer_with_wrong_types_is_asked_again(self):
+        provider = FakeBackendProvider(response=['{"sentence": 5, "used_words": "Hund"}',
+                                                 '{"sentence": "Hallo", "used_words": ["Hallo", 3]}',
+                                                 '{"sentence": "Hallo Hund", "used_words": ["Hund"]}'])
+        router = LLMRouter([Backend("only", "ollama", {})], hedge_delay=10, max_reasks=2)
+
+        result, _ = route(router, {"only": provider})
+
+        self.assertEqual(result, {"sentence": "Hallo Hund", "used_words": ["Hund"]})
+        self.assertEqual(len(provider.prompts), 3)
+
+    def test_unparsable_responses_are_reported(self):
+        backend = Backend("only", "ollama", {})
+        router = LLMRouter([backend], hedge_delay=10, max_reasks=0)
+
+        with self.assertRaises(LLMRoutingError) as raised:
+            route(router, {"only": FakeBackendProvider(response="kein JSON")})
+        self.assertTrue(raised.exception.unparsed)
+
+    def test_open_breakers_are_avoided(self):
+        broken, healthy = Backend("broken", "ollama", {}, weight=1e9), Backend("healthy", "ollama", {})
+        broken.breaker.opened_at = float("inf")  # never recovers during the test
+        router = LLMRouter([broken, healthy])
+        self.assertTrue(all(router.choose() is healthy for _ in range(20)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import httpx
+
+from llm_providers import OllamaProvider, OpenRouterProvider, RetryableError, parse_retry_after
+
+SCHEMA = {"type": "object", "properties": {"sentence": {"type": "string"}}, "required": ["sentence"]}
+
+def make_provider(handler, **config):
+    return OpenRouterProvider({"api_key": "key", "backoff_base": 0.001, "backoff_max": 0.01, **config},
+                              transport=httpx.MockTransport(handler))
+
+def completion(text, finish_reason="stop"):
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": text}, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3}
+    })
+
+class TestRetryAfter(unittest.TestCase):
+    def test_parses_seconds_and_dates(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_backoff_is_jittered_and_capped(self):
+        provider = OpenRouterProvider({"backoff_base": 1.0, "backoff_max": 4.0, "max_retry_after": 10.0})
+        delays = [provider.retry_delay(5) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 4.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertEqual(provider.retry_delay(0, retry_after=2.5), 2.5)
+        self.assertEqual(provider.retry_delay(0, retry_after=60), 10.0)
+
+class TestOpenRouterProvider(unittest.TestCase):
+    def test_retries_rate_limited_requests(self):
+        responses = [httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(503), completion("Hallo")]
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return responses[len(requests) - 1]
+
+        provider = make_provider(handler)
+        self.assertEqual(asyncio.run(provider.generate("prompt")).text, "Hallo")
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(requests[0].headers["Authorization"], "Bearer key")
+
+    def test_gives_up_after_max_retries(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(500)
+
+        provider = make_provider(handler, max_retries=2)
+        with self.assertRaises(RetryableError):
+            asyncio.run(provider.generate("prompt"))
+        self.assertEqual(len(calls), 3)
+
+    def test_client_errors_are_not_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(401)
+
+        provider = make_provider(handler)
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(provider.generate("prompt"))
+        self.assertEqual(len(calls), 1)
+
+    def test_structured_output_and_max_tokens_are_sent(self):
+        payloads = []
+
+        def handler(request):
+            payloads.append(json.loads(request.content))
+            return completion('{"sentence": "Hallo"}', finish_reason="length")
+
+        result = asyncio.run(make_provider(handler, max_tokens=50).generate("prompt", system="sys", schema=SCHEMA))
+
+        self.assertEqual(payloads[0]["messages"], [{"role": "system", "content": "sys"},
+                                                   {"role": "user", "content": "prompt"}])
+        self.assertEqual(payloads[0]["max_tokens"], 50)
+        self.assertEqual(payloads[0]["response_format"]["json_schema"]["schema"], SCHEMA)
+        self.assertEqual(result.usage(), {"prompt_tokens": 12, "completion_tokens": 3, "truncated": True})
+
+        asyncio.run(make_provider(handler, structured_output=False).generate("prompt", schema=SCHEMA))
+        self.assertNotIn("response_format", payloads[1])
+
+        asyncio.run(make_provider(handler, max_tokens=50).generate("prompt", max_tokens=150))
+        self.assertEqual(payloads[2]["max_tokens"], 150)
+
+    def test_stream_yields_content_deltas(self):
+        body = (
+            ": OPENROUTER PROCESSING\n\n"
+            'data: {"choices": [{"delta": {"content": "Hal"}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": "lo"}, "finish_reason": "stop"}]}\n\n'
+            'data: {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 2}}\n\n'
+            "data: [DONE]\n\n"
+        )
+        provider = make_provider(lambda request: httpx.Response(200, text=body))
+        usage = {}
+
+        async def collect():
+            return [chunk async for chunk in provider.stream("prompt", usage=usage)]
+
+        self.assertEqual(asyncio.run(collect()), ["Hal", "lo"])
+        self.assertEqual(usage, {"prompt_tokens": 7, "completion_tokens": 2})
+
+    def test_concurrency_is_capped(self):
+        active = []
+        peak = []
+
+        async def handler(request):
+            active.append(request)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(request)
+            return completion("ok")
+
+        async def run_many():
+            provider = make_provider(handler, max_concurrency=2)
+            return await asyncio.gather(*(provider.generate("prompt") for _ in range(6)))
+
+        self.assertEqual([c.text for c in asyncio.run(run_many())], ["ok"] * 6)
+        self.assertEqual(max(peak), 2)
+
+class TestOllamaProvider(unittest.TestCase):
+    def test_schema_and_token_limit_are_passed(self):
+        provider = OllamaProvider({"model": "m", "max_tokens": 40, "keep_alive": "30m"})
+        response = {"response": '{"sentence": "Hallo"}', "prompt_eval_count": 20, "eval_count": 4,
+                    "done_reason": "stop", "load_duration": 1_000_000, "prompt_eval_duration": 250_000_000,
+                    "eval_duration": 500_000_000}
+
+        with mock.patch.object(provider.client, "generate", mock.AsyncMock(return_value=response)) as generate:
+            result = asyncio.run(provider.generate("prompt", system="sys", schema=SCHEMA))
+
+        kwargs = generate.call_args.kwargs
+        self.assertEqual(kwargs["format"], SCHEMA)
+        self.assertEqual(kwargs["options"]["num_predict"], 40)
+        self.assertEqual((kwargs["system"], kwargs["keep_alive"]), ("sys", "30m"))
+        self.assertEqual(result.usage(), {"prompt_tokens": 20, "completion_tokens": 4, "truncated": False,
+                                          "load_seconds": 0.001, "prompt_eval_seconds": 0.25, "eval_seconds": 0.5})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+from metrics import (OCR_DETECTIONS, OCR_WINDOWS, STAGE_SECONDS, Timings, collect_timings, current_timings,
+                     observe_ocr_stats, record_stage, render_metrics, timed, track_queue)
+
+def sample_value(metric, suffix, **labels):
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name.endswith(suffix) and sample.labels == labels:
+                return sample.value
+    return 0.0
+
+class TestTimings(unittest.TestCase):
+    def test_stages_are_collected_per_block(self):
+        self.assertIsNone(current_timings())
+        with collect_timings() as timings:
+            with timed("decode"):
+                pass
+            record_stage("ocr_window", 0.5)
+            record_stage("ocr_window", 0.25)
+        self.assertIsNone(current_timings())
+        self.assertEqual(set(timings.samples), {"decode", "ocr_window"})
+        self.assertEqual(timings.totals()["ocr_window"], 0.75)
+
+    def test_nested_blocks_propagate_unless_disabled(self):
+        with collect_timings() as outer:
+            with collect_timings():
+                record_stage("threshold", 0.1)
+            with collect_timings(propagate=False) as isolated:
+                record_stage("dedup", 0.2)
+        self.assertEqual(outer.totals(), {"threshold": 0.1})
+        self.assertEqual(isolated.totals(), {"dedup": 0.2})
+
+    def test_awaited_tasks_record_into_the_request(self):
+        async def stage():
+            record_stage("llm_request", 1.0)
+
+        async def request():
+            with collect_timings() as timings:
+                await asyncio.gather(stage(), stage())
+            return timings
+
+        self.assertEqual(asyncio.run(request()).totals(), {"llm_request": 2.0})
+
+    def test_samples_round_trip_through_dict(self):
+        timings = Timings({"decode": [0.1]})
+        timings.merge({"decode": [0.2], "render": [0.3]})
+        self.assertEqual(Timings(timings.to_dict()).samples, {"decode": [0.1, 0.2], "render": [0.3]})
+
+class TestPrometheusMetrics(unittest.TestCase):
+    def test_observed_stages_reach_the_histogram(self):
+        before = sample_value(STAGE_SECONDS, "_count", stage="test_stage")
+        with timed("test_stage", observe=True):
+            pass
+        record_stage("test_stage", 0.1)  # ohne observe nur in den Timings
+        self.assertEqual(sample_value(STAGE_SECONDS, "_count", stage="test_stage"), before + 1)
+
+    def test_ocr_stats_count_windows_and_detections(self):
+        processed = sample_value(OCR_WINDOWS, "_total", result="processed")
+        skipped = sample_value(OCR_WINDOWS, "_total", result="skipped")
+        kept = sample_value(OCR_DETECTIONS, "_total", kind="kept")
+        observe_ocr_stats({"windows_total": 10, "windows_skipped": 4, "detections_raw": 12, "detections_kept": 5})
+        self.assertEqual(sample_value(OCR_WINDOWS, "_total", result="processed"), processed + 6)
+        self.assertEqual(sample_value(OCR_WINDOWS, "_total", result="skipped"), skipped + 4)
+        self.assertEqual(sample_value(OCR_DETECTIONS, "_total", kind="kept"), kept + 5)
+
+    def test_queue_depth_is_read_on_scrape(self):
+        depth = [3]
+        track_queue("test_queue", lambda: depth[0])
+        depth[0] = 7
+        body, content_type = render_metrics()
+        self.assertIn('freezer_queue_depth{queue="test_queue"} 7.0', body.decode())
+        self.assertTrue(content_type.startswith("text/plain"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import tempfile
+
+from ocr_cache import OCRResultCache, make_cache_key
+
+PARAMS = {"ocr_version": "PP-OCRv4", "window_size": 400, "overlap_percent": 30}
+
+class TestOCRResultCache(unittest.TestCase):
+    def test_key_depends_on_image_and_parameters(self):
+        key = make_cache_key(b"image", PARAMS)
+        self.assertEqual(key, make_cache_key(b"image", dict(reversed(list(PARAMS.items())))))
+        self.assertNotEqual(key, make_cache_key(b"other image", PARAMS))
+        self.assertNotEqual(key, make_cache_key(b"image", {**PARAMS, "overlap_percent": 20}))
+
+    def test_get_or_compute_counts_hits_and_misses(self):
+        cache = OCRResultCache(max_entries=4)
+        calls = []
+        compute = lambda: calls.append(1) or {"magnets": [{"text": "Katze"}]}
+
+        first = cache.get_or_compute(b"image", PARAMS, compute)
+        second = cache.get_or_compute(b"image", PARAMS, compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_results_are_copied(self):
+        cache = OCRResultCache()
+        cache.put("key", {"magnets": [{"text": "Katze"}]})
+        cache.get("key")["magnets"][0]["text"] = "changed"
+        self.assertEqual(cache.get("key")["magnets"][0]["text"], "Katze")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = OCRResultCache(max_entries=2)
+        cache.put("a", {"magnets": []})
+        cache.put("b", {"magnets": []})
+        cache.get("a")
+        cache.put("c", {"magnets": []})
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            OCRResultCache(disk_dir=disk_dir).put("key", {"magnets": [{"text": "Mond"}]})
+
+            restarted = OCRResultCache(disk_dir=disk_dir)
+            self.assertEqual(restarted.get("key"), {"magnets": [{"text": "Mond"}]})
+            self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,17 @@
 import unittest
-from ocr_processor import process_image
+from ocr_processor import (process_image, OCREnginePool, score_windows_by_ink, remove_duplicates_and_subwords,
+                           detections_to_boxes, pair_iou, pair_containment, calculate_iou,
+                           calculate_containment, BoxGrid, load_image, preprocess_image,
+                           process_images, recognize_text, run_batch, latency_percentile, estimate_text_height,
+                           ocr_parameters, QUALITY_PROFILES)
+from detections import Detections
+from unittest import mock
+import cv2
+import json
 import os
+import tempfile
+import threading
+import numpy as np
 
 class TestOCRProcessor(unittest.TestCase):
     def setUp(self):
@@ -60,5 +71,302 @@ class TestOCRProcessor(unittest.TestCase):
             self.assertIn("width", magnet["position"])
             self.assertIn("height", magnet["position"])
 
+class CountingEnginePool(OCREnginePool):
+    """Engine pool that hands out plain objects instead of loading PaddleOCR models."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.constructed = 0
+
+    def _create_engine(self):
+        self.constructed += 1
+        return object()
+
+class TestOCREnginePool(unittest.TestCase):
+    def test_engines_are_reused(self):
+        pool = CountingEnginePool(size=2)
+        with pool.acquire() as first:
+            pass
+        with pool.acquire() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(pool.constructed, 1)
+
+    def test_warm_up_builds_all_engines(self):
+        pool = CountingEnginePool(size=3)
+        pool.warm_up()
+        pool.warm_up()
+        self.assertEqual(pool.constructed, 3)
+
+    def test_concurrent_borrowers_get_distinct_engines(self):
+        pool = CountingEnginePool(size=2)
+        with pool.acquire() as first, pool.acquire() as second:
+            self.assertIsNot(first, second)
+
+        # A third borrower waits until an engine is returned
+        borrowed = []
+        with pool.acquire() as first, pool.acquire():
+            worker = threading.Thread(target=lambda: borrowed.append(pool.acquire().__enter__()))
+            worker.start()
+            worker.join(timeout=0.2)
+            self.assertTrue(worker.is_alive())
+        worker.join(timeout=1)
+        self.assertEqual(len(borrowed), 1)
+        self.assertEqual(pool.constructed, 2)
+
+    def test_failed_construction_frees_its_slot(self):
+        pool = CountingEnginePool(size=1)
+        with mock.patch.object(pool, "_create_engine", side_effect=RuntimeError("model download failed")):
+            with self.assertRaises(RuntimeError):
+                pool.warm_up()
+            with self.assertRaises(RuntimeError):
+                with pool.acquire():
+                    pass
+        with pool.acquire() as engine:
+            self.assertIsNotNone(engine)
+        self.assertEqual(pool.constructed, 1)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            OCREnginePool(size=0)
+
+class TestWindowInkScoring(unittest.TestCase):
+    def test_blank_and_inked_windows(self):
+        image = np.full((100, 200), 255, np.uint8)
+        image[10:20, 110:150] = 0  # 400 ink pixels in the right half
+        windows = [(0, 0, 100, 100), (100, 0, 100, 100), (50, 0, 100, 100)]
+
+        ratios = score_windows_by_ink(image, windows)
+
+        np.testing.assert_allclose(ratios, [0.0, 0.04, 0.04])
+
+    def test_no_windows(self):
+        image = np.full((10, 10), 255, np.uint8)
+        self.assertEqual(len(score_windows_by_ink(image, [])), 0)
+
+def make_detection(text, x, y, w, h, confidence=0.9):
+    points = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    return {"text": text, "confidence": confidence,
+            "position": {"x": x, "y": y, "width": w, "height": h, "points": points}}
+
+def dedup_texts(detections):
+    return remove_duplicates_and_subwords(Detections.from_json(detections)).texts
+
+class TestRemoveDuplicates(unittest.TestCase):
+    def test_pair_metrics_match_scalar_helpers(self):
+        detections = [make_detection("a", 0, 0, 40, 20), make_detection("b", 10, 5, 40, 20),
+                      make_detection("c", 100, 100, 0, 10), make_detection("d", 5, 2, 10, 10)]
+        boxes = detections_to_boxes(detections)
+        rows, cols = [a.ravel() for a in np.indices((len(boxes), len(boxes)))]
+        iou = pair_iou(boxes, rows, cols)
+        containment = pair_containment(boxes, rows, cols)
+        for k, (i, j) in enumerate(zip(rows, cols)):
+            self.assertEqual(iou[k], calculate_iou(detections[i], detections[j]))
+            self.assertEqual(containment[k], calculate_containment(detections[j], detections[i]))
+
+    def test_contained_subword_is_removed(self):
+        detections = [make_detection("Hausboot", 100, 100, 160, 30),
+                      make_detection("boot", 180, 102, 78, 26),
+                      make_detection("Katze", 400, 100, 100, 30)]
+        self.assertEqual(sorted(dedup_texts(detections)), ["Hausboot", "Katze"])
+
+    def test_overlapping_duplicate_keeps_higher_confidence(self):
+        detections = [make_detection("Mond", 10, 10, 80, 30, confidence=0.7),
+                      make_detection("Mond", 12, 11, 80, 30, confidence=0.95)]
+        kept = remove_duplicates_and_subwords(Detections.from_json(detections))
+        self.assertEqual(len(kept), 1)
+        self.assertEqual(kept.confidences.tolist(), [0.95])
+
+    def test_short_fragment_next_to_word_is_removed(self):
+        detections = [make_detection("tanzen", 0, 0, 120, 30), make_detection("zu", 100, 0, 60, 30)]
+        self.assertEqual(dedup_texts(detections), ["tanzen"])
+
+    def test_subword_straddling_a_line_band_is_removed(self):
+        # Vertical centers 18 and 22 fall into different 10-pixel bands but sit on the same line
+        detections = [make_detection("Hausboot", 251, 7, 60, 22), make_detection("atze", 255, 11, 18, 22)]
+        self.assertEqual(dedup_texts(detections), ["Hausboot"])
+
+    def test_separate_words_are_kept(self):
+        detections = [make_detection("und", 0, 0, 60, 30), make_detection("der", 300, 0, 60, 30)]
+        self.assertEqual(len(dedup_texts(detections)), 2)
+
+    def test_rejected_keep_their_original_order(self):
+        detections = Detections.from_json([make_detection("boot", 180, 102, 78, 26),
+                                           make_detection("Katze", 400, 100, 100, 30),
+                                           make_detection("Hausboot", 100, 100, 160, 30),
+                                           make_detection("Haus", 100, 100, 80, 30)])
+        kept, rejected = remove_duplicates_and_subwords(detections, return_rejected=True)
+        self.assertEqual(kept.texts, ["Hausboot", "Katze"])
+        self.assertEqual(rejected.texts, ["boot", "Haus"])
+
+class TestBoxGrid(unittest.TestCase):
+    def setUp(self):
+        self.boxes = np.array([[0, 0, 50, 20], [40, 10, 90, 30], [500, 500, 560, 520], [95, 0, 120, 20]],
+                              dtype=np.float64)
+        self.grid = BoxGrid(self.boxes, cell_size=32)
+
+    def test_query_returns_touching_boxes(self):
+        self.assertEqual(self.grid.query(45, 15, 60, 18).tolist(), [0, 1])
+        self.assertEqual(self.grid.query(90, 10, 95, 15).tolist(), [1, 3])
+        self.assertEqual(self.grid.query(300, 300, 310, 310).tolist(), [])
+
+    def test_overlapping_pairs_need_positive_area(self):
+        rows, cols = self.grid.overlapping_pairs()
+        self.assertEqual(list(zip(rows.tolist(), cols.tolist())), [(0, 1), (1, 0)])
+
+    def test_empty_grid(self):
+        grid = BoxGrid(np.zeros((0, 4)))
+        self.assertEqual(len(grid.query(0, 0, 10, 10)), 0)
+        self.assertEqual(len(grid.overlapping_pairs()[0]), 0)
+
+class TestLoadImage(unittest.TestCase):
+    def setUp(self):
+        self.image = np.zeros((800, 1600, 3), dtype=np.uint8)
+        cv2.rectangle(self.image, (100, 100), (700, 500), (255, 255, 255), -1)
+
+    def test_decodes_bytes_and_buffers(self):
+        encoded = cv2.imencode(".png", self.image)[1].tobytes()
+        for source in (encoded, bytearray(encoded), memoryview(encoded)):
+            image, scale = load_image(source)
+            self.assertEqual(scale, 1.0)
+            np.testing.assert_array_equal(image, self.image)
+
+    def test_array_is_used_without_copy(self):
+        image, scale = load_image(self.image)
+        self.assertIs(image, self.image)
+        self.assertEqual(scale, 1.0)
+
+    def test_downscales_while_decoding(self):
+        encoded = cv2.imencode(".jpg", self.image)[1].tobytes()
+        image, scale = load_image(encoded, max_side=400)
+        self.assertEqual(image.shape[:2], (200, 400))
+        self.assertAlmostEqual(scale, 4.0)
+
+    def test_invalid_bytes_raise(self):
+        with self.assertRaises(ValueError):
+            load_image(b"not an image")
+
+    def test_detections_are_scaled_back(self):
+        detections = Detections.from_json([make_detection("Haus", 10, 20, 40, 10)])
+        scaled = detections.scaled(4.0).to_json()[0]["position"]
+        self.assertEqual((scaled["x"], scaled["y"], scaled["width"], scaled["height"]), (40, 80, 160, 40))
+        self.assertEqual(scaled["points"][2], (200, 120))
+
+class TestProcessImages(unittest.TestCase):
+    def test_results_stream_per_image(self):
+        image = np.full((60, 120, 3), 255, dtype=np.uint8)
+        encoded = cv2.imencode(".png", image)[1].tobytes()
+        sources = [encoded, b"not an image", encoded]
+
+        def recognize(preprocessed, **kwargs):
+            return {"magnets": [], "stats": {"height": preprocessed.image.shape[0]}}
+
+        with mock.patch("ocr_processor.recognize_text", side_effect=recognize):
+            results = sorted(process_images(sources, engine_pool=CountingEnginePool(size=2), queue_size=1),
+                             key=lambda item: item[0])
+
+        self.assertEqual([index for index, _, _ in results], [0, 1, 2])
+        self.assertEqual(results[0][1]["stats"], {"height": 60})
+        self.assertIsNone(results[1][1])
+        self.assertIn("Error processing image", str(results[1][2]))
+        self.assertIsNone(results[2][2])
+
+    def test_preprocess_binarizes(self):
+        preprocessed = preprocess_image(np.full((60, 120, 3), 255, dtype=np.uint8))
+        self.assertEqual(preprocessed.image_thresh.shape, (60, 120))
+        self.assertEqual(preprocessed.scale, 1.0)
+
+class TestQualityProfiles(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from benchmark.synthetic import render_board
+        # Foto mit großer Schrift, wie bei einer 12-MP-Aufnahme aus der Nähe
+        cls.image, cls.truth = render_board(word_count=20, width=3200, height=2400, font_sizes=(100, 140), seed=4)
+
+    def test_text_height_is_estimated_from_letters(self):
+        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        box_height = np.median([word["box"]["h"] for word in self.truth])
+        self.assertTrue(0.4 * box_height <= estimate_text_height(gray) <= box_height)
+        self.assertIsNone(estimate_text_height(np.full((400, 400), 230, dtype=np.uint8)))
+
+    def test_fast_profile_works_on_a_pyramid_level(self):
+        balanced = preprocess_image(self.image, profile="balanced")
+        fast = preprocess_image(self.image, profile="fast")
+        self.assertEqual(balanced.image_thresh.shape, (2400, 3200))
+        self.assertIsNone(balanced.text_height)
+        self.assertEqual(fast.scale, 2.0)
+        self.assertEqual(fast.image_thresh.shape, (1200, 1600))
+        self.assertGreaterEqual(fast.text_height / fast.scale, QUALITY_PROFILES["fast"]["target_text_height"])
+
+    def test_small_images_stay_at_full_resolution(self):
+        preprocessed = preprocess_image(self.image[:600, :800], profile="fast")
+        self.assertEqual(preprocessed.scale, 1.0)
+
+    def test_profiles_are_part_of_the_cache_parameters(self):
+        self.assertNotEqual(ocr_parameters(profile="fast"), ocr_parameters(profile="balanced"))
+        with self.assertRaises(ValueError):
+            preprocess_image(self.image, profile="turbo")
+
+class TestRejectedDetections(unittest.TestCase):
+    def setUp(self):
+        self.preprocessed = preprocess_image(np.full((300, 400, 3), 255, dtype=np.uint8))
+        detections = Detections.from_json([make_detection("Hausboot", 100, 100, 160, 30),
+                                           make_detection("boot", 180, 102, 78, 26)])
+        stats = {"windows_total": 1, "windows_skipped": 0, "skip_ratio": 0.0}
+        self.windows = mock.patch("ocr_processor.ocr_sliding_windows", return_value=(detections, stats))
+
+    def test_rejected_detections_are_kept_on_request(self):
+        with self.windows, mock.patch("ocr_processor.cv2.imwrite") as imwrite:
+            plain = recognize_text(self.preprocessed, engine_pool=CountingEnginePool())
+            debug = recognize_text(self.preprocessed, engine_pool=CountingEnginePool(), keep_rejected=True)
+        imwrite.assert_not_called()
+        self.assertNotIn("rejected", plain)
+        self.assertEqual([det["text"] for det in debug["magnets"]], ["Hausboot"])
+        self.assertEqual([det["text"] for det in debug["rejected"]], ["boot"])
+        self.assertEqual(debug["stats"]["detections_raw"], 2)
+
+class TestBatchCommand(unittest.TestCase):
+    def fake_bulk_process(self, paths, workers=2, settings=None, engine_settings=None):
+        for path in paths:
+            self.processed.append(path)
+            if path.endswith("broken.png"):
+                yield {"path": path, "error": "cannot decode", "timings": {"total_s": 0.1}}
+            else:
+                yield {"path": path, "magnets": [], "stats": {}, "timings": {"total_s": 1.0}}
+
+    def test_batch_resumes_from_existing_output(self):
+        self.processed = []
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("a.png", "b.jpg", "broken.png", "notes.txt"):
+                open(os.path.join(directory, name), "wb").close()
+            output = os.path.join(directory, "out.jsonl")
+            with open(output, "w") as f:
+                f.write(json.dumps({"path": os.path.join(directory, "a.png"), "magnets": []}) + "\n")
+                f.write('{"path": "half written')
+
+            with mock.patch("ocr_workers.bulk_process", side_effect=self.fake_bulk_process):
+                summary = run_batch(directory, output, workers=1, log=lambda message: None)
+
+            with open(output) as f:
+                records = [line for line in f if line.strip()]
+
+            # A second run retries the failed image and replaces its error record
+            with mock.patch("ocr_workers.bulk_process", side_effect=self.fake_bulk_process):
+                run_batch(directory, output, workers=1, log=lambda message: None)
+            with open(output) as f:
+                retried = [json.loads(line) for line in f]
+
+        self.assertEqual([os.path.basename(path) for path in self.processed], ["b.jpg", "broken.png", "broken.png"])
+        self.assertEqual((summary["images"], summary["failed"], summary["skipped"]), (2, 1, 1))
+        # The fast failure does not count towards latency
+        self.assertEqual((summary["p50_s"], summary["p95_s"]), (1.0, 1.0))
+        self.assertEqual(len(records), 3)
+        self.assertEqual([os.path.basename(record["path"]) for record in retried], ["a.png", "b.jpg", "broken.png"])
+
+    def test_latency_percentile(self):
+        latencies = [float(i) for i in range(1, 21)]
+        self.assertEqual(latency_percentile(latencies, 0.95), 19.0)
+        self.assertEqual(latency_percentile(latencies, 0.5), 10.0)
+        self.assertEqual(latency_percentile([3.0], 0.95), 3.0)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
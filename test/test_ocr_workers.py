@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import ocr_workers
+from ocr_workers import OCRWorkerPool, OCRQueueFullError
+
+class TestOCRWorkerPool(unittest.TestCase):
+    def test_in_process_pool_runs_off_the_event_loop(self):
+        pool = OCRWorkerPool(workers=0, max_queue=1)
+        loop_thread = []
+
+        def fake_process(contents, settings, progress=None):
+            loop_thread.append(threading.current_thread())
+            return {"magnets": [], "settings": settings}
+
+        with mock.patch.object(ocr_workers, "process_image_bytes", fake_process):
+            result = asyncio.run(pool.run(b"image", mode="sliding_window"))
+
+        self.assertEqual(result["settings"], {"mode": "sliding_window"})
+        self.assertIsNot(loop_thread[0], threading.main_thread())
+        self.assertEqual(pool.stats()["in_flight"], 0)
+
+    def test_full_queue_is_rejected(self):
+        pool = OCRWorkerPool(workers=0, max_queue=1)
+        release = threading.Event()
+
+        def slow_process(contents, settings, progress=None):
+            release.wait(timeout=5)
+            return {"magnets": []}
+
+        async def submit_three():
+            first = asyncio.ensure_future(pool.run(b"a"))
+            second = asyncio.ensure_future(pool.run(b"b"))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(OCRQueueFullError):
+                await pool.run(b"c")
+            self.assertEqual(pool.stats()["queued"], 1)
+            release.set()
+            await asyncio.gather(first, second)
+
+        with mock.patch.object(ocr_workers, "process_image_bytes", slow_process):
+            asyncio.run(submit_three())
+        self.assertEqual(pool.stats()["in_flight"], 0)
+
+    def test_broken_pool_is_replaced_once(self):
+        futures = []
+        broken = mock.Mock()
+        broken.submit.side_effect = lambda *args: futures.append(Future()) or futures[-1]
+        replacement = mock.Mock()
+        with mock.patch.object(OCRWorkerPool, "_create_executor", side_effect=[broken, replacement]) as create:
+            pool = OCRWorkerPool(workers=1, max_queue=4)
+
+            async def fail_while_in_flight():
+                requests = [asyncio.ensure_future(pool.run(b"image")) for _ in range(3)]
+                await asyncio.sleep(0.01)
+                for future in futures:
+                    future.set_exception(BrokenProcessPool("worker died"))
+                return await asyncio.gather(*requests, return_exceptions=True)
+
+            results = asyncio.run(fail_while_in_flight())
+
+        self.assertEqual(len(futures), 3)
+        self.assertTrue(all(isinstance(result, BrokenProcessPool) for result in results))
+        self.assertEqual(create.call_count, 2)
+        self.assertIs(pool._executor, replacement)
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        self.assertEqual(pool.stats()["in_flight"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
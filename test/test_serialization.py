@@ -0,0 +1,45 @@
+import json
+import unittest
+from unittest import mock
+
+import msgpack
+import numpy as np
+
+import serialization
+
+MAGNETS = [{"text": "Käse", "confidence": 0.93,
+            "position": {"x": 1, "y": 2, "width": 30, "height": 10, "points": [(1, 2), (31, 2), (31, 12), (1, 12)]}}]
+
+class TestSerialization(unittest.TestCase):
+    def test_json_matches_standard_library(self):
+        data = {"magnets": MAGNETS, "stats": {"text_height": np.float64(21.5), "windows_total": np.int64(4)}}
+        expected = {"magnets": MAGNETS, "stats": {"text_height": 21.5, "windows_total": 4}}
+        self.assertEqual(json.loads(serialization.dumps(data)), json.loads(json.dumps(expected)))
+
+    def test_accept_header_negotiation(self):
+        self.assertTrue(serialization.wants_msgpack("application/msgpack"))
+        self.assertTrue(serialization.wants_msgpack("application/json;q=0.5, application/x-msgpack;q=0.9"))
+        self.assertFalse(serialization.wants_msgpack("application/msgpack;q=0"))
+        self.assertFalse(serialization.wants_msgpack("*/*"))
+        self.assertFalse(serialization.wants_msgpack(None))
+
+    def test_encode_msgpack(self):
+        body, media_type = serialization.encode({"magnets": MAGNETS, "scale": np.float32(0.5)}, "application/msgpack")
+        self.assertEqual(media_type, serialization.MSGPACK_MEDIA_TYPE)
+        decoded = msgpack.unpackb(body)
+        self.assertEqual(decoded["magnets"][0]["position"]["points"][1], [31, 2])
+        self.assertEqual(decoded["scale"], 0.5)
+
+    def test_encode_defaults_to_json(self):
+        body, media_type = serialization.encode({"magnets": MAGNETS}, "text/html")
+        self.assertEqual(media_type, serialization.JSON_MEDIA_TYPE)
+        self.assertEqual(serialization.loads(body)["magnets"][0]["text"], "Käse")
+
+    def test_msgpack_is_optional(self):
+        with mock.patch("serialization.msgpack", None):
+            self.assertFalse(serialization.wants_msgpack("application/msgpack"))
+            with self.assertRaises(RuntimeError):
+                serialization.packb({})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from sessions import SessionStore
+
+OCR_DATA = {"magnets": [{"text": "Hund", "box": {"x": 1, "y": 2, "w": 30, "h": 10}}]}
+
+class TestSessionStore(unittest.TestCase):
+    def test_session_keeps_ocr_result(self):
+        store = SessionStore()
+        session = store.create(OCR_DATA, ["Hund"], image_id="abc")
+        self.assertIs(store.get(session.id), session)
+        self.assertEqual(session.to_dict()["image_url"], "/images/abc")
+        self.assertTrue(store.delete(session.id))
+        self.assertIsNone(store.get(session.id))
+        self.assertEqual(store.stats()["bytes"], 0)
+
+    def test_latest_session_of_an_image(self):
+        store = SessionStore()
+        first = store.create(OCR_DATA, ["Hund"], image_id="abc")
+        store.create(OCR_DATA, ["Katze"], image_id="other")
+        self.assertIs(store.find_by_image("abc"), first)
+        second = store.create(OCR_DATA, ["Hund", "bellt"], image_id="abc")
+        self.assertIs(store.find_by_image("abc"), second)
+        self.assertIsNone(store.find_by_image("missing"))
+
+    def test_idle_sessions_expire(self):
+        store = SessionStore(ttl=10)
+        with mock.patch("sessions.time.monotonic", return_value=100.0):
+            first = store.create(OCR_DATA, ["Hund"])
+            second = store.create(OCR_DATA, ["Hund"])
+        with mock.patch("sessions.time.monotonic", return_value=105.0):
+            store.get(second.id)  # use keeps a session alive
+        with mock.patch("sessions.time.monotonic", return_value=112.0):
+            self.assertIsNone(store.get(first.id))
+            self.assertIs(store.get(second.id), second)
+
+    def test_least_recently_used_sessions_are_evicted(self):
+        size = SessionStore().create(OCR_DATA, ["Hund"]).size
+        store = SessionStore(max_bytes=2 * size)
+        first = store.create(OCR_DATA, ["Hund"])
+        second = store.create(OCR_DATA, ["Hund"])
+        store.get(first.id)
+        third = store.create(OCR_DATA, ["Hund"])
+        self.assertIsNotNone(store.get(first.id))
+        self.assertIsNone(store.get(second.id))
+        self.assertIsNotNone(store.get(third.id))
+        self.assertEqual(store.stats()["bytes"], 2 * size)
+
+        store = SessionStore(max_sessions=1)
+        store.create(OCR_DATA, ["Hund"])
+        store.create(OCR_DATA, ["Hund"])
+        self.assertEqual(store.stats()["sessions"], 1)
+
+if __name__ == "__main__":
+    unittest.main()